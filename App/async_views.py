@@ -0,0 +1,397 @@
+"""
+Async versions of the CRUD endpoints, served under /api/async/.
+
+Under ASGI these run on the event loop and talk to the database through
+Django's async ORM (``aget``, ``acreate``, ``async for``, ...), so a worker
+keeps many slow clients in flight without one thread per request. The
+payloads match the synchronous endpoints; the detail cache and ETag
+handling are only applied on the synchronous side. Writes go through
+``writer.run`` like the synchronous views, via ``run_write``, and call the
+synchronous views' own write methods, so both sides validate and write
+the same way.
+
+Every write of the synchronous API has an async twin. Users: create,
+update (PUT and PATCH); the synchronous API deletes no users, so neither
+does this one. Authors: create (without books; add them with the books
+endpoint) and delete. Books: create, update, delete. Enrollments: create,
+update, delete.
+"""
+import inspect
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.http import Http404, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from . import bulk, deletion, jobs, listing, pagination, partial, sharding, writer
+from .models import Task, CrudUser, UserProfile, Author, Book, Enrollment
+from .serialization import FieldsError, format_datetime, json_response
+from .views import (
+    AuthorDetailByIdAPIView, EnrollmentCreateView, EnrollmentGetByIdView, UpdateBookView, UpdateUserProfile,
+    UserProfileCurdView, valid_books,
+)
+
+
+async def list_response(request, resource):
+    """
+    Whole list, or one page when ?limit= / ?cursor= is given, of the
+    ``resource`` listing narrowed to ``?fields=``. The serializer may be a
+    plain listing serializer or a coroutine function.
+    """
+    try:
+        queryset, serialize = listing.project(resource, listing.requested_fields(request), asynchronous=True)
+    except FieldsError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    async def to_dicts(rows):
+        result = serialize(rows)
+        return await result if inspect.isawaitable(result) else result
+
+    if pagination.wants_pagination(request):
+        try:
+            rows, next_cursor = await pagination.apaginate(queryset, request)
+        except pagination.PaginationError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return json_response({'results': await to_dicts(rows), 'next': next_cursor})
+    return json_response(await to_dicts(await sharding.afetch(queryset)))
+
+
+async def run_write(fn, *args, **kwargs):
+    return await sync_to_async(writer.run)(fn, *args, **kwargs)
+
+
+def parse_json(request):
+    try:
+        return json.loads(request.body)
+    except json.JSONDecodeError:
+        return None
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncTaskListView(View):
+    async def get(self, request):
+        if not pagination.wants_pagination(request) and not await Task.objects.aexists():
+            return JsonResponse({'message': 'No tasks found'}, status=200)
+        return await list_response(request, 'tasks')
+
+    async def post(self, request):
+        data = parse_json(request)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Invalid JSON format.'}, status=400)
+        title = data.get('title')
+        description = data.get('description')
+        if not title or not description:
+            return JsonResponse({'error': 'Title and description are required.'}, status=400)
+
+        task = await run_write(Task.objects.create, title=title, description=description)
+        return JsonResponse({'message': 'Task created successfully!', 'task_id': task.id}, status=201)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncTaskDetailView(View):
+    async def get(self, request, pk):
+        try:
+            row = await listing.task_queryset().aget(pk=pk)
+        except Task.DoesNotExist:
+            return JsonResponse({'error': f'Task with id {pk} not found'}, status=404)
+        return json_response(listing.TASK_PLAN.to_dict(row))
+
+    async def put(self, request, pk):
+        try:
+            task = await Task.objects.aget(pk=pk)
+        except Task.DoesNotExist:
+            return JsonResponse({'error': 'Task not found'}, status=404)
+        try:
+            values = partial.changes(Task, parse_json(request), ('title', 'description'))
+        except partial.PatchError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        # The same columns the sync PUT writes: only those sent
+        await run_write(partial.save_columns, task, values)
+        return JsonResponse({
+            'message': 'Task updated successfully',
+            'task': {
+                'id': task.id,
+                'title': task.title,
+                'description': task.description,
+                'created_at': format_datetime(task.created_at),
+            },
+        }, status=200)
+
+    async def delete(self, request, pk):
+        if not await run_write(deletion.delete_task, pk):
+            return JsonResponse({'error': 'Task not found'}, status=404)
+        return JsonResponse({'message': 'Task deleted successfully'}, status=200)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncUserListView(View):
+    async def get(self, request):
+        return await list_response(request, 'users')
+
+    async def post(self, request):
+        data = parse_json(request)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        try:
+            user, user_profile = await run_write(
+                UserProfileCurdView().create_user,
+                data.get('username'), data.get('email'), data.get('bio'), data.get('website'),
+            )
+        except IntegrityError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({
+            'message': 'User and Profile created successfully',
+            'user_id': user.id,
+            'profile_id': user_profile.id,
+        }, status=201)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncUserDetailView(View):
+    async def get(self, request, user_id):
+        plan = UserProfileCurdView.detail_plan
+        try:
+            row = await plan.values().aget(id=user_id)
+        except CrudUser.DoesNotExist:
+            raise Http404
+        return json_response(plan.to_dict(row))
+
+    async def put(self, request, user_id):
+        data = parse_json(request)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        try:
+            user_profile = await UserProfile.objects.select_related('user').aget(user_id=user_id)
+        except UserProfile.DoesNotExist:
+            if not await CrudUser.objects.filter(pk=user_id).aexists():
+                return JsonResponse({'error': 'User not found'}, status=404)
+            return JsonResponse({'error': 'User profile not found'}, status=404)
+
+        try:
+            user_values = partial.changed(user_profile.user, data, ('username', 'email'))
+            profile_values = partial.changed(user_profile, data, ('bio', 'website'))
+            await run_write(UpdateUserProfile().save_user, user_profile.user, user_values, user_profile, profile_values)
+        except (ValidationError, IntegrityError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({'message': 'User profile updated successfully'}, status=200)
+
+    async def patch(self, request, user_id):
+        data = parse_json(request)
+        try:
+            user_values = partial.changes(CrudUser, data, ('username', 'email'))
+            profile_values = partial.changes(UserProfile, data, ('bio', 'website'))
+        except partial.PatchError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if not user_values and not profile_values:
+            return JsonResponse({'error': 'Send username, email, bio and/or website.'}, status=400)
+
+        missing = await run_write(UpdateUserProfile().update_user, user_id, user_values, profile_values)
+        if missing:
+            return JsonResponse({'error': f'{missing} not found'}, status=404)
+        return JsonResponse({'message': 'User profile updated successfully'}, status=200)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAuthorListView(View):
+    async def get(self, request):
+        return await list_response(request, 'authors')
+
+    async def post(self, request):
+        data = parse_json(request)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        if not data.get('author_name'):
+            return JsonResponse({'error': 'Author name is required'}, status=400)
+
+        author = await run_write(Author.objects.create, name=data['author_name'], bio=data.get('author_bio'))
+        return JsonResponse({
+            'message': 'Author created successfully',
+            'author': {'id': author.id, 'name': author.name, 'bio': author.bio},
+        }, status=201)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAuthorDetailView(View):
+    async def get(self, request, author_id):
+        author_plan = AuthorDetailByIdAPIView.author_plan
+        book_plan = AuthorDetailByIdAPIView.book_plan
+        try:
+            row = await author_plan.values().aget(id=author_id)
+        except Author.DoesNotExist:
+            raise Http404
+        author_data = author_plan.to_dict(row)
+        books = book_plan.values(Book.objects.filter(author_id=author_id).order_by('id'))
+        author_data['books'] = book_plan.to_dicts([book async for book in books])
+        return json_response(author_data)
+
+    async def delete(self, request, author_id):
+        if jobs.wants_async(request):
+            # Prefer: respond-async queues the delete, as on the synchronous endpoint
+            if not await Author.objects.filter(pk=author_id).aexists():
+                return JsonResponse({'error': 'Author not found'}, status=404)
+            return jobs.accepted(await run_write(jobs.enqueue, 'delete_author', {'author_id': author_id}))
+
+        if not await run_write(deletion.delete_author, author_id):
+            return JsonResponse({'error': 'Author not found'}, status=404)
+        return JsonResponse({'message': 'Author and all related books deleted successfully'}, status=200)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncBookCreateView(View):
+    async def post(self, request, author_id):
+        try:
+            author = await Author.objects.aget(id=author_id)
+        except Author.DoesNotExist:
+            return JsonResponse({'error': 'Author not found'}, status=404)
+        data = parse_json(request)
+        if not isinstance(data, list) or not valid_books(data):
+            return JsonResponse({'error': 'Each book must have a book name and content'}, status=400)
+
+        # transaction.atomic is sync only, so the whole insert runs in one worker thread call
+        books = await run_write(bulk.insert_books, author.id, data)
+        return JsonResponse({
+            'message': 'Books created successfully',
+            'books': [
+                {'author_id': author.id, 'author_name': author.name, 'book_name': book.book_name, 'content': book.content}
+                for book in books
+            ],
+        }, status=201)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncBookDetailView(View):
+    """Update (PUT, PATCH) and delete one of an author's books."""
+    fields = ('book_name', 'content', 'author_id')
+
+    async def put(self, request, author_id, book_id):
+        data = parse_json(request)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        # Empty values are ignored, as on the synchronous PUT
+        try:
+            values = partial.changes(Book, {name: value for name, value in data.items() if value}, self.fields)
+        except partial.PatchError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        try:
+            book = await Book.objects.select_related('author').aget(pk=book_id, author_id=author_id)
+        except Book.DoesNotExist:
+            return JsonResponse({'error': 'Book not found for this author'}, status=404)
+
+        view = UpdateBookView()
+        response = await self.save(view, book, values)
+        if response is not None:
+            return response
+        return JsonResponse({'message': 'Book updated successfully', 'book': view.book_data(book)}, status=200)
+
+    async def patch(self, request, author_id, book_id):
+        try:
+            values = partial.changes(Book, parse_json(request), self.fields)
+        except partial.PatchError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if not values:
+            return JsonResponse({'error': 'Send book_name, content and/or author_id.'}, status=400)
+
+        representation = partial.wants_representation(request)
+        books = Book.objects.select_related('author') if representation else Book.objects.only('author_id')
+        try:
+            book = await books.aget(pk=book_id, author_id=author_id)
+        except Book.DoesNotExist:
+            return JsonResponse({'error': 'Book not found for this author'}, status=404)
+
+        view = UpdateBookView()
+        response = await self.save(view, book, values)
+        if response is not None:
+            return response
+        if representation:
+            return JsonResponse({'message': 'Book updated successfully', 'book': view.book_data(book)}, status=200)
+        return JsonResponse({'message': 'Book updated successfully', 'book_id': book.id}, status=200)
+
+    async def save(self, view, book, values):
+        """Write ``values`` to ``book`` the way ``UpdateBookView`` does; an error response if it cannot."""
+        author_id = book.author_id
+        # move() reads the new author, which the async ORM cannot do inside a sync method
+        response = await sync_to_async(view.move)(book, values)
+        if response is not None:
+            return response
+        await run_write(view.save_book, book, values, author_id)
+        return None
+
+    async def delete(self, request, author_id, book_id):
+        try:
+            book = await Book.objects.aget(pk=book_id, author_id=author_id)
+        except Book.DoesNotExist:
+            return JsonResponse({'error': 'Book not found for this author'}, status=404)
+        await run_write(book.delete)
+        return JsonResponse({'message': 'Book deleted successfully'}, status=200)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncEnrollmentListView(View):
+    async def get(self, request):
+        return await list_response(request, 'enrollments')
+
+    async def post(self, request):
+        data = parse_json(request)
+        try:
+            bulk.parse_item(data)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        # The same unit of work as the synchronous create, on the student's shard when sharding is enabled
+        student, course, enrollment, created = await run_write(
+            sharding.on_shard, sharding.shard_for_email(data['student']['email']),
+            EnrollmentCreateView().enroll, data['student'], data['course'], data.get('grade'),
+        )
+        if not created:
+            return JsonResponse({'message': 'Enrollment already exists'}, status=400)
+        return JsonResponse({
+            'message': 'Enrollment created successfully',
+            'student': student.name,
+            'course': course.title,
+            'enrollment_date': enrollment.enrollment_date,
+            'grade': enrollment.grade,
+        }, status=201)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(sharding.route_by_kwarg('id'), name='get')
+@method_decorator(sharding.route_by_kwarg('id'), name='put')
+@method_decorator(sharding.route_by_kwarg('id'), name='delete')
+class AsyncEnrollmentDetailView(View):
+    async def get(self, request, id):
+        plan = EnrollmentGetByIdView.detail_plan
+        try:
+            row = await plan.values().aget(id=id)
+        except Enrollment.DoesNotExist:
+            return JsonResponse({'error': 'Enrollment not found'}, status=404)
+        return json_response(plan.to_dict(row))
+
+    async def delete(self, request, id):
+        if not await run_write(sharding.on_shard, sharding.current_shard(), deletion.delete_enrollment, id):
+            return JsonResponse({'error': 'Enrollment not found'}, status=404)
+        return JsonResponse({'message': 'Enrollment deleted successfully'}, status=200)
+
+    async def put(self, request, id):
+        data = parse_json(request)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        if any(not isinstance(data.get(name, {}), dict) for name in ('student', 'course')):
+            return JsonResponse({'error': 'student and course must be JSON objects'}, status=400)
+        try:
+            enrollment = await Enrollment.objects.select_related('student', 'course').aget(id=id)
+        except Enrollment.DoesNotExist:
+            return JsonResponse({'error': 'Enrollment not found'}, status=404)
+
+        view = EnrollmentGetByIdView()
+        try:
+            await run_write(sharding.on_shard, sharding.current_shard(), view.update, enrollment, data)
+        except ValidationError as e:
+            return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+        except IntegrityError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse(view.enrollment_data(enrollment), status=200)
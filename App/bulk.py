@@ -0,0 +1,215 @@
+"""
+Set-based bulk import of enrollments (and of an author's books).
+
+Students are resolved by email and courses by (title, description,
+start_date) with a handful of ``IN`` queries for the whole payload, missing
+rows are inserted with ``bulk_create`` and the enrollments themselves with
+one ``INSERT ... ON CONFLICT DO NOTHING`` so concurrent imports of the same
+pair cannot fail on ``unique_together``. The insert returns the pairs it
+wrote, so a pair another import wrote first is reported as existing, not
+created.
+
+Every value goes through its model field's ``clean()`` (lengths, email
+format, dates), and an item that fails is an error of its own.
+"""
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.db.models.constants import OnConflict
+
+from . import caching, conditional, partial, sharding
+from .models import Book, Student, Course, Enrollment
+
+# Keeps every IN (...) list well below SQLite's bound parameter limit
+IN_CHUNK_SIZE = 500
+
+
+def chunked(values, size=IN_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def parse_item(item):
+    """Validate one payload item and return ``(student, course, grade)``; raise ValueError if invalid."""
+    if not isinstance(item, dict):
+        raise ValueError('Each item must be an object')
+    student = item.get('student') or {}
+    course = item.get('course') or {}
+    if not isinstance(student, dict) or not isinstance(course, dict):
+        raise ValueError('Student and course must be objects')
+    if not student.get('name') or not student.get('email'):
+        raise ValueError('Student name and email are required')
+    if not course.get('title') or not course.get('description') or not course.get('start_date'):
+        raise ValueError('Course title, description and start_date are required')
+    values = (student['name'], student['email'], course['title'], course['description'], course['start_date'])
+    if not all(isinstance(value, str) for value in values):
+        raise ValueError('Student and course fields must be strings')
+    grade = item.get('grade')
+    return (
+        (clean(Student, 'name', student['name']), clean(Student, 'email', student['email'])),
+        (
+            clean(Course, 'title', course['title']),
+            clean(Course, 'description', course['description']),
+            clean(Course, 'start_date', course['start_date']),
+        ),
+        None if grade is None else clean(Enrollment, 'grade', grade),
+    )
+
+
+def clean(model, name, value):
+    """``value`` validated by ``model``'s field ``name``; raise ValueError naming the field if invalid."""
+    try:
+        return partial.clean(model._meta.get_field(name), value)
+    except ValidationError as e:
+        raise ValueError(f'{model._meta.verbose_name.capitalize()} {name}: {" ".join(e.messages)}')
+
+
+def resolve_students(students):
+    """Map each email in ``students`` ({email: name}) to a student id, creating missing students."""
+    def fetch(emails):
+        ids = {}
+        for chunk in chunked(emails):
+            ids.update(Student.objects.filter(email__in=chunk).values_list('email', 'id'))
+        return ids
+
+    ids = fetch(students)
+    missing = [email for email in students if email not in ids]
+    if missing:
+        Student.objects.bulk_create(
+            [Student(name=students[email], email=email) for email in missing],
+            ignore_conflicts=True,
+        )
+        ids.update(fetch(missing))
+    return ids
+
+
+def resolve_courses(keys):
+    """Map each (title, description, start_date) key to a course id, creating missing courses."""
+    def fetch(keys):
+        ids = {}
+        titles = {title for title, _, _ in keys}
+        for chunk in chunked(titles):
+            rows = Course.objects.filter(title__in=chunk).order_by('-id').values_list(
+                'title', 'description', 'start_date', 'id'
+            )
+            # Ordered newest first so the oldest matching course wins, like .first()
+            for title, description, start_date, pk in rows:
+                ids[(title, description, start_date)] = pk
+        return {key: pk for key, pk in ids.items() if key in keys}
+
+    ids = fetch(keys)
+    missing = [key for key in keys if key not in ids]
+    if missing:
+        Course.objects.bulk_create(
+            Course(title=title, description=description, start_date=start_date)
+            for title, description, start_date in missing
+        )
+        created = fetch(set(missing))
+        ids.update(created)
+        if sharding.enabled():
+            # bulk_create sends no post_save, so copy the new courses to every shard here
+            sharding.replicate(Course, list(created.values()))
+    return ids
+
+
+def existing_enrollments(pairs):
+    found = set()
+    by_student = {}
+    for student_id, course_id in pairs:
+        by_student.setdefault(student_id, set()).add(course_id)
+    for chunk in chunked(by_student):
+        rows = Enrollment.objects.filter(student_id__in=chunk).values_list('student_id', 'course_id')
+        found.update(row for row in rows if row[1] in by_student[row[0]])
+    return found
+
+
+def insert_enrollments(enrollments):
+    """
+    Insert ``enrollments``, skipping pairs that exist, and return the
+    ``(student_id, course_id)`` pairs this insert wrote. A pair another
+    transaction committed first is left out.
+    """
+    alias = router.db_for_write(Enrollment)
+    if not connections[alias].features.can_return_rows_from_bulk_insert:
+        # No RETURNING: the best answer is the pairs that did not exist when they were read
+        Enrollment.objects.bulk_create(enrollments, ignore_conflicts=True)
+        return {(enrollment.student_id, enrollment.course_id) for enrollment in enrollments}
+    fields = [field for field in Enrollment._meta.concrete_fields if not field.primary_key]
+    returning = [Enrollment._meta.get_field('student'), Enrollment._meta.get_field('course')]
+    inserted = set()
+    for chunk in chunked(enrollments, connections[alias].ops.bulk_batch_size(fields, enrollments)):
+        inserted.update(
+            Enrollment.objects.using(alias)._insert(
+                chunk, fields, returning_fields=returning, on_conflict=OnConflict.IGNORE, using=alias,
+            )
+        )
+    return inserted
+
+
+def upsert_enrollments(items):
+    """
+    Import a list of ``{"student": {...}, "course": {...}, "grade": ...}``
+    items and return one result per item with a ``created``, ``exists`` or
+    ``error`` status.
+    """
+    results = [None] * len(items)
+    parsed = {}
+    for index, item in enumerate(items):
+        try:
+            parsed[index] = parse_item(item)
+        except ValueError as e:
+            results[index] = {'index': index, 'status': 'error', 'error': str(e)}
+
+    with transaction.atomic():
+        course_ids = resolve_courses({course for _, course, _ in parsed.values()})
+
+        # Students and their enrollments are written shard by shard (a single group when unsharded)
+        groups = {}
+        for index, item in parsed.items():
+            groups.setdefault(sharding.shard_for_email(item[0][1]), {})[index] = item
+        for alias, group in groups.items():
+            sharding.on_shard(alias, upsert_group, group, course_ids, results)
+
+        # bulk_create sends no post_save, so bump the list versions here
+        conditional.bump(Student, Course, Enrollment)
+
+    return results
+
+
+def upsert_group(parsed, course_ids, results):
+    students = {}
+    for (name, email), _, _ in parsed.values():
+        students.setdefault(email, name)
+    student_ids = resolve_students(students)
+
+    pairs = {
+        index: (student_ids[email], course_ids[course])
+        for index, ((_, email), course, _) in parsed.items()
+    }
+    existing = existing_enrollments(set(pairs.values()))
+
+    # The first item of each new pair creates it, if no concurrent import got there first
+    to_create = {}
+    for index, pair in pairs.items():
+        if pair not in existing and pair not in to_create:
+            to_create[pair] = (index, Enrollment(student_id=pair[0], course_id=pair[1], grade=parsed[index][2]))
+    inserted = insert_enrollments([enrollment for _, enrollment in to_create.values()])
+
+    for index, pair in pairs.items():
+        created = pair in inserted and to_create[pair][0] == index
+        results[index] = {
+            'index': index, 'status': 'created' if created else 'exists', 'student_id': pair[0], 'course_id': pair[1],
+        }
+
+
+def insert_books(author_id, books):
+    """Insert validated ``{"book_name", "content"}`` items for author ``author_id`` in batched INSERTs."""
+    with transaction.atomic():
+        created = Book.objects.bulk_create(
+            Book(author_id=author_id, book_name=book['book_name'], content=book['content']) for book in books
+        )
+
+        # bulk_create sends no post_save, so drop the author's cached detail here
+        caching.invalidate('author', author_id)
+        conditional.bump(Book)
+    return created
@@ -0,0 +1,84 @@
+"""
+Read-through cache for the detail endpoints.
+
+Detail payloads are stored in the Django cache selected by
+``settings.APP_CACHE_ALIAS`` under ``App:detail:<name>:<pk>`` with a per
+payload TTL from ``settings.APP_CACHE_TTLS``. Entries are dropped by the
+``post_save`` / ``post_delete`` receivers in ``App.signals`` whenever the row
+or one of the related rows it embeds changes.
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+
+from . import routers
+
+DEFAULT_TTL = 300
+
+_MISSING = object()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, 'APP_CACHE_ALIAS', 'default')]
+
+
+def ttl(name):
+    return getattr(settings, 'APP_CACHE_TTLS', {}).get(name, DEFAULT_TTL)
+
+
+def detail_key(name, pk):
+    return f'App:detail:{name}:{pk}'
+
+
+def _count(name, outcome):
+    with _stats_lock:
+        _stats[name, outcome] += 1
+
+
+def cached_detail(name, pk, build):
+    """
+    Return the cached payload for ``name``/``pk``, calling ``build()`` and
+    caching its result on a miss. ``build()`` reads from the primary, since
+    every client is served what it returns. Exceptions raised by ``build``
+    (e.g. ``DoesNotExist``) propagate and nothing is cached.
+    """
+    cache = get_cache()
+    key = detail_key(name, pk)
+    payload = cache.get(key, _MISSING)
+    if payload is not _MISSING:
+        _count(name, 'hits')
+        return payload
+
+    _count(name, 'misses')
+    with routers.primary():
+        payload = build()
+    cache.set(key, payload, ttl(name))
+    return payload
+
+
+def invalidate(name, *pks):
+    if not pks:
+        return
+    cache = get_cache()
+    keys = [detail_key(name, pk) for pk in pks]
+    cache.delete_many(keys)
+    if connection.in_atomic_block:
+        # Delete again after commit in case a concurrent read re-cached the old row meanwhile
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def stats():
+    """Hit/miss counters of this process, by payload name."""
+    with _stats_lock:
+        names = sorted({name for name, _ in _stats})
+        return {name: {'hits': _stats[name, 'hits'], 'misses': _stats[name, 'misses']} for name in names}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,154 @@
+"""
+ETag / Last-Modified support for the read endpoints.
+
+Validators are computed without building the response body, so Django's
+``condition`` decorator can answer ``If-None-Match`` / ``If-Modified-Since``
+with a 304 before any list queryset is evaluated:
+
+* list endpoints use a ``ModelVersion`` row per model holding a random
+  token and the time of the last change. The receivers in ``App.signals``
+  replace it on every save and delete, and writes that send no signals call
+  ``bump()``. The row lives in the database, so every worker process sees
+  the same version, and it is written in the transaction of the change, so
+  no reader sees the new token before the new rows. A change committed on
+  another database (a shard) bumps again once it commits. Versions are read
+  through the router like the list itself, before it, so a request served
+  by a replica gets that replica's version.
+* detail endpoints use the ``updated_at`` of the rows they embed, read with
+  a single ``values_list`` query on the primary, where the cached payloads
+  they describe are built from too.
+"""
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from . import routers
+from .models import ModelVersion
+
+# Version of a model never changed since the table was created
+INITIAL_VERSION = ('0', datetime(2000, 1, 1, tzinfo=dt_timezone.utc))
+
+
+def version_label(model):
+    return model._meta.label_lower
+
+
+def new_version():
+    return uuid.uuid4().hex[:16], timezone.now()
+
+
+def model_versions(models):
+    """``(token, last_modified)`` of each of ``models``, in one query."""
+    labels = [version_label(model) for model in models]
+    found = {
+        label: (token, modified)
+        for label, token, modified in ModelVersion.objects.filter(label__in=labels).values_list('label', 'token', 'modified')
+    }
+    return [found.get(label, INITIAL_VERSION) for label in labels]
+
+
+def model_version(model):
+    """Return ``(token, last_modified)`` for ``model``."""
+    return model_versions([model])[0]
+
+
+def write_versions(models):
+    rows = []
+    for model in models:
+        token, modified = new_version()
+        rows.append(ModelVersion(label=version_label(model), token=token, modified=modified))
+    ModelVersion.objects.using(router.db_for_write(ModelVersion)).bulk_create(
+        rows, update_conflicts=True, unique_fields=['label'], update_fields=['token', 'modified'],
+    )
+
+
+def bump(*models):
+    """Record a change to ``models``; needed after writes that send no signals."""
+    models = list(dict.fromkeys(models))
+    if not models:
+        return
+    write_versions(models)
+    alias = router.db_for_write(ModelVersion)
+    for connection in connections.all(initialized_only=True):
+        if connection.alias != alias and connection.in_atomic_block:
+            # The version committed before this transaction's rows: replace it again once they are visible
+            transaction.on_commit(lambda: write_versions(models), using=connection.alias)
+
+
+class ModelVersions:
+    """Validators for a list built from ``models``."""
+
+    def __init__(self, *models):
+        self.models = models
+
+    def versions(self, request):
+        if not hasattr(request, '_model_versions'):
+            request._model_versions = model_versions(self.models)
+        return request._model_versions
+
+    def etag(self, request, *args, **kwargs):
+        return '.'.join(token for token, _ in self.versions(request))
+
+    def last_modified(self, request, *args, **kwargs):
+        return max(modified for _, modified in self.versions(request))
+
+
+class RowVersions:
+    """
+    Validators for a detail payload, from the ``updated_at``-like ``fields``
+    of the row whose pk is the ``url_kwarg`` URL argument. ``queryset`` may
+    annotate aggregates over embedded rows (e.g. a child count) to catch
+    deletes.
+    """
+
+    def __init__(self, queryset, url_kwarg, *fields):
+        self.queryset = queryset
+        self.url_kwarg = url_kwarg
+        self.fields = fields
+
+    def values(self, request, kwargs):
+        if not hasattr(request, '_row_versions'):
+            pk = kwargs[self.url_kwarg]
+            with routers.primary():
+                request._row_versions = self.queryset.filter(pk=pk).values_list(*self.fields).first()
+        return request._row_versions
+
+    def etag(self, request, *args, **kwargs):
+        values = self.values(request, kwargs)
+        if values is None:
+            return None
+        parts = [str(kwargs[self.url_kwarg])]
+        parts += [f'{value.timestamp():f}' if hasattr(value, 'timestamp') else str(value) for value in values]
+        return '-'.join(parts)
+
+    def last_modified(self, request, *args, **kwargs):
+        values = self.values(request, kwargs)
+        if values is None:
+            return None
+        return max((value for value in values if hasattr(value, 'timestamp')), default=None)
+
+
+class ByUrlKwarg:
+    """Use ``detail`` validators when ``url_kwarg`` is in the URL and ``list`` ones otherwise."""
+
+    def __init__(self, url_kwarg, detail, list):
+        self.url_kwarg = url_kwarg
+        self.detail = detail
+        self.list = list
+
+    def pick(self, kwargs):
+        return self.detail if kwargs.get(self.url_kwarg) is not None else self.list
+
+    def etag(self, request, *args, **kwargs):
+        return self.pick(kwargs).etag(request, *args, **kwargs)
+
+    def last_modified(self, request, *args, **kwargs):
+        return self.pick(kwargs).last_modified(request, *args, **kwargs)
+
+
+def conditional_get(validators):
+    """View decorator adding ETag / Last-Modified and 304 handling from ``validators``."""
+    return condition(etag_func=validators.etag, last_modified_func=validators.last_modified)
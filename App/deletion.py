@@ -0,0 +1,152 @@
+"""
+Set-based deletes for the delete endpoints.
+
+``Model.delete()`` and ``QuerySet.delete()`` go through Django's deletion
+collector, which loads every row to delete (and every cascaded child, e.g.
+all the books of an author) so it can send ``pre_delete``/``post_delete``
+for each. The only receivers of those signals here are the ones in
+``App.signals``, which drop cached detail payloads and bump list versions.
+With ``settings.APP_DELETION['FAST']`` (the default) these functions skip
+the collector: they issue plain ``DELETE ... WHERE`` statements, children
+first, and do that bookkeeping themselves, the way ``partial.update_columns``
+does for UPDATEs. Turn ``FAST`` off if you connect delete receivers of your
+own; every delete then goes through the collector again.
+
+``bulk_delete`` removes the rows of a queryset ``BATCH_SIZE`` at a time,
+each batch a separate write (and transaction), so deleting millions of rows
+never holds the database lock for the whole job. Each batch starts after the
+last id of the previous one, so a filter on an unindexed column scans the
+table once in all, not once per batch; ``bulk_delete_ids`` does
+the same for a list of ids, which it also splits into batches.
+"""
+from django.conf import settings
+from django.db import router, transaction
+
+from . import caching, conditional, sharding, writer
+from .models import Task, Author, Book, Enrollment
+
+DEFAULTS = {
+    'FAST': True,
+    'BATCH_SIZE': 500,
+}
+
+# Detail payload dropped when a row is deleted: (cache name, column holding its id)
+CACHED_AS = {
+    Task: ('task', 'id'),
+    Book: ('author', 'author_id'),
+    Enrollment: ('enrollment', 'id'),
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'APP_DELETION', {})}
+
+
+def writable(queryset):
+    """``queryset`` on the database its model's writes go to (plain reads may go to a replica)."""
+    return queryset.using(router.db_for_write(queryset.model))
+
+
+def raw_delete(queryset):
+    """DELETE the rows of ``queryset`` in one statement: no rows loaded, no signals, no cascades."""
+    return queryset._raw_delete(queryset.db)
+
+
+def collector_delete(queryset):
+    """``queryset.delete()``, returning only how many rows of its model were deleted."""
+    return queryset.delete()[1].get(queryset.model._meta.label, 0)
+
+
+def delete_task(pk):
+    """Delete task ``pk``; return how many rows were deleted (0 or 1)."""
+    queryset = writable(Task.objects.filter(pk=pk))
+    if not get_config()['FAST']:
+        return collector_delete(queryset)
+    deleted = raw_delete(queryset)
+    if deleted:
+        caching.invalidate('task', pk)
+        conditional.bump(Task)
+    return deleted
+
+
+def delete_enrollment(pk):
+    """Delete enrollment ``pk`` (on the selected shard); return 0 or 1."""
+    queryset = writable(Enrollment.objects.filter(pk=pk))
+    if not get_config()['FAST']:
+        return collector_delete(queryset)
+    deleted = raw_delete(queryset)
+    if deleted:
+        caching.invalidate('enrollment', pk)
+        conditional.bump(Enrollment)
+    return deleted
+
+
+def delete_author(pk):
+    """Delete author ``pk`` and its books; return 0 or 1 (authors deleted)."""
+    queryset = writable(Author.objects.filter(pk=pk))
+    if not get_config()['FAST']:
+        return collector_delete(queryset)
+    with transaction.atomic(using=queryset.db):
+        # The books first, as the collector would, in one statement however many there are
+        books = raw_delete(writable(Book.objects.filter(author_id=pk)))
+        deleted = raw_delete(queryset)
+    if deleted:
+        # The books are only cached inside their author's payload
+        caching.invalidate('author', pk)
+        conditional.bump(Author, *([Book] if books else []))
+    return deleted
+
+
+def delete_batch(queryset, size, after=None):
+    """
+    Delete up to ``size`` rows of ``queryset`` with ids above ``after``,
+    lowest ids first. Return ``(deleted, last)``: ``last`` is the highest id
+    of the batch, where the next one starts, or None once the rows ran out.
+    """
+    model = queryset.model
+    name, column = CACHED_AS[model]
+    if after is not None:
+        # Keyset: start where the previous batch stopped instead of scanning its rows again
+        queryset = queryset.filter(pk__gt=after)
+    with transaction.atomic(using=queryset.db):
+        rows = list(queryset.order_by('pk').values_list('pk', column)[:size])
+        if not rows:
+            return 0, None
+        batch = model._base_manager.using(queryset.db).filter(pk__in=[pk for pk, _ in rows])
+        if not get_config()['FAST']:
+            deleted = collector_delete(batch)
+        else:
+            deleted = raw_delete(batch)
+            caching.invalidate(name, *{key for _, key in rows})
+            conditional.bump(model)
+    return deleted, rows[-1][0] if len(rows) == size else None
+
+
+def bulk_delete(queryset, batch_size=None, progress=None):
+    """
+    Delete every row of ``queryset`` (a Task, Book or Enrollment queryset),
+    one batch per write; return how many rows were deleted. Enrollments are
+    deleted shard by shard. ``progress`` is called with the running total
+    after each batch.
+    """
+    batch_size = batch_size or get_config()['BATCH_SIZE']
+    total = 0
+    for part in sharding.scatter(writable(queryset)):
+        last = None
+        while True:
+            deleted, last = writer.run(delete_batch, part, batch_size, last)
+            total += deleted
+            if progress is not None:
+                progress(total)
+            if last is None:
+                break
+    return total
+
+
+def bulk_delete_ids(model, ids, batch_size=None):
+    """``bulk_delete`` of the ``model`` rows with the given ids, taking the ids a batch at a time."""
+    batch_size = batch_size or get_config()['BATCH_SIZE']
+    return sum(
+        bulk_delete(model.objects.filter(pk__in=ids[start:start + batch_size]), batch_size)
+        for start in range(0, len(ids), batch_size)
+    )
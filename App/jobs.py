@@ -0,0 +1,289 @@
+"""
+Background jobs stored in the database, run by ``manage.py run_workers``.
+
+Operations too long for a request (deleting an author with a huge number of
+books, large book or enrollment imports, rebuilding a search index) are
+queued as ``Job`` rows instead. The endpoints do this when a client sends
+``Prefer: respond-async``: they answer ``202 Accepted`` with the job id and
+a ``Location`` to poll (``/api/jobs/<id>/``). No broker is involved: the
+job table is the queue.
+
+Workers claim the oldest due job with a conditional ``UPDATE ... WHERE
+status = 'queued'``, so two workers (threads or processes) never run the
+same job. A handler reports progress with ``report()``, which doubles as the
+worker's heartbeat. A failing job is retried after ``RETRY_DELAY`` seconds,
+doubled on every attempt, until ``max_attempts`` is used up. A job whose
+worker stops heartbeating for ``LEASE`` seconds (the process died) is
+claimed again by another worker. A job kind whose work is one long
+statement with no point to heartbeat in (an FTS rebuild) gets a longer
+lease of its own in ``LEASES``.
+
+Handlers are registered with ``@handler('kind')`` and called as
+``fn(job, **job.payload)``; what they return is stored as the job's result.
+The import handlers write a chunk and its progress in one transaction
+(``step()``), so a retry resumes after the last committed chunk.
+"""
+import os
+import socket
+import threading
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+
+from . import bulk, deletion, search, writer
+from .models import Job, Author, Book
+from .serialization import format_datetime
+
+DEFAULTS = {
+    'THREADS': 2,
+    'POLL_INTERVAL': 1.0,  # seconds an idle worker thread waits before looking again
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 5,  # seconds before the first retry, doubled on each later one
+    'LEASE': 300,  # seconds without a heartbeat before a running job is taken over
+    'LEASES': {'rebuild_search_index': 3600},  # LEASE for kinds that cannot heartbeat while they work
+    'CHUNK_SIZE': 500,  # rows per write in the import handlers
+}
+
+HANDLERS = {}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'APP_JOBS', {})}
+
+
+def handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def queue():
+    """The job table on the primary database: workers and pollers must not read a lagging replica."""
+    return Job.objects.using(router.db_for_write(Job))
+
+
+def enqueue(kind, payload=None, max_attempts=None):
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind {kind!r}')
+    return queue().create(
+        kind=kind,
+        payload=payload or {},
+        max_attempts=max_attempts or get_config()['MAX_ATTEMPTS'],
+        run_after=timezone.now(),
+    )
+
+
+def stale(now):
+    """Running jobs whose worker has not heartbeated within their kind's lease."""
+    config = get_config()
+    leases = config['LEASES']
+    expired = Q(locked_at__lt=now - timedelta(seconds=config['LEASE'])) & ~Q(kind__in=leases)
+    for kind, seconds in leases.items():
+        expired |= Q(kind=kind, locked_at__lt=now - timedelta(seconds=seconds))
+    return Q(status=Job.RUNNING) & expired
+
+
+def claim(worker):
+    """Mark the oldest due job as running by ``worker`` and return it, or None if there is none."""
+    now = timezone.now()
+    stale_jobs = stale(now)
+    # A job that keeps killing its worker is given up once its attempts are used
+    queue().filter(stale_jobs, attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, error='The worker running the job stopped responding.', locked_by='', updated_at=now,
+    )
+    due = Q(status=Job.QUEUED, run_after__lte=now) | stale_jobs
+    while True:
+        pk = queue().filter(due).order_by('run_after', 'id').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        # Only one worker's UPDATE still finds the job due; the others look for the next one
+        claimed = queue().filter(due, pk=pk).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1, updated_at=now,
+        )
+        if claimed:
+            return queue().get(pk=pk)
+
+
+def report(job, progress, total=None):
+    """Record ``progress`` (out of ``total``, if known) for the running ``job``; also its heartbeat."""
+    job.progress = progress
+    if total is not None:
+        job.total = total
+    now = timezone.now()
+    writer.run(
+        queue().filter(pk=job.pk).update, progress=job.progress, total=job.total, locked_at=now, updated_at=now,
+    )
+
+
+def step(job, done, fn, *args):
+    """
+    Run the write ``fn(*args)`` and record ``done`` as the job's progress in
+    the same transaction, so a retried job can resume after the last step.
+    """
+    def write():
+        with transaction.atomic(using=queue().db):
+            result = fn(*args)
+            report(job, done)
+        return result
+    return writer.run(write)
+
+
+def finish(job, result=None, error=None):
+    now = timezone.now()
+    values = {'locked_by': '', 'updated_at': now}
+    if error is None:
+        values.update(status=Job.SUCCEEDED, result=result, error='')
+        if job.total is not None:
+            values['progress'] = job.total
+    elif job.attempts < job.max_attempts:
+        delay = get_config()['RETRY_DELAY'] * 2 ** (job.attempts - 1)
+        values.update(status=Job.QUEUED, error=error, run_after=now + timedelta(seconds=delay))
+    else:
+        values.update(status=Job.FAILED, error=error)
+    writer.run(queue().filter(pk=job.pk).update, **values)
+    for name, value in values.items():
+        setattr(job, name, value)
+
+
+def run_next(worker):
+    """Claim and run one job; return it, or None when nothing is due."""
+    job = writer.run(claim, worker)
+    if job is None:
+        return None
+    try:
+        result = HANDLERS[job.kind](job, **job.payload)
+    except Exception:
+        finish(job, error=traceback.format_exc())
+    else:
+        finish(job, result=result)
+    return job
+
+
+class Worker:
+    """``threads`` loops claiming and running jobs until ``stop`` is set (or, with ``once``, the queue is empty)."""
+
+    def __init__(self, threads=None, poll_interval=None, name=None):
+        config = get_config()
+        self.threads = threads or config['THREADS']
+        self.poll_interval = config['POLL_INTERVAL'] if poll_interval is None else poll_interval
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.stop = threading.Event()
+
+    def run(self, once=False):
+        if self.threads == 1:
+            # No pool needed: work in the calling thread
+            return self.loop(f'{self.name}/0', once)
+        pool = [
+            threading.Thread(target=self.work, args=(f'{self.name}/{index}', once), name=f'App-job-worker-{index}')
+            for index in range(self.threads)
+        ]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+
+    def work(self, name, once):
+        try:
+            self.loop(name, once)
+        finally:
+            # Each worker thread opened its own connections
+            connections.close_all()
+
+    def loop(self, name, once):
+        while not self.stop.is_set():
+            if run_next(name) is None:
+                if once:
+                    return
+                self.stop.wait(self.poll_interval)
+
+
+# Endpoint helpers
+
+def wants_async(request):
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+
+def accepted(job):
+    """``202 Accepted`` pointing the client at the job's status."""
+    url = reverse('JobView', args=[job.pk])
+    response = JsonResponse({'job_id': job.pk, 'status': job.status, 'status_url': url}, status=202)
+    response['Location'] = url
+    return response
+
+
+def job_data(job):
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'result': job.result,
+        'error': job.error,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'created_at': format_datetime(job.created_at),
+        'updated_at': format_datetime(job.updated_at),
+    }
+
+
+# Handlers
+
+@handler('delete_author')
+def delete_author(job, author_id):
+    # The books go in bounded batches first, so no single transaction holds the lock for long
+    books = Book.objects.filter(author_id=author_id)
+    report(job, 0, books.count())
+    deleted_books = deletion.bulk_delete(books, progress=lambda done: report(job, done))
+    deleted = writer.run(deletion.delete_author, author_id)
+    return {'authors': deleted, 'books': deleted_books}
+
+
+@handler('import_books')
+def import_books(job, author_id, books):
+    if not Author.objects.filter(pk=author_id).exists():
+        return {'created': 0, 'error': 'Author not found'}
+    size = get_config()['CHUNK_SIZE']
+    # A retry starts after the chunks an earlier attempt committed
+    done = job.progress
+    report(job, done, len(books))
+    for start in range(done, len(books), size):
+        step(job, min(start + size, len(books)), bulk.insert_books, author_id, books[start:start + size])
+    return {'created': len(books)}
+
+
+@handler('import_enrollments')
+def import_enrollments(job, items):
+    size = get_config()['CHUNK_SIZE']
+    # Counts cover the items of this attempt; a retry starts after the chunks earlier ones committed
+    counts = {'created': 0, 'exists': 0, 'error': 0}
+    errors = []
+    done = job.progress
+    report(job, done, len(items))
+    for start in range(done, len(items), size):
+        results = step(job, min(start + size, len(items)), bulk.upsert_enrollments, items[start:start + size])
+        for result in results:
+            counts[result['status']] += 1
+            if result['status'] == 'error':
+                errors.append({**result, 'index': start + result['index']})
+    return {'created': counts['created'], 'existing': counts['exists'], 'errors': counts['error'], 'error_items': errors}
+
+
+@handler('rebuild_search_index')
+def rebuild_search_index(job, index, optimize=False):
+    target = search.INDEXES[index]
+    # The rebuild is a single statement, so this is the last heartbeat until it ends: the kind has a LEASES entry
+    report(job, 0, 1)
+    if optimize:
+        target.optimize()
+    else:
+        target.rebuild()
+    return {'index': index, 'action': 'optimized' if optimize else 'rebuilt'}
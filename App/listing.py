@@ -0,0 +1,221 @@
+"""
+Querysets and payload builders for the list endpoints.
+
+Each listing pairs a ``values_list`` queryset that reads every column the
+payload needs in one query (following foreign keys with joins) with a
+function that turns a batch of rows into response dicts. Nested one-to-many
+payloads add one query per batch for the children. A list endpoint therefore
+costs the same small, fixed number of queries no matter how many rows it
+returns. Rows are tuples whose first item is the primary key.
+
+``project()`` narrows a listing to the ``?fields=`` a client asked for
+(sparse fieldsets): only the requested columns are selected, and the books
+query of the author listing is skipped unless ``books`` fields are wanted.
+"""
+from .models import Task, CrudUser, Author, Book, Enrollment
+from .serialization import FieldPlan, FieldsError
+
+
+# Tasks
+
+TASK_PLAN = FieldPlan(Task, {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'created_at': 'created_at',
+})
+
+
+def task_queryset():
+    return TASK_PLAN.values(Task.objects.order_by('id'))
+
+
+def serialize_tasks(rows):
+    return TASK_PLAN.to_dicts(rows)
+
+
+# Users and profiles (one-to-one)
+
+# Follows the reverse one-to-one with a LEFT JOIN, so users without a
+# profile get None for bio and website
+USER_PLAN = FieldPlan(CrudUser, {
+    'id': 'id',
+    'username': 'username',
+    'email': 'email',
+    'profile.bio': 'userprofile__bio',
+    'profile.website': 'userprofile__website',
+})
+
+
+def user_queryset():
+    return USER_PLAN.values(CrudUser.objects.order_by('id'))
+
+
+def serialize_users(rows):
+    return USER_PLAN.to_dicts(rows)
+
+
+# Authors and books (one-to-many)
+
+AUTHOR_PLAN = FieldPlan(Author, {
+    'id': 'id',
+    'author_name': 'name',
+    'bio': 'bio',
+})
+
+AUTHOR_BOOK_PLAN = FieldPlan(Book, {
+    'author_id': 'author_id',
+    'id': 'id',
+    'book_name': 'book_name',
+    'content': 'content',
+    'created_at': 'created_at',
+})
+
+
+def author_queryset():
+    return AUTHOR_PLAN.values(Author.objects.order_by('id'))
+
+
+# Book keys of the author payload; author_id only groups the books
+AUTHOR_BOOK_KEYS = tuple(key for key in AUTHOR_BOOK_PLAN.keys if key != 'author_id')
+
+
+def books_queryset(author_ids, plan=AUTHOR_BOOK_PLAN):
+    return plan.values(Book.objects.filter(author_id__in=author_ids).order_by('id'))
+
+
+def attach_books(authors, author_ids, book_rows, plan=AUTHOR_BOOK_PLAN):
+    books = {author_id: [] for author_id in author_ids}
+    for book in plan.to_dicts(book_rows):
+        books[book.pop('author_id')].append(book)
+    for author, author_id in zip(authors, author_ids):
+        author['books'] = books[author_id]
+    return authors
+
+
+def serialize_authors(rows, author_plan=AUTHOR_PLAN, book_plan=AUTHOR_BOOK_PLAN):
+    rows = list(rows)
+    authors = author_plan.to_dicts(rows)
+    if not authors or book_plan is None:
+        return authors
+    # One query for the books of every author in the batch
+    author_ids = [row[0] for row in rows]
+    return attach_books(authors, author_ids, books_queryset(author_ids, book_plan), book_plan)
+
+
+async def aserialize_authors(rows, author_plan=AUTHOR_PLAN, book_plan=AUTHOR_BOOK_PLAN):
+    """``serialize_authors`` for async views, reading the books with the async ORM."""
+    authors = author_plan.to_dicts(rows)
+    if not authors or book_plan is None:
+        return authors
+    author_ids = [row[0] for row in rows]
+    book_rows = [row async for row in books_queryset(author_ids, book_plan)]
+    return attach_books(authors, author_ids, book_rows, book_plan)
+
+
+BOOK_PLAN = FieldPlan(Book, {
+    'id': 'id',
+    'author_id': 'author_id',
+    'book_name': 'book_name',
+    'content': 'content',
+    'created_at': 'created_at',
+})
+
+
+def book_queryset():
+    return BOOK_PLAN.values(Book.objects.order_by('id'))
+
+
+def serialize_books(rows):
+    return BOOK_PLAN.to_dicts(rows)
+
+
+# Enrollments (many-to-many through Enrollment)
+
+ENROLLMENT_PLAN = FieldPlan(Enrollment, {
+    'student.id': 'student__id',
+    'student.name': 'student__name',
+    'student.email': 'student__email',
+    'course.id': 'course__id',
+    'course.title': 'course__title',
+    'course.description': 'course__description',
+    'course.start_date': 'course__start_date',
+    'grade': 'grade',
+    'id': 'id',
+})
+
+
+def enrollment_queryset():
+    return ENROLLMENT_PLAN.values(Enrollment.objects.order_by('id'))
+
+
+def serialize_enrollments(rows):
+    return ENROLLMENT_PLAN.to_dicts(rows)
+
+
+# Querysets and serializers by resource name, used by the export endpoint
+RESOURCES = {
+    'tasks': (task_queryset, serialize_tasks),
+    'users': (user_queryset, serialize_users),
+    'authors': (author_queryset, serialize_authors),
+    'books': (book_queryset, serialize_books),
+    'enrollments': (enrollment_queryset, serialize_enrollments),
+}
+
+
+# Sparse fieldsets
+
+FLAT_PLANS = {
+    'tasks': TASK_PLAN,
+    'users': USER_PLAN,
+    'books': BOOK_PLAN,
+    'enrollments': ENROLLMENT_PLAN,
+}
+
+
+def requested_fields(request):
+    """The ``?fields=a,b,books.c`` list, or None when the parameter is absent."""
+    value = request.GET.get('fields')
+    if value is None:
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    if not fields:
+        raise FieldsError('fields must name at least one field.')
+    return fields
+
+
+def project(resource, fields, asynchronous=False):
+    """
+    ``(queryset, serialize)`` for the ``resource`` listing reduced to
+    ``fields`` (every field when None). ``asynchronous`` returns the
+    coroutine serializer the async views need for authors.
+    """
+    if resource == 'authors':
+        return project_authors(fields, asynchronous)
+    if fields is None:
+        queryset, serialize = RESOURCES[resource]
+        return queryset(), serialize
+    plan = FLAT_PLANS[resource].subset(fields)
+    return plan.values(plan.model.objects.order_by('id')), plan.to_dicts
+
+
+def project_authors(fields, asynchronous):
+    serialize = aserialize_authors if asynchronous else serialize_authors
+    if fields is None:
+        return author_queryset(), serialize
+
+    author_fields = [field for field in fields if field != 'books' and not field.startswith('books.')]
+    book_fields = [field[len('books.'):] for field in fields if field.startswith('books.')]
+    author_plan = AUTHOR_PLAN.subset(author_fields)
+    book_plan = None
+    if 'books' in fields or book_fields:
+        book_fields = AUTHOR_BOOK_KEYS if 'books' in fields else book_fields
+        unknown = set(book_fields) - set(AUTHOR_BOOK_KEYS)
+        if unknown:
+            raise FieldsError(f'Unknown field {"books." + sorted(unknown)[0]!r}.')
+        book_plan = AUTHOR_BOOK_PLAN.subset(('author_id', *book_fields))
+
+    def serialize_projection(rows):
+        return serialize(rows, author_plan, book_plan)
+
+    return author_plan.values(Author.objects.order_by('id')), serialize_projection
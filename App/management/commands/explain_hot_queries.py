@@ -0,0 +1,165 @@
+"""
+Run every API route once, capture the SQL it issues and print SQLite's
+``EXPLAIN QUERY PLAN`` for each statement, flagging full table scans.
+
+    python manage.py explain_hot_queries [--fail-on-scan] [--verbose]
+
+Each probe runs in a transaction that is rolled back, so write routes leave
+the database untouched. List routes are probed the way clients page through
+them (``?limit=&cursor=``); an unpaginated full listing is a scan by design.
+Routes that read a whole table on purpose (exports, bulk deletes filtered on
+an unindexed column, which read it once in all) are probed too, but their
+scans are reported as expected and do not count for ``--fail-on-scan``.
+"""
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from App.pagination import encode_cursor
+
+CURSOR = encode_cursor(0)
+
+STUDENT_COURSE = {
+    'student': {'name': 'Probe', 'email': 'probe@example.com'},
+    'course': {'title': 'Probe', 'description': 'Probe', 'start_date': '2024-09-01'},
+    'grade': 'A',
+}
+
+# (method, path, JSON body) for every route in App/urls.py
+PROBES = [
+    ('POST', '/api/mymodel/', {'title': 'Probe', 'description': 'Probe'}),
+    ('GET', f'/api/getmymodel/?limit=50&cursor={CURSOR}', None),
+    ('GET', '/api/getbyid/1/', None),
+    ('DELETE', '/api/tasks/1/delete/', None),
+    ('PUT', '/api/put/1/', {'title': 'Probe'}),
+    ('PATCH', '/api/put/1/', {'title': 'Probe'}),
+    ('POST', '/api/create/', {'username': 'probe', 'email': 'probe@example.com', 'bio': 'Probe'}),
+    ('GET', f'/api/get_all/?limit=50&cursor={CURSOR}', None),
+    ('GET', '/api/get_by_id/1/', None),
+    ('PUT', '/api/put_one_by_one/1/', {'bio': 'Probe'}),
+    ('PATCH', '/api/put_one_by_one/1/', {'bio': 'Probe'}),
+    ('POST', '/api/post_one_to_many/', {
+        'author_name': 'Probe', 'author_bio': 'Probe', 'books': [{'book_name': 'Probe', 'content': 'Probe'}],
+    }),
+    ('POST', '/api/only_author_post_one_to_many/', {'author_name': 'Probe', 'author_bio': 'Probe'}),
+    ('POST', '/api/only_book_post_one_to_many/1/', [{'book_name': 'Probe', 'content': 'Probe'}]),
+    ('GET', f'/api/get_all_authors_one_to_many/?limit=50&cursor={CURSOR}', None),
+    ('GET', '/api/get_author_detail_by_id_one_to_many/1/', None),
+    ('PUT', '/api/update_book_one_to_many/1/', {'book_name': 'Probe', 'author_id': 1}),
+    ('PATCH', '/api/update_book_one_to_many/1/', {'book_name': 'Probe'}),
+    ('DELETE', '/api/delete_author_one_to_many/1/', None),
+    ('DELETE', '/api/delete_book_one_to_many/1/1/', None),
+    ('POST', '/api/create_student_course_many_to_many/', STUDENT_COURSE),
+    ('POST', '/api/bulk_create_student_course_many_to_many/', [STUDENT_COURSE]),
+    ('GET', f'/api/get_student_course_many_to_many/?limit=50&cursor={CURSOR}', None),
+    ('GET', '/api/get_student_course_many_to_many/1/', None),
+    ('PUT', '/api/put_student_course_many_to_many/1/', STUDENT_COURSE),
+    ('DELETE', '/api/delete_student_course_many_to_many/1/', None),
+    ('POST', '/api/bulk_delete/tasks/', {'ids': [1, 2]}),
+    ('POST', '/api/bulk_delete/books/', {'filter': {'author_id': 1}}),
+    ('GET', '/api/jobs/1/', None),
+    ('GET', '/api/search/books/?q=probe&limit=20', None),
+    ('GET', '/api/search/tasks/?q=pro*&limit=20', None),
+]
+
+# Routes that read a whole table by design: their scans are listed but expected
+WHOLE_TABLE_PROBES = [
+    ('POST', '/api/bulk_delete/tasks/', {'filter': {'title': 'Probe'}}),
+    ('POST', '/api/bulk_delete/enrollments/', {'filter': {'grade': 'A'}}),
+    ('GET', '/api/export/tasks/?format=ndjson', None),
+    ('GET', '/api/export/authors/?format=ndjson', None),
+]
+
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+
+def is_full_scan(detail):
+    # "SCAN App_task" reads every row; "SCAN ... USING [COVERING] INDEX" walks an index, and
+    # "SCAN App_book_fts VIRTUAL TABLE INDEX 0:M2" is a full-text MATCH served by the FTS index
+    if not detail.startswith('SCAN ') or ' USING ' in detail:
+        return False
+    _, virtual, index = detail.partition(' VIRTUAL TABLE INDEX ')
+    return not (virtual and index.partition(':')[2])
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN QUERY PLAN for every query the API issues and flag full table scans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail-on-scan', action='store_true', help='Exit with an error if a full scan is found.')
+        parser.add_argument('--verbose', action='store_true', help='Print the plan of every query, not just scans.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('explain_hot_queries reads SQLite query plans; the default database is not SQLite.')
+
+        statements, expected = self.capture()
+        scans = expected_scans = 0
+        for sql, routes in statements.items():
+            plan = self.explain(sql)
+            flagged = [detail for detail in plan if is_full_scan(detail)]
+            if flagged and sql in expected:
+                expected_scans += 1
+                label, style = 'EXPECTED SCAN', self.style.WARNING
+            elif flagged:
+                scans += 1
+                label, style = 'FULL SCAN', self.style.ERROR
+            else:
+                label, style = 'ok', self.style.SUCCESS
+            if flagged or options['verbose']:
+                self.stdout.write(style(f'{label}: {", ".join(sorted(routes))}'))
+                self.stdout.write(f'  {sql}')
+                for detail in plan:
+                    self.stdout.write(f'    {detail}')
+
+        routes = len(PROBES) + len(WHOLE_TABLE_PROBES)
+        self.stdout.write(
+            f'{len(statements)} distinct queries from {routes} routes, {scans} with full table scans '
+            f'({expected_scans} more expected).'
+        )
+        if scans and options['fail_on_scan']:
+            raise CommandError(f'{scans} queries scan a whole table.')
+
+    def capture(self):
+        """
+        Return ``({sql: set of routes}, set of sql)`` for the statements issued
+        by every probe; the set holds those only whole-table probes issued.
+        """
+        statements = {}
+        client = Client()
+        # Detail payloads would otherwise be served from the cache without touching the database
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        # Probes of missing ids log "Not Found" warnings that are expected here
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            self.run_probes(client, caches, PROBES, statements)
+            hot = set(statements)
+            self.run_probes(client, caches, WHOLE_TABLE_PROBES, statements)
+        finally:
+            request_logger.setLevel(level)
+        return statements, set(statements) - hot
+
+    def run_probes(self, client, caches, probes, statements):
+        with override_settings(ALLOWED_HOSTS=['testserver'], CACHES=caches):
+            for method, path, body in probes:
+                with CaptureQueriesContext(connection) as queries, transaction.atomic():
+                    response = client.generic(method, path, json.dumps(body) if body is not None else '', 'application/json')
+                    if response.streaming:
+                        # A streamed body runs its queries as it is read
+                        b''.join(response.streaming_content)
+                    transaction.set_rollback(True)
+                for query in queries:
+                    sql = query['sql']
+                    if sql.lstrip().upper().startswith(EXPLAINABLE):
+                        statements.setdefault(sql, set()).add(f'{method} {path.split("?")[0]}')
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
@@ -0,0 +1,40 @@
+"""
+Export the App tables to a dump directory (App/transfer.py).
+
+    python manage.py export_data DIR [--format ndjson|csv] [--model task ...] [--resume]
+
+Writes ``DIR/<model>.<format>`` for every model (or each ``--model``),
+streaming rows so memory use does not grow with the tables. ``--resume``
+skips models whose file is already complete, e.g. after an interrupted run.
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from App import transfer
+
+
+class Command(BaseCommand):
+    help = 'Export the App tables as NDJSON or CSV files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--format', choices=transfer.FORMATS, default='ndjson')
+        parser.add_argument('--model', choices=transfer.MODELS, action='append',
+                            help='Model to export (repeatable; default: all).')
+        parser.add_argument('--chunk-size', type=int, default=transfer.CHUNK_SIZE, help='Rows fetched per query.')
+        parser.add_argument('--resume', action='store_true', help='Skip models whose file already exists.')
+
+    def handle(self, *args, **options):
+        directory, fmt = options['directory'], options['format']
+        os.makedirs(directory, exist_ok=True)
+        for name in options['model'] or transfer.MODELS:
+            path = transfer.path_for(directory, name, fmt)
+            if options['resume'] and os.path.exists(path):
+                self.stdout.write(f'{name}: already exported')
+                continue
+            start = time.perf_counter()
+            count = transfer.export_model(transfer.MODELS[name], path, fmt, options['chunk_size'])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{name}: {count:,} rows in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)')
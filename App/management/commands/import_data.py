@@ -0,0 +1,64 @@
+"""
+Load a dump directory written by ``export_data`` (App/transfer.py).
+
+    python manage.py import_data DIR [--model task ...] [--batch-size 5000] [--resume]
+
+Loads every ``DIR/<model>.ndjson`` or ``.csv`` present, parents before
+children, keeping the exported ids. Each batch is committed on its own and
+checkpointed in ``DIR``; after a failure, rerun with ``--resume`` to carry
+on from the last committed batch. Without ``--resume`` the checkpoint is
+discarded and every file is read from the start; rows that are already in
+the database as the dump has them are skipped, not duplicated, and counted
+as present. A different row holding a dump row's id or unique key stops
+the import with an error (see App/transfer.py).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from App import transfer
+
+
+class Command(BaseCommand):
+    help = 'Import the App tables from NDJSON or CSV files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--model', choices=transfer.MODELS, action='append',
+                            help='Model to import (repeatable; default: every file in the dump).')
+        parser.add_argument('--batch-size', type=int, default=transfer.CHUNK_SIZE, help='Rows per transaction.')
+        parser.add_argument('--resume', action='store_true', help='Continue from the checkpoint of an earlier run.')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        checkpoint = transfer.Checkpoint(directory, options['resume'])
+        if not options['resume']:
+            checkpoint.clear()
+
+        names = options['model'] or transfer.MODELS
+        found = {name: transfer.find_file(directory, name) for name in transfer.MODELS if name in names}
+        if not any(found.values()):
+            raise CommandError(f'No dump files in {directory}.')
+
+        for name, dump in found.items():
+            if dump is None:
+                continue
+            path, fmt = dump
+            start = time.perf_counter()
+            try:
+                count, skipped, present = transfer.import_model(
+                    transfer.MODELS[name], path, fmt, checkpoint, name, options['batch_size'],
+                )
+            except transfer.DumpError as e:
+                raise CommandError(f'{name}: {e}')
+            elapsed = time.perf_counter() - start
+            notes = []
+            if skipped:
+                notes.append(f'resumed after {skipped:,}')
+            if present:
+                notes.append(f'{present:,} already present')
+            note = f' ({", ".join(notes)})' if notes else ''
+            self.stdout.write(
+                f'{name}: {count:,} rows in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} rows/s){note}'
+            )
+        checkpoint.clear()
@@ -0,0 +1,45 @@
+"""
+Create the schema on every shard in ``APP_SHARDS`` and give each shard its
+own id range.
+
+    python manage.py init_shards
+
+Safe to run again after adding migrations or shards: migrations are applied
+where missing and an id sequence is only ever moved forward. Students and
+enrollments already stored in ``default`` are not moved.
+"""
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from App import sharding
+from App.models import Student, Enrollment
+
+
+def reserve_id_range(alias):
+    """Make the shard's next student / enrollment ids start at ``sharding.first_id(alias)``."""
+    start = sharding.first_id(alias) - 1
+    connection = connections[alias]
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        for model in (Student, Enrollment):
+            table = model._meta.db_table
+            cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, start])
+            elif row[0] < start:
+                cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [start, table])
+
+
+class Command(BaseCommand):
+    help = 'Migrate every shard in APP_SHARDS and reserve its id range.'
+
+    def handle(self, *args, **options):
+        if not sharding.enabled():
+            raise CommandError('No shards configured; set DJANGO_CRUD_SHARDS.')
+        for alias in sharding.shards():
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'Shard {alias!r} is not a SQLite database.')
+            call_command('migrate', database=alias, verbosity=0, interactive=False)
+            reserve_id_range(alias)
+            self.stdout.write(f'{alias}: ids from {sharding.first_id(alias)}')
@@ -0,0 +1,19 @@
+"""
+Print a value for the request profiling header (App/profiling.py).
+
+    python manage.py profile_token
+    curl -H "X-App-Profile: $(python manage.py profile_token)" http://localhost:8000/api/get_all_authors_one_to_many/
+
+The token is signed with ``SECRET_KEY`` and expires after
+``APP_PROFILING['TOKEN_MAX_AGE']`` seconds.
+"""
+from django.core.management.base import BaseCommand
+
+from App import profiling
+
+
+class Command(BaseCommand):
+    help = 'Print a signed token that turns on profiling for requests carrying it.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(profiling.make_token())
@@ -0,0 +1,45 @@
+"""
+Rebuild the full-text search indexes (App/search.py) from their tables.
+
+    python manage.py rebuild_search_index [--index books|tasks] [--optimize] [--background]
+
+The triggers keep the indexes current, so this is only needed after
+restoring a table from outside SQLite's view (e.g. an old backup of the
+index) or to check the index after a crash. ``--optimize`` merges each
+index into a single b-tree instead, which speeds up queries after many
+writes. ``--background`` queues the work as a job for ``run_workers``
+(App/jobs.py) and returns at once.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from App import jobs, search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild (or optimize) the FTS5 search indexes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--index', choices=search.INDEXES, action='append',
+                            help='Index to process (repeatable; default: all).')
+        parser.add_argument('--optimize', action='store_true', help='Merge the index instead of rebuilding it.')
+        parser.add_argument('--background', action='store_true', help='Queue a job per index for run_workers.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The search indexes are SQLite FTS5 tables; the default database is not SQLite.')
+        for name in options['index'] or search.INDEXES:
+            if options['background']:
+                job = jobs.enqueue('rebuild_search_index', {'index': name, 'optimize': options['optimize']})
+                self.stdout.write(f'{name}: queued job {job.pk}')
+                continue
+            index = search.INDEXES[name]
+            start = time.perf_counter()
+            if options['optimize']:
+                index.optimize()
+            else:
+                index.rebuild()
+            action = 'optimized' if options['optimize'] else 'rebuilt'
+            self.stdout.write(f'{name}: {action} {index.fts_table} in {time.perf_counter() - start:.1f}s')
@@ -0,0 +1,62 @@
+"""
+Copy the primary SQLite database into the read replicas.
+
+    python manage.py replicate_db [--alias replica_1 ...] [--to PATH] [--interval SECONDS]
+
+Uses SQLite's online backup API, so the copy is a consistent snapshot even
+while the primary is being written to, and replica readers see either the
+old or the new snapshot. With ``--interval`` the command keeps running and
+refreshes the replicas every ``SECONDS``; keep that below
+``APP_READ_YOUR_WRITES_SECONDS`` so clients pinned after a write see their
+changes once they go back to a replica.
+"""
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def backup(target_path, using=DEFAULT_DB_ALIAS):
+    """Copy the ``using`` database into the SQLite file at ``target_path``."""
+    source = connections[using]
+    source.ensure_connection()
+    target = sqlite3.connect(target_path)
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the read replicas with the backup API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alias', action='append', dest='aliases',
+            help='Replica alias to refresh (default: every alias in APP_READ_REPLICAS).',
+        )
+        parser.add_argument('--to', dest='paths', action='append', default=[], help='Also copy to this file.')
+        parser.add_argument('--interval', type=float, help='Keep refreshing every INTERVAL seconds.')
+
+    def handle(self, *args, **options):
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError('replicate_db only supports a SQLite primary.')
+        aliases = options['aliases'] or list(getattr(settings, 'APP_READ_REPLICAS', []))
+        for alias in aliases:
+            if alias not in settings.DATABASES:
+                raise CommandError(f'Unknown database alias {alias!r}.')
+        targets = [str(settings.DATABASES[alias]['NAME']) for alias in aliases] + options['paths']
+        if not targets:
+            raise CommandError('No replicas configured; set DJANGO_CRUD_REPLICAS or pass --to.')
+
+        while True:
+            start = time.perf_counter()
+            for target in targets:
+                backup(target)
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stdout.write(f'Copied primary to {len(targets)} replica(s) in {elapsed:.0f} ms')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
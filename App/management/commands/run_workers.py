@@ -0,0 +1,39 @@
+"""
+Run background jobs (App/jobs.py) from the job table.
+
+    python manage.py run_workers [--threads 2] [--poll-interval 1] [--once]
+
+Each thread claims and runs one job at a time; for more parallelism start
+more threads or more processes (on more hosts, against a shared database),
+which never claim the same job. ``--once`` exits as soon as no job is due,
+e.g. to drain the queue from cron. SIGINT/SIGTERM stop the workers after
+their current job.
+"""
+import signal
+
+from django.core.management.base import BaseCommand
+
+from App import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, help=f'Worker threads (default {jobs.DEFAULTS["THREADS"]}).')
+        parser.add_argument('--poll-interval', type=float, help='Seconds an idle thread waits before looking again.')
+        parser.add_argument('--once', action='store_true', help='Exit when no job is due instead of waiting.')
+
+    def handle(self, *args, **options):
+        worker = jobs.Worker(threads=options['threads'], poll_interval=options['poll_interval'])
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping after the current jobs...')
+            worker.stop.set()
+
+        if not options['once']:
+            signal.signal(signal.SIGINT, stop)
+            signal.signal(signal.SIGTERM, stop)
+
+        self.stdout.write(f'{worker.name}: {worker.threads} thread(s), kinds: {", ".join(sorted(jobs.HANDLERS))}')
+        worker.run(once=options['once'])
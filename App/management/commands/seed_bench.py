@@ -0,0 +1,153 @@
+"""
+Fill the database with a synthetic dataset for benchmarking.
+
+    python manage.py seed_bench [--scale small|medium|large] [--flush] [--seed N]
+
+Every model gets rows at the chosen scale; text fields get realistic sizes
+so payload and serialization costs are representative. Rows are written
+with ``bulk_create`` in batches, one transaction per group of related
+models. With sharding enabled students and their enrollments go to their
+shards and courses are copied to every shard.
+"""
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections, router, transaction
+
+from App import caching, conditional, sharding
+from App.models import Task, CrudUser, UserProfile, Author, Book, Student, Course, Enrollment
+
+BATCH_SIZE = 1000
+
+SCALES = {
+    'small': {'tasks': 1_000, 'users': 500, 'authors': 100, 'books_per_author': 10,
+              'students': 500, 'courses': 20, 'courses_per_student': 4},
+    'medium': {'tasks': 10_000, 'users': 5_000, 'authors': 1_000, 'books_per_author': 10,
+               'students': 5_000, 'courses': 100, 'courses_per_student': 4},
+    'large': {'tasks': 100_000, 'users': 50_000, 'authors': 10_000, 'books_per_author': 10,
+              'students': 50_000, 'courses': 200, 'courses_per_student': 4},
+}
+
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+    'incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud'
+).split()
+
+
+class Command(BaseCommand):
+    help = 'Seed every model with a synthetic benchmark dataset.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small')
+        parser.add_argument('--flush', action='store_true', help='Delete existing rows of the App models first.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible datasets.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        scale = SCALES[options['scale']]
+        if options['flush']:
+            self.flush()
+
+        self.timed('tasks', self.seed_tasks, scale)
+        self.timed('users and profiles', self.seed_users, scale)
+        self.timed('authors and books', self.seed_authors, scale)
+        self.timed('students, courses and enrollments', self.seed_enrollments, scale)
+
+        # bulk_create sends no signals: refresh list versions and drop cached details by hand
+        conditional.bump(Task, CrudUser, UserProfile, Author, Book, Student, Course, Enrollment)
+        caching.get_cache().clear()
+
+    def timed(self, label, seed, scale):
+        start = time.perf_counter()
+        count = seed(scale)
+        self.stdout.write(f'{count:>9,} {label} in {time.perf_counter() - start:.1f}s')
+
+    def text(self, words):
+        return ' '.join(self.rng.choices(WORDS, k=words))
+
+    def flush(self):
+        # Plain DELETEs, children first: the ORM would load every row to send delete signals
+        for model in (Enrollment, Book, UserProfile, Task, CrudUser, Author, Student, Course):
+            if sharding.enabled() and model in (Student, Course, Enrollment):
+                aliases = sharding.shards()
+            else:
+                aliases = [router.db_for_write(model)]
+            for alias in aliases:
+                with connections[alias].cursor() as cursor:
+                    cursor.execute(f'DELETE FROM {connections[alias].ops.quote_name(model._meta.db_table)}')
+
+    def insert(self, model, objs):
+        with transaction.atomic(using=router.db_for_write(model)):
+            return model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+
+    def seed_tasks(self, scale):
+        tasks = self.insert(Task, [
+            Task(title=f'Task {i} {self.text(3)}', description=self.text(60)) for i in range(scale['tasks'])
+        ])
+        return len(tasks)
+
+    def seed_users(self, scale):
+        with transaction.atomic():
+            users = CrudUser.objects.bulk_create(
+                (CrudUser(username=f'bench_user{i}', email=f'bench_user{i}@example.com') for i in range(scale['users'])),
+                batch_size=BATCH_SIZE,
+            )
+            UserProfile.objects.bulk_create(
+                (UserProfile(user=user, bio=self.text(40), website=f'https://example.com/{user.username}') for user in users),
+                batch_size=BATCH_SIZE,
+            )
+        return len(users) * 2
+
+    def seed_authors(self, scale):
+        with transaction.atomic():
+            authors = Author.objects.bulk_create(
+                (Author(name=f'Author {i}', bio=self.text(40)) for i in range(scale['authors'])),
+                batch_size=BATCH_SIZE,
+            )
+            books = Book.objects.bulk_create(
+                (
+                    Book(author=author, book_name=f'{author.name} book {j}', content=self.text(200))
+                    for author in authors
+                    for j in range(scale['books_per_author'])
+                ),
+                batch_size=BATCH_SIZE,
+            )
+        return len(authors) + len(books)
+
+    def seed_enrollments(self, scale):
+        start_date = datetime.date(2024, 9, 1)
+        courses = [
+            Course(title=f'Course {i}', description=self.text(30), start_date=start_date + datetime.timedelta(days=i))
+            for i in range(scale['courses'])
+        ]
+        courses = self.insert(Course, courses)
+        course_ids = [course.pk for course in courses]
+        if sharding.enabled():
+            sharding.replicate(Course, course_ids)
+
+        emails = [f'bench_student{i}@example.com' for i in range(scale['students'])]
+        by_shard = {}
+        for email in emails:
+            by_shard.setdefault(sharding.shard_for_email(email), []).append(email)
+
+        count = len(courses)
+        for alias, group in by_shard.items():
+            count += sharding.on_shard(alias, self.seed_students, group, course_ids, scale['courses_per_student'])
+        return count
+
+    def seed_students(self, emails, course_ids, courses_per_student):
+        with transaction.atomic(using=router.db_for_write(Student)):
+            students = Student.objects.bulk_create(
+                (Student(name=email.split('@')[0], email=email) for email in emails), batch_size=BATCH_SIZE,
+            )
+            enrollments = Enrollment.objects.bulk_create(
+                (
+                    Enrollment(student=student, course_id=course_id, grade=self.rng.choice('ABCDF'))
+                    for student in students
+                    for course_id in self.rng.sample(course_ids, min(courses_per_student, len(course_ids)))
+                ),
+                batch_size=BATCH_SIZE,
+            )
+        return len(students) + len(enrollments)
@@ -0,0 +1,86 @@
+"""
+Report the slow-query log written by ``App.slow_queries.SlowQueryMiddleware``.
+
+    python manage.py slow_queries [--top N] [--sort total|count|max] [--view NAME] [--log PATH] [--clear]
+
+Entries are grouped by fingerprint (the shape of the statement), and the
+groups are listed worst first with their count, total / mean / max time,
+the views that issued them and the most recent captured query plan.
+"""
+import os
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from App import slow_queries
+from App.management.commands.explain_hot_queries import is_full_scan
+
+SORT_KEYS = {
+    'total': lambda group: group['total_ms'],
+    'count': lambda group: group['count'],
+    'max': lambda group: group['max_ms'],
+}
+
+
+def group_entries(entries, view=None):
+    """{fingerprint: summary} of the log entries, optionally of one view only."""
+    groups = {}
+    for entry in entries:
+        if view is not None and entry['view'] != view:
+            continue
+        group = groups.get(entry['fingerprint'])
+        if group is None:
+            group = groups[entry['fingerprint']] = {
+                'fingerprint': entry['fingerprint'], 'sql': slow_queries.normalize(entry['sql']),
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'views': Counter(), 'plan': None, 'plan_time': None,
+            }
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+        group['views'][f"{entry['method']} {entry['view'] or '-'}"] += 1
+        if entry['plan'] is not None:
+            # The log is in time order, so the last plan is the newest
+            group['plan'], group['plan_time'] = entry['plan'], entry['time']
+    return groups
+
+
+class Command(BaseCommand):
+    help = 'List the slowest query shapes from the slow-query log.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help='Log file (default: APP_SLOW_QUERIES["LOG"]).')
+        parser.add_argument('--top', type=int, default=10, help='Number of query shapes to show.')
+        parser.add_argument('--sort', choices=SORT_KEYS, default='total', help='Rank by total, count or max time.')
+        parser.add_argument('--view', help='Only statements issued by this url_name.')
+        parser.add_argument('--clear', action='store_true', help='Empty the log after reporting.')
+
+    def handle(self, *args, **options):
+        path = options['log'] or slow_queries.get_config()['LOG']
+        if not os.path.exists(path):
+            raise CommandError(f'No slow-query log at {path}.')
+
+        groups = group_entries(slow_queries.read_log(path), options['view'])
+        ranked = sorted(groups.values(), key=SORT_KEYS[options['sort']], reverse=True)
+        for rank, group in enumerate(ranked[:options['top']], start=1):
+            self.write_group(rank, group)
+        total = sum(group['count'] for group in groups.values())
+        self.stdout.write(f'{total} slow statements in {len(groups)} distinct shapes.')
+
+        if options['clear']:
+            open(path, 'w').close()
+
+    def write_group(self, rank, group):
+        mean = group['total_ms'] / group['count']
+        self.stdout.write(self.style.WARNING(
+            f"#{rank} {group['fingerprint']}  count {group['count']}  total {group['total_ms']:.1f} ms  "
+            f"mean {mean:.1f} ms  max {group['max_ms']:.1f} ms"
+        ))
+        views = ', '.join(f'{view} ({count})' for view, count in group['views'].most_common())
+        self.stdout.write(f'  views: {views}')
+        self.stdout.write(f"  {group['sql']}")
+        if group['plan'] is None:
+            return
+        self.stdout.write(f"  plan at {group['plan_time']}:")
+        for detail in group['plan']:
+            flag = '  <- full scan' if is_full_scan(detail) else ''
+            self.stdout.write(f'    {detail}{flag}')
@@ -0,0 +1,343 @@
+"""
+Per-view request metrics in Prometheus text format.
+
+``MetricsMiddleware`` records, for every request, keyed by the resolved
+``url_name``, route and method: a count per status code, a latency
+histogram, the number of SQL queries and the time spent in them (through
+``connection.execute_wrapper`` on every database alias, see
+App/query_hooks.py) and the response size. ``MetricsView`` serves the totals at ``/api/metrics``.
+
+Recording takes no lock: each thread adds to its own dict, and only the
+scrape reads across threads. Counters of threads that have exited are
+folded into a process-wide total so thread-per-request servers do not
+grow the registry.
+
+Several worker processes: set ``settings.APP_METRICS['DIR']`` to a local
+directory shared by the workers. Each process writes its totals there at
+most every ``FLUSH_INTERVAL`` seconds (and at exit), one file per process,
+and the endpoint adds up every file, so any worker can answer the scrape.
+Counters of processes that have exited stay in their files; clear the
+directory when deploying. Other workers' numbers can lag by up to
+``FLUSH_INTERVAL``.
+
+Latency and size of streaming responses cover the response headers only,
+and queries run by the write queue's thread (App/writer.py) are not
+attributed to the request that submitted them.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import query_hooks
+
+DEFAULTS = {
+    'ENABLED': True,
+    'DIR': None,
+    'FLUSH_INTERVAL': 5,
+}
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Anything else is recorded as "other" so clients cannot create label values
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'APP_METRICS', {})}
+
+
+class ViewStats:
+    """Totals of one (view, route, method); only ever written by one thread."""
+
+    __slots__ = ('statuses', 'buckets', 'seconds', 'queries', 'query_seconds', 'bytes')
+
+    def __init__(self):
+        self.statuses = {}
+        # Per-bucket (not cumulative) counts, the last one is +Inf
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.seconds = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.bytes = 0
+
+    def observe(self, status, seconds, queries, query_seconds, size):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.seconds += seconds
+        self.queries += queries
+        self.query_seconds += query_seconds
+        self.bytes += size
+
+    def as_dict(self):
+        return {
+            'statuses': {str(status): count for status, count in list(self.statuses.items())},
+            'buckets': list(self.buckets),
+            'seconds': self.seconds,
+            'queries': self.queries,
+            'query_seconds': self.query_seconds,
+            'bytes': self.bytes,
+        }
+
+
+_local = threading.local()
+# (thread, its stats dict) for every thread that recorded a request
+_stores = []
+# Totals of threads that have exited, as a snapshot (see merge())
+_retired = {}
+_lock = threading.Lock()
+
+# (pid, file name) of this process; recomputed after a fork so preloaded workers get their own file
+_process_file = (None, None)
+_last_flush = 0.0
+
+
+def thread_store():
+    try:
+        return _local.store
+    except AttributeError:
+        store = _local.store = {}
+        with _lock:
+            _stores.append((threading.current_thread(), store))
+        return store
+
+
+def record(view, route, method, status, seconds, queries, query_seconds, size):
+    store = thread_store()
+    key = (view, route, method)
+    stats = store.get(key)
+    if stats is None:
+        stats = store[key] = ViewStats()
+    stats.observe(status, seconds, queries, query_seconds, size)
+
+
+def merge(into, snapshot):
+    """Add ``snapshot`` ({key: ViewStats.as_dict()}) to ``into``, in place."""
+    for key, values in snapshot.items():
+        total = into.get(key)
+        if total is None:
+            total = into[key] = {
+                'statuses': {}, 'buckets': [0] * len(values['buckets']),
+                'seconds': 0.0, 'queries': 0, 'query_seconds': 0.0, 'bytes': 0,
+            }
+        for status, count in values['statuses'].items():
+            total['statuses'][status] = total['statuses'].get(status, 0) + count
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], values['buckets'])]
+        for field in ('seconds', 'queries', 'query_seconds', 'bytes'):
+            total[field] += values[field]
+    return into
+
+
+def store_snapshot(store):
+    # list() copies the items in one step, so the owner thread adding a key cannot break the loop
+    return {'\t'.join(key): stats.as_dict() for key, stats in list(store.items())}
+
+
+def snapshot():
+    """This process's totals, as {"view\\troute\\tmethod": ViewStats.as_dict()}."""
+    with _lock:
+        alive = []
+        for thread, store in _stores:
+            if thread.is_alive():
+                alive.append((thread, store))
+            else:
+                merge(_retired, store_snapshot(store))
+        _stores[:] = alive
+        totals = merge({}, _retired)
+    for thread, store in alive:
+        merge(totals, store_snapshot(store))
+    return totals
+
+
+def process_file(directory):
+    global _process_file
+    pid, name = _process_file
+    if pid != os.getpid():
+        pid = os.getpid()
+        # The random part keeps a reused pid from overwriting a dead process's counters
+        name = f'{pid}-{uuid.uuid4().hex[:8]}.json'
+        _process_file = (pid, name)
+    return os.path.join(directory, name)
+
+
+def flush():
+    """Write this process's totals to the shared directory, if there is one."""
+    global _last_flush
+    directory = get_config()['DIR']
+    _last_flush = time.monotonic()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = process_file(directory)
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot(), f)
+    # Readers only ever see a complete file
+    os.replace(tmp_path, path)
+
+
+def maybe_flush(interval):
+    if time.monotonic() - _last_flush >= interval:
+        flush()
+
+
+# flush() is a no-op without a metrics directory
+atexit.register(flush)
+
+
+def collect():
+    """Totals of every process sharing the metrics directory (or of this process alone)."""
+    directory = get_config()['DIR']
+    if not directory:
+        return snapshot()
+    flush()
+    totals = {}
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                merge(totals, json.load(f))
+        except (OSError, ValueError):
+            # Removed or half-written by something other than flush(); skip it
+            continue
+    return totals
+
+
+def reset():
+    """Forget this process's totals (tests)."""
+    global _last_flush
+    with _lock:
+        for thread, store in _stores:
+            store.clear()
+        _retired.clear()
+        _last_flush = 0.0
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_number(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render(totals):
+    """Format ``collect()`` output in the Prometheus text exposition format."""
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    rows = []
+    for key, values in sorted(totals.items()):
+        view, route, method = key.split('\t')
+        labels = f'view="{escape(view)}",route="{escape(route)}",method="{escape(method)}"'
+        rows.append((labels, values))
+
+    family('app_http_requests_total', 'counter', 'Requests served, by view, method and status code.')
+    for labels, values in rows:
+        for status, count in sorted(values['statuses'].items()):
+            lines.append(f'app_http_requests_total{{{labels},status="{status}"}} {count}')
+
+    family('app_http_request_duration_seconds', 'histogram', 'Time to produce the response, by view and method.')
+    for labels, values in rows:
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (None,), values['buckets']):
+            cumulative += count
+            le = '+Inf' if bound is None else format_number(bound)
+            lines.append(f'app_http_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f'app_http_request_duration_seconds_sum{{{labels}}} {format_number(values["seconds"])}')
+        lines.append(f'app_http_request_duration_seconds_count{{{labels}}} {cumulative}')
+
+    family('app_db_queries_total', 'counter', 'SQL queries run while serving requests, by view and method.')
+    for labels, values in rows:
+        lines.append(f'app_db_queries_total{{{labels}}} {values["queries"]}')
+
+    family('app_db_query_duration_seconds_total', 'counter', 'Time spent in SQL queries, by view and method.')
+    for labels, values in rows:
+        lines.append(f'app_db_query_duration_seconds_total{{{labels}}} {format_number(values["query_seconds"])}')
+
+    family('app_http_response_size_bytes_total', 'counter', 'Response body bytes, by view and method.')
+    for labels, values in rows:
+        lines.append(f'app_http_response_size_bytes_total{{{labels}}} {values["bytes"]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class QueryTimer:
+    """``execute_wrapper`` that counts the queries of one request and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """Record count, latency, SQL and response size of every request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = get_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.flush_interval = config['FLUSH_INTERVAL'] if config['DIR'] else None
+        # Under ASGI stay async, so async views are not pushed onto the sync thread pool
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with query_hooks.wrapping_queries(timer):
+            response = self.get_response(request)
+        return self.record(request, response, time.perf_counter() - start, timer)
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        async with query_hooks.awrapping_queries(timer):
+            response = await self.get_response(request)
+        return self.record(request, response, time.perf_counter() - start, timer)
+
+    def record(self, request, response, seconds, timer):
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else ''
+        route = match.route if match else ''
+        method = request.method if request.method in METHODS else 'other'
+        if response.streaming:
+            size = 0
+        elif response.has_header('Content-Length'):
+            size = int(response['Content-Length'])
+        else:
+            size = len(response.content)
+
+        record(view, route, method, response.status_code, seconds, timer.count, timer.seconds, size)
+        if self.flush_interval is not None:
+            maybe_flush(self.flush_interval)
+        return response
@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0004_author_updated_at_book_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['author', 'id'], name='App_book_author__577bd0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['title', 'start_date'], name='App_course_title_e714d4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cruduser',
+            index=models.Index(fields=['username'], name='App_cruduse_usernam_c1ca56_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cruduser',
+            index=models.Index(fields=['email'], name='App_cruduse_email_d4f8ba_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['created_at', 'id'], name='App_task_created_c1a602_idx'),
+        ),
+    ]
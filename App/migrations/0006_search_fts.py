@@ -0,0 +1,66 @@
+# Full-text search indexes (App/search.py): external-content FTS5 tables over
+# Book and Task, kept in sync by triggers so bulk_create, queryset.update() and
+# raw deletes are covered too. SQLite only; other backends skip this migration.
+
+from django.db import migrations
+
+INDEXES = [
+    # (model_name, table, fts table, indexed columns, bm25 weights)
+    ('book', 'App_book', 'App_book_fts', ('book_name', 'content'), '10.0, 1.0'),
+    ('task', 'App_task', 'App_task_fts', ('title', 'description'), '10.0, 1.0'),
+]
+
+
+def create_sql(table, fts, columns, weights):
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"INSERT INTO {fts}({fts}, rank) VALUES ('rank', 'bm25({weights})')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); END",
+        # Only edits of the indexed columns touch the index, not updated_at bumps
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {names} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def drop_sql(fts):
+    return [
+        f'DROP TRIGGER IF EXISTS {fts}_ai',
+        f'DROP TRIGGER IF EXISTS {fts}_ad',
+        f'DROP TRIGGER IF EXISTS {fts}_au',
+        f'DROP TABLE IF EXISTS {fts}',
+    ]
+
+
+def run(schema_editor, statements):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in statements:
+        schema_editor.execute(sql, params=None)
+
+
+def operations():
+    for model_name, table, fts, columns, weights in INDEXES:
+        yield migrations.RunPython(
+            lambda apps, schema_editor, sql=create_sql(table, fts, columns, weights): run(schema_editor, sql),
+            lambda apps, schema_editor, sql=drop_sql(fts): run(schema_editor, sql),
+            # Routers see the model, so shards and replicas are skipped like the model's table
+            hints={'model_name': model_name},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0005_book_app_book_author__577bd0_idx_and_more'),
+    ]
+
+    operations = list(operations())
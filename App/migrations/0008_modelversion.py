@@ -0,0 +1,21 @@
+# Generated by Django 5.1 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0007_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelVersion',
+            fields=[
+                ('label', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('token', models.CharField(max_length=16)),
+                ('modified', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -1,9 +1,17 @@
 from django.db import models
 
+from .sharding import ShardedManager
+
 class Task(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
 
     def __str__(self):
         return self.title
@@ -13,11 +21,19 @@ class Task(models.Model):
 class CrudUser(models.Model):
     username = models.CharField(max_length=100)
     email = models.EmailField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['username']),
+            models.Index(fields=['email']),
+        ]
 
 class UserProfile(models.Model):
     user = models.OneToOneField(CrudUser, on_delete=models.CASCADE)
     bio = models.TextField()
     website = models.URLField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
 # User and UserProfile models with a one-to-one relationship - end
 
@@ -26,6 +42,7 @@ class UserProfile(models.Model):
 class Author(models.Model):
     name = models.CharField(max_length=100)
     bio = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -35,6 +52,13 @@ class Book(models.Model):
     book_name = models.CharField(max_length=200)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Books of a set of authors, already in id order
+            models.Index(fields=['author', 'id']),
+        ]
 
     def __str__(self):
         return self.book_name
@@ -46,6 +70,10 @@ class Book(models.Model):
 class Student(models.Model):
     name = models.CharField(max_length=255)
     email = models.EmailField(unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Students are hash-sharded by email when APP_SHARDS is set (App/sharding.py)
+    objects = ShardedManager()
 
     def __str__(self):
         return self.name
@@ -54,6 +82,14 @@ class Course(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
     start_date = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Course lookups by (title, description, start_date); description is
+            # left out to keep unbounded text out of the index
+            models.Index(fields=['title', 'start_date']),
+        ]
 
     def __str__(self):
         return self.title
@@ -63,8 +99,59 @@ class Enrollment(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     enrollment_date = models.DateField(auto_now_add=True)
     grade = models.CharField(max_length=2, blank=True, null=True)  # e.g., 'A', 'B', etc.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Enrollments live on their student's shard
+    objects = ShardedManager()
 
     class Meta:
         unique_together = ('student', 'course')
 
 # Student and Course models with a many-to-many relationship - end
+
+# Background jobs (App/jobs.py) - start
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField()  # not claimed before this (retry backoff)
+    locked_by = models.CharField(max_length=100, blank=True)  # worker running the job
+    locked_at = models.DateTimeField(null=True, blank=True)  # last heartbeat of that worker
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Workers look for the oldest due job of a status
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk} ({self.status})'
+
+# Background jobs - end
+
+# List versions (App/conditional.py) - start
+
+class ModelVersion(models.Model):
+    label = models.CharField(max_length=100, primary_key=True)  # e.g. 'app.task'
+    token = models.CharField(max_length=16)  # random, replaced on every change
+    modified = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.label} @ {self.token}'
+
+# List versions - end
@@ -0,0 +1,96 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+Pages are ordered on the primary key and the cursor is an opaque token
+holding the last key of the previous page, so fetching any page is a
+``WHERE id > ? ORDER BY id LIMIT ?`` range read on the primary key index.
+Unlike OFFSET pagination, its cost does not grow with the table size.
+"""
+import base64
+from operator import itemgetter
+
+from django.http import JsonResponse
+
+from . import sharding
+from .serialization import json_response
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeError):
+        raise PaginationError('Invalid cursor.')
+
+
+def parse_limit(value):
+    if value is None:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('Limit must be an integer.')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise PaginationError(f'Limit must be between 1 and {MAX_LIMIT}.')
+    return limit
+
+
+def wants_pagination(request):
+    return 'limit' in request.GET or 'cursor' in request.GET
+
+
+def page_queryset(queryset, request):
+    """Return ``(queryset, limit)`` selecting one page plus one extra row."""
+    limit = parse_limit(request.GET.get('limit'))
+    cursor = request.GET.get('cursor')
+    if cursor:
+        queryset = queryset.filter(pk__gt=decode_cursor(cursor))
+
+    # Fetch one extra row to learn whether another page follows
+    return queryset.order_by('pk')[:limit + 1], limit
+
+
+def split_page(rows, limit, key):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
+
+
+def paginate(queryset, request, key=itemgetter(0)):
+    """
+    Return ``(rows, next_cursor)`` for the page selected by ``?limit=`` and
+    ``?cursor=``. ``next_cursor`` is None on the last page. ``key`` extracts
+    the primary key from a fetched row (the first item of a listing row).
+    """
+    queryset, limit = page_queryset(queryset, request)
+    # Sharded listings read one page from every shard and keep the first rows of the merge
+    pages = [list(part) for part in sharding.scatter(queryset)]
+    return split_page(list(sharding.merge(pages, key))[:limit + 1], limit, key)
+
+
+async def apaginate(queryset, request, key=itemgetter(0)):
+    """Async ``paginate`` for async views."""
+    queryset, limit = page_queryset(queryset, request)
+    pages = [[row async for row in part] for part in sharding.scatter(queryset)]
+    return split_page(list(sharding.merge(pages, key))[:limit + 1], limit, key)
+
+
+def paginated_response(request, queryset, serialize):
+    """Serialize one page of ``queryset`` as ``{"results": [...], "next": cursor}``."""
+    try:
+        rows, next_cursor = paginate(queryset, request)
+    except PaginationError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return json_response({'results': serialize(rows), 'next': next_cursor})
@@ -0,0 +1,103 @@
+"""
+Partial updates: write only the columns a client sent.
+
+``update_columns`` issues a single ``UPDATE ... WHERE`` without reading the
+row first; it sends no signals, so callers invalidate cached payloads and
+bump list versions themselves. ``save_columns`` is for views that need the
+instance for their response: ``save(update_fields=...)`` writes the same
+columns and sends ``post_save`` as usual. Both also set the model's
+``auto_now`` fields (``updated_at``), which neither would otherwise write.
+
+PATCH responses are minimal by default; a client that sends
+``Prefer: return=representation`` gets the updated object, at the cost of
+reading it.
+
+``changed`` lets the nested PUT handlers skip objects (and columns) whose
+values did not change.
+"""
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils import timezone
+
+
+class PatchError(ValueError):
+    pass
+
+
+def changes(model, data, fields):
+    """
+    ``{field: value}`` for the ``fields`` present in the JSON object ``data``
+    (possibly empty), converted and validated by each field. Values that
+    the column cannot hold (None for a non-null field, '' for a required
+    one, the wrong type, too long) raise ``PatchError``.
+    """
+    if not isinstance(data, dict):
+        raise PatchError('Expected a JSON object.')
+    values = {}
+    for name in fields:
+        if name not in data:
+            continue
+        value = data[name]
+        field = model._meta.get_field(name)
+        if (value is None and not field.null) or (value == '' and not field.blank):
+            raise PatchError(f'{name} may not be empty.')
+        if value is not None:
+            try:
+                value = clean(field, value)
+            except ValidationError as e:
+                raise PatchError(f'{name}: {" ".join(e.messages)}')
+        values[name] = value
+    return values
+
+
+def changed(instance, data, fields):
+    """
+    ``{field: value}`` for the ``fields`` in ``data`` whose value differs
+    from ``instance``'s, converted the way the field stores it (so
+    "2024-09-01" equals a date). Raises ``ValidationError`` for values the
+    field cannot convert or that fail its validation (length, format).
+    """
+    values = {}
+    for name in fields:
+        if name not in data:
+            continue
+        value = clean(instance._meta.get_field(name), data[name], instance)
+        if value != getattr(instance, name):
+            values[name] = value
+    return values
+
+
+def clean(field, value, instance=None):
+    """``value`` converted and validated by ``field``; raises ``ValidationError``."""
+    if isinstance(field, (models.CharField, models.TextField)) and not isinstance(value, str):
+        # to_python() would store str() of a list, object or number
+        raise ValidationError('Expected a string.')
+    if field.is_relation:
+        # A foreign key's own clean() queries for the target row; callers look it up themselves
+        return field.target_field.clean(value, None)
+    return field.clean(value, instance)
+
+
+def auto_now_fields(model):
+    return [field.attname for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+
+
+def update_columns(queryset, values):
+    """Write ``values`` to the rows of ``queryset`` in one UPDATE; return how many matched."""
+    now = timezone.now()
+    return queryset.update(**values, **{name: now for name in auto_now_fields(queryset.model)})
+
+
+def save_columns(instance, values):
+    """Set ``values`` on ``instance`` and save just those columns."""
+    if not values:
+        return instance
+    for name, value in values.items():
+        setattr(instance, name, value)
+    # save() stamps auto_now fields itself, but only writes them when listed
+    instance.save(update_fields=[*values, *auto_now_fields(type(instance))])
+    return instance
+
+
+def wants_representation(request):
+    return 'return=representation' in request.headers.get('Prefer', '')
@@ -0,0 +1,196 @@
+"""
+On-demand profiling of single requests.
+
+A request is profiled when it carries either
+
+* an ``X-App-Profile`` header holding a token from ``manage.py profile_token``
+  (signed with ``SECRET_KEY``, valid for ``TOKEN_MAX_AGE`` seconds), or
+* a ``?__profile`` query flag, honoured only from the addresses in
+  ``ALLOWED_IPS`` (none by default: behind a local reverse proxy every
+  request comes from loopback, so list addresses only where that is not so).
+
+``ProfilingMiddleware`` then runs the rest of the request under ``cProfile``
+and records every SQL query with its timing. It writes
+``<DIR>/<name>.prof`` (open with ``python -m pstats`` or snakeviz) and
+``<DIR>/<name>.sql.log``, returns ``<name>`` in ``X-App-Profile-Id`` and
+adds a ``Server-Timing`` header splitting the time into db, serialization
+and view. Serialization time is read from the profile (the encoders in
+App/serialization.py and ``JsonResponse``), so nothing on the normal path
+is instrumented: without the header or flag the middleware only checks
+for them.
+
+The SQL log holds query parameters verbatim; keep ``DIR`` private. Only
+the request's own thread is profiled: under ASGI that is the event loop
+(with whatever else it runs meanwhile), not the threads the async views
+hand their queries to, and never the write queue's thread (App/writer.py).
+"""
+import cProfile
+import os
+import time
+from datetime import datetime
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+
+from . import query_hooks, serialization
+
+DEFAULTS = {
+    'ENABLED': True,
+    'DIR': 'profiles',
+    'HEADER': 'X-App-Profile',
+    'QUERY_FLAG': '__profile',
+    'ALLOWED_IPS': (),
+    'TOKEN_MAX_AGE': 3600,
+}
+
+SIGNING_SALT = 'App.profiling'
+TOKEN_VALUE = 'profile'
+
+# Functions whose cumulative time counts as serialization in Server-Timing
+SERIALIZERS = (
+    serialization.dumps,
+    serialization.FieldPlan.to_dicts,
+    JsonResponse.__init__,
+)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'APP_PROFILING', {})}
+
+
+def make_token():
+    """Value for the profiling header."""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(TOKEN_VALUE)
+
+
+def valid_token(token, max_age):
+    try:
+        return signing.TimestampSigner(salt=SIGNING_SALT).unsign(token, max_age=max_age) == TOKEN_VALUE
+    except signing.BadSignature:
+        return False
+
+
+class QueryLog:
+    """``execute_wrapper`` keeping every query of the profiled request, in order, with its duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((time.perf_counter() - start, context['connection'].alias, sql, params))
+
+    def seconds(self):
+        return sum(query[0] for query in self.queries)
+
+
+def function_key(fn):
+    code = fn.__code__
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def cumulative_time(profile, functions):
+    """Seconds spent inside ``functions`` (and what they call) according to ``profile``."""
+    profile.create_stats()
+    return sum(
+        profile.stats[key][3] for key in map(function_key, functions) if key in profile.stats
+    )
+
+
+class ProfilingMiddleware:
+    """Profile the requests that ask for it; pass everything else straight through."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = get_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.directory = config['DIR']
+        self.meta_header = 'HTTP_' + config['HEADER'].upper().replace('-', '_')
+        self.response_header = config['HEADER'] + '-Id'
+        self.query_flag = config['QUERY_FLAG']
+        self.allowed_ips = set(config['ALLOWED_IPS'])
+        self.max_age = config['TOKEN_MAX_AGE']
+        # Under ASGI stay async, so async views are not pushed onto the sync thread pool
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.wanted(request):
+            return self.get_response(request)
+        log = QueryLog()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with query_hooks.wrapping_queries(log):
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        return self.report(request, response, time.perf_counter() - start, profiler, log)
+
+    async def __acall__(self, request):
+        if not self.wanted(request):
+            return await self.get_response(request)
+        log = QueryLog()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        async with query_hooks.awrapping_queries(log):
+            profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profiler.disable()
+        return self.report(request, response, time.perf_counter() - start, profiler, log)
+
+    def wanted(self, request):
+        if self.meta_header not in request.META and self.query_flag not in request.META.get('QUERY_STRING', ''):
+            return False
+        return self.requested(request)
+
+    def requested(self, request):
+        token = request.META.get(self.meta_header)
+        if token is not None:
+            return valid_token(token, self.max_age)
+        return self.query_flag in request.GET and request.META.get('REMOTE_ADDR') in self.allowed_ips
+
+    def report(self, request, response, total, profiler, log):
+        db = log.seconds()
+        serializing = cumulative_time(profiler, SERIALIZERS)
+        view = max(total - db - serializing, 0.0)
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={seconds * 1000:.2f}'
+            for name, seconds in (('db', db), ('serialization', serializing), ('view', view), ('total', total))
+        )
+
+        name = self.output_name(request)
+        os.makedirs(self.directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(self.directory, f'{name}.prof'))
+        self.write_sql_log(os.path.join(self.directory, f'{name}.sql.log'), request, response, total, log)
+        response[self.response_header] = name
+        return response
+
+    def output_name(self, request):
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        return f'{stamp}-{request.method}-{view}'
+
+    def write_sql_log(self, path, request, response, total, log):
+        with open(path, 'w') as f:
+            f.write(f'# {request.method} {request.get_full_path()} -> {response.status_code}\n')
+            f.write(f'# {len(log.queries)} queries, {log.seconds() * 1000:.2f} ms in SQL, {total * 1000:.2f} ms total\n')
+            for duration, alias, sql, params in log.queries:
+                f.write(f'{duration * 1000:9.3f} ms  {alias}  {sql}  {params!r}\n')
@@ -0,0 +1,37 @@
+"""
+``execute_wrapper`` hooks on every database connection for one request.
+
+Django keeps a connection object per thread. A synchronous request runs its
+queries on the connections of its own thread. An async view runs them
+through ``sync_to_async``, on the thread the request's sync work is pinned
+to, never on the event loop's connections; so the async variant installs
+(and removes) the hooks on that thread.
+"""
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+
+def install(stack, wrapper):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+
+
+@contextmanager
+def wrapping_queries(wrapper):
+    """Run ``wrapper`` around every query made in this thread inside the block."""
+    with ExitStack() as stack:
+        install(stack, wrapper)
+        yield
+
+
+@asynccontextmanager
+async def awrapping_queries(wrapper):
+    """Run ``wrapper`` around every query the async code inside the block makes through ``sync_to_async``."""
+    stack = ExitStack()
+    await sync_to_async(install)(stack, wrapper)
+    try:
+        yield
+    finally:
+        await sync_to_async(stack.close)()
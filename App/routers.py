@@ -0,0 +1,124 @@
+"""
+Read-replica routing.
+
+Reads issued while serving a GET/HEAD request go to one of the aliases in
+``settings.APP_READ_REPLICAS``, the same one for the whole request, so its
+validators and its body come from one copy of the data; everything else (writes, reads inside
+non-GET requests, management commands, the writer thread, anything inside
+a transaction on the primary) uses ``default``.
+
+Read-your-writes: after a client sends a write request, ``ReplicaMiddleware``
+sets a cookie that pins its reads to the primary for
+``settings.APP_READ_YOUR_WRITES_SECONDS``, long enough for replication to
+catch up. Replicas are SQLite copies of the primary kept current with
+``manage.py replicate_db``.
+
+Anything stored for other clients to read back (cached detail payloads) and
+the validators compared against it are read inside ``primary()``: a payload
+built from a lagging replica would otherwise be served to every client, and
+paired with the primary's newer ETag, until the next write.
+"""
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'App_primary_until'
+DEFAULT_STICKY_SECONDS = 5
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+# The replica picked by the middleware for a request that may read from one
+_replica = contextvars.ContextVar('App_replica', default=None)
+
+
+def replicas():
+    return list(getattr(settings, 'APP_READ_REPLICAS', []))
+
+
+@contextmanager
+def primary():
+    """Send the reads made inside the block to the primary, even while serving a GET."""
+    token = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+def sticky_seconds():
+    return getattr(settings, 'APP_READ_YOUR_WRITES_SECONDS', DEFAULT_STICKY_SECONDS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary when they are copied
+        return db not in replicas()
+
+
+def pinned_to_primary(request):
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaMiddleware:
+    """Let GET/HEAD requests read from replicas, except shortly after the client wrote."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Under ASGI stay async, so async views are not pushed onto the sync thread pool
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _replica.set(self.pick_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = _replica.set(self.pick_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica.reset(token)
+        return self.pin(request, response)
+
+    def pick_replica(self, request):
+        aliases = replicas()
+        if not aliases or request.method not in SAFE_METHODS or pinned_to_primary(request):
+            return None
+        return random.choice(aliases)
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS and replicas():
+            seconds = sticky_seconds()
+            response.set_cookie(STICKY_COOKIE, f'{time.time() + seconds:.3f}', max_age=seconds, httponly=True)
+        return response
@@ -0,0 +1,154 @@
+"""
+Full-text search over ``Book`` (name, content) and ``Task`` (title,
+description).
+
+Each model has an external-content SQLite FTS5 table (migration 0006)
+that triggers keep in step with every insert, delete and update of the
+indexed columns. A search returns matches best first (bm25, with name /
+title hits weighted above body hits) with a highlighted snippet, one page
+at a time: the cursor holds the rank and id of the last match, so the next
+page continues from there the way the list endpoints do.
+
+Snippets are HTML: the stored text is escaped, and only the ``<mark>``
+tags around matched terms are markup.
+
+Queries are plain words, all of which must match. ``word*`` matches by
+prefix and ``"two words"`` matches a phrase; any other FTS5 syntax in the
+input is treated as text.
+"""
+import base64
+import html
+import re
+
+from django.db import connections, router
+
+from .models import Book, Task
+from .pagination import PaginationError, parse_limit
+from .serialization import FieldPlan
+
+SNIPPET_START = '<mark>'
+SNIPPET_END = '</mark>'
+# Private-use characters that mark matches in the raw snippet until it is escaped
+_MATCH_START = '\ue000'
+_MATCH_END = '\ue001'
+SNIPPET_TOKENS = 16
+
+_TERM = re.compile(r'"([^"]*)"|(\w+)(\*?)')
+
+
+class SearchError(ValueError):
+    pass
+
+
+class SearchIndex:
+    """
+    One FTS5 table. Matches are ranked in the FTS table, then ``plan``
+    reads the fields of the page's rows; ``snippet_column`` is the index of
+    the FTS column snippets are cut from.
+    """
+
+    def __init__(self, plan, snippet_column):
+        self.plan = plan
+        self.model = plan.model
+        self.fts_table = f'{self.model._meta.db_table}_fts'
+        self.snippet_column = snippet_column
+
+    def sql(self, after):
+        fts = self.fts_table
+        sql = (
+            f'SELECT rowid, snippet({fts}, {self.snippet_column}, %s, %s, %s, %s), rank '
+            f'FROM {fts} WHERE {fts} MATCH %s'
+        )
+        if after is not None:
+            sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        return sql + ' ORDER BY rank, rowid LIMIT %s'
+
+    def search(self, query, limit, after=None):
+        """Return ``(matches, next_cursor)`` for one page of ``query``."""
+        params = [_MATCH_START, _MATCH_END, '…', SNIPPET_TOKENS, to_match_expression(query)]
+        if after is not None:
+            rank, pk = after
+            params += [rank, rank, pk]
+        # One extra row tells whether another page follows
+        params.append(limit + 1)
+        alias = router.db_for_read(self.model)
+        with connections[alias].cursor() as cursor:
+            cursor.execute(self.sql(after), params)
+            hits = cursor.fetchall()
+
+        next_cursor = None
+        if len(hits) > limit:
+            hits = hits[:limit]
+            pk, snippet, rank = hits[-1]
+            next_cursor = encode_cursor(rank, pk)
+
+        rows = list(self.plan.values(self.model.objects.using(alias).filter(pk__in=[hit[0] for hit in hits])))
+        items = dict(zip((row[0] for row in rows), self.plan.to_dicts(rows)))
+        matches = []
+        for pk, snippet, rank in hits:
+            if pk not in items:
+                # Deleted between the two reads
+                continue
+            # bm25 ranks are negative, best first; report them as a positive score
+            matches.append({'id': pk, **items[pk], 'snippet': highlight(snippet), 'score': -rank})
+        return matches, next_cursor
+
+    def rebuild(self):
+        """Rebuild the index from the model's table."""
+        self.command('rebuild')
+
+    def optimize(self):
+        """Merge the index's b-trees into one, for faster queries after heavy writes."""
+        self.command('optimize')
+
+    def command(self, name):
+        with connections[router.db_for_write(self.model)].cursor() as cursor:
+            cursor.execute(f'INSERT INTO {self.fts_table}({self.fts_table}) VALUES (%s)', [name])
+
+
+INDEXES = {
+    'books': SearchIndex(FieldPlan(Book, {'author_id': 'author_id', 'book_name': 'book_name'}), snippet_column=1),
+    'tasks': SearchIndex(FieldPlan(Task, {'title': 'title', 'created_at': 'created_at'}), snippet_column=1),
+}
+
+
+def to_match_expression(query):
+    """Turn user input into an FTS5 query: every term quoted, ``*`` kept as a prefix marker."""
+    terms = []
+    for phrase, word, star in _TERM.findall(query):
+        if phrase.strip():
+            words = re.findall(r'\w+', phrase)
+            if words:
+                terms.append('"' + ' '.join(words) + '"')
+        elif word:
+            terms.append(f'"{word}"{star}')
+    if not terms:
+        raise SearchError('Search query must contain at least one word.')
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    """Escape a raw FTS snippet and turn its match markers into ``<mark>`` tags."""
+    return html.escape(snippet).replace(_MATCH_START, SNIPPET_START).replace(_MATCH_END, SNIPPET_END)
+
+
+def encode_cursor(rank, pk):
+    return base64.urlsafe_b64encode(f'{rank!r}:{pk}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        rank, pk = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        return float(rank), int(pk)
+    except (ValueError, UnicodeError):
+        raise PaginationError('Invalid cursor.')
+
+
+def search(resource, request):
+    """Return ``(matches, next_cursor)`` for ``?q=&limit=&cursor=`` on one index."""
+    index = INDEXES[resource]
+    query = request.GET.get('q', '')
+    limit = parse_limit(request.GET.get('limit'))
+    cursor = request.GET.get('cursor')
+    return index.search(query, limit, decode_cursor(cursor) if cursor else None)
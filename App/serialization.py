@@ -0,0 +1,144 @@
+"""
+Fast row serialization for the API payloads.
+
+A ``FieldPlan`` is compiled once per payload shape: it lists the columns to
+read with ``QuerySet.values_list()`` (so no model instances are built), the
+key path each column lands on in the output dict, and a converter for the
+columns that are not JSON-native. Encoding goes through ``orjson`` when it
+is installed and the standard library otherwise.
+
+Dates and datetimes are formatted the same way on every endpoint:
+``DATETIME_FORMAT`` for datetimes (in the current time zone) and ISO 8601
+``YYYY-MM-DD`` for dates.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.http import HttpResponse
+from django.utils import timezone
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def format_datetime(value, tz=None):
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(tz or timezone.get_current_timezone())
+    # Same text as value.strftime(DATETIME_FORMAT), at a fraction of the cost
+    return value.isoformat(' ', 'seconds')[:19]
+
+
+def format_date(value, tz=None):
+    return value.isoformat() if value is not None else None
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def _converter(field):
+    if isinstance(field, models.DateTimeField):
+        return format_datetime
+    if isinstance(field, models.DateField):
+        return format_date
+    return None
+
+
+def _resolve_field(model, lookup):
+    """Return the model field a ``values_list`` lookup like ``student__name`` reads."""
+    *relations, name = lookup.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+class FieldPlan:
+    """
+    Columns read for one payload shape. ``fields`` maps output keys to
+    ``values_list`` lookups; a key may be a dotted path (``student.name``)
+    to build nested dicts. The first column is always the primary key so
+    pagination can key on ``row[0]``.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.keys = tuple(fields)
+        self.columns = ('pk',) + tuple(fields.values())
+        self.paths = tuple(tuple(key.split('.')) for key in self.keys)
+        converters = [_converter(_resolve_field(model, lookup)) for lookup in fields.values()]
+        self.conversions = tuple(
+            (index, convert) for index, convert in enumerate(converters, start=1) if convert is not None
+        )
+        self.nested = any(len(path) > 1 for path in self.paths)
+        self.lookups = dict(fields)
+        self._subsets = {}
+
+    def subset(self, keys):
+        """
+        Plan for the part of the payload named by ``keys`` (a sparse
+        fieldset): output keys, where the prefix of dotted keys (``profile``)
+        stands for all of them. Columns of the other keys are not read.
+        Raises ``FieldsError`` for a key the payload does not have.
+        """
+        selected = set()
+        for key in keys:
+            matched = [own for own in self.keys if own == key or own.startswith(key + '.')]
+            if not matched:
+                raise FieldsError(f'Unknown field {key!r}.')
+            selected.update(matched)
+        # Keyed on the resolved set, so the cache is bounded by the payload's keys
+        selected = frozenset(selected)
+        plan = self._subsets.get(selected)
+        if plan is None:
+            plan = self._subsets[selected] = FieldPlan(
+                self.model, {key: lookup for key, lookup in self.lookups.items() if key in selected},
+            )
+        return plan
+
+    def values(self, queryset=None):
+        if queryset is None:
+            queryset = self.model.objects.all()
+        return queryset.values_list(*self.columns)
+
+    def to_dict(self, row):
+        return self.to_dicts([row])[0]
+
+    def to_dicts(self, rows):
+        keys, paths, conversions = self.keys, self.paths, self.conversions
+        tz = timezone.get_current_timezone()
+        result = []
+        for row in rows:
+            if conversions:
+                row = list(row)
+                for index, convert in conversions:
+                    row[index] = convert(row[index], tz)
+            if not self.nested:
+                result.append(dict(zip(keys, row[1:])))
+                continue
+            item = {}
+            for path, value in zip(paths, row[1:]):
+                target = item
+                for part in path[:-1]:
+                    target = target.setdefault(part, {})
+                target[path[-1]] = value
+            result.append(item)
+        return result
+
+
+def dumps(data):
+    """Encode ``data`` as JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_PASSTHROUGH_DATETIME, default=DjangoJSONEncoder().default)
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+def json_response(data, status=200):
+    """``JsonResponse`` equivalent encoding through ``dumps``; ``data`` may be a list."""
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
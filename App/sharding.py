@@ -0,0 +1,207 @@
+"""
+Optional hash sharding of students and their enrollments.
+
+With ``settings.APP_SHARDS`` set (see ``DJANGO_CRUD_SHARDS``), ``Student``
+and ``Enrollment`` rows live on one of the shard aliases and ``Course`` is
+replicated to all of them, so every enrollment joins its student and course
+without leaving its shard:
+
+* a student is placed on the shard picked by hashing its email (the key the
+  API looks students up by, known before the row has an id), and its
+  enrollments go to the same shard.
+* each shard hands out ids from its own range (``index << SHARD_ID_BITS``,
+  set up by ``manage.py init_shards``), so any student or enrollment id
+  routes straight to its shard.
+* courses are written on the first ("home") shard, which allocates their
+  ids, and copied to the other shards by the receivers in ``App.signals``.
+
+``ShardRouter`` sends sharded models to the shard selected with
+``use_shard()`` / ``on_shard()`` (or the shard of the instance at hand);
+lists read every shard and merge the rows on the primary key.
+"""
+import contextvars
+import heapq
+import zlib
+from contextlib import contextmanager
+from functools import wraps
+from operator import itemgetter
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import models, transaction
+
+SHARD_ID_BITS = 40
+REPLICATE_CHUNK_SIZE = 500
+
+SHARDED_MODELS = {'student', 'enrollment'}
+REPLICATED_MODELS = {'course'}
+
+_current = contextvars.ContextVar('App_shard', default=None)
+
+
+def shards():
+    return list(getattr(settings, 'APP_SHARDS', []))
+
+
+def enabled():
+    return bool(shards())
+
+
+def home_shard():
+    return shards()[0]
+
+
+def is_sharded(model):
+    return enabled() and model._meta.app_label == 'App' and model._meta.model_name in SHARDED_MODELS
+
+
+def first_id(alias):
+    """Lowest id the shard ``alias`` allocates."""
+    return (shards().index(alias) << SHARD_ID_BITS) + 1
+
+
+def shard_for_email(email):
+    aliases = shards()
+    if not aliases:
+        return None
+    return aliases[zlib.crc32(email.strip().lower().encode()) % len(aliases)]
+
+
+def shard_for_id(pk):
+    """Shard holding the student or enrollment ``pk``, None if sharding is off or the id is out of range."""
+    aliases = shards()
+    index = int(pk) >> SHARD_ID_BITS
+    return aliases[index] if aliases and index < len(aliases) else None
+
+
+def current_shard():
+    return _current.get()
+
+
+@contextmanager
+def use_shard(alias):
+    token = _current.set(alias)
+    try:
+        yield alias
+    finally:
+        _current.reset(token)
+
+
+def on_shard(alias, fn, *args, **kwargs):
+    """Call ``fn`` with sharded queries routed to ``alias``, in one transaction there."""
+    if alias is None:
+        return fn(*args, **kwargs)
+    with use_shard(alias), transaction.atomic(using=alias):
+        return fn(*args, **kwargs)
+
+
+def route_by_kwarg(url_kwarg):
+    """View decorator routing the request's sharded queries to the shard of the ``url_kwarg`` id."""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                with use_shard(shard_for_id(kwargs[url_kwarg])):
+                    return await view(request, *args, **kwargs)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                with use_shard(shard_for_id(kwargs[url_kwarg])):
+                    return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def scatter(queryset):
+    """One copy of ``queryset`` per shard, or ``[queryset]`` for unsharded models."""
+    if not is_sharded(queryset.model):
+        return [queryset]
+    return [queryset.using(alias) for alias in shards()]
+
+
+def merge(row_lists, key=itemgetter(0)):
+    """Merge per-shard rows that are each ordered on ``key`` (the pk of a listing row)."""
+    if len(row_lists) == 1:
+        return iter(row_lists[0])
+    return heapq.merge(*row_lists, key=key)
+
+
+def fetch(queryset):
+    """Rows of ``queryset`` from every shard, in primary key order."""
+    return list(merge([list(part) for part in scatter(queryset)]))
+
+
+async def afetch(queryset):
+    return list(merge([[row async for row in part] for part in scatter(queryset)]))
+
+
+def iterate(queryset, chunk_size):
+    """``queryset.iterator()`` over every shard at once, merged on the primary key."""
+    return merge([part.iterator(chunk_size=chunk_size) for part in scatter(queryset)])
+
+
+def replicate(model, pks):
+    """Copy the rows ``pks`` of a replicated ``model`` from the home shard to the other shards."""
+    fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+    pks = list(pks)
+    for start in range(0, len(pks), REPLICATE_CHUNK_SIZE):
+        rows = list(model._base_manager.using(home_shard()).filter(pk__in=pks[start:start + REPLICATE_CHUNK_SIZE]))
+        for alias in shards()[1:]:
+            model._base_manager.using(alias).bulk_create(
+                rows, update_conflicts=True, unique_fields=['id'], update_fields=fields,
+            )
+
+
+class ShardedManager(models.Manager):
+    """Manager with shard-aware entry points; plain queries go where ``ShardRouter`` sends them."""
+
+    def on(self, alias):
+        return self.get_queryset().using(alias)
+
+    def for_id(self, pk):
+        """Queryset on the shard holding the row ``pk`` (a student or enrollment id)."""
+        alias = shard_for_id(pk)
+        return self.on(alias) if alias else self.get_queryset()
+
+    def for_email(self, email):
+        """Queryset on the shard a student with ``email`` lives on."""
+        alias = shard_for_email(email)
+        return self.on(alias) if alias else self.get_queryset()
+
+    def scatter(self):
+        return scatter(self.get_queryset())
+
+
+class ShardRouter:
+    def route(self, model, hints):
+        if not enabled() or model._meta.app_label != 'App':
+            return None
+        name = model._meta.model_name
+        if name in SHARDED_MODELS:
+            instance = hints.get('instance')
+            if instance is not None and instance._state.db in shards():
+                return instance._state.db
+            return current_shard() or home_shard()
+        if name in REPLICATED_MODELS:
+            return current_shard() or home_shard()
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self.route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        if enabled() and model._meta.app_label == 'App' and model._meta.model_name in REPLICATED_MODELS:
+            # Only the home shard allocates course ids; App.signals copies the row everywhere else
+            return home_shard()
+        return self.route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        names = {obj1._meta.model_name, obj2._meta.model_name}
+        if enabled() and names <= SHARDED_MODELS | REPLICATED_MODELS:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in shards():
+            return app_label == 'App' and model_name in SHARDED_MODELS | REPLICATED_MODELS
+        return None
@@ -0,0 +1,85 @@
+"""
+Drop cached detail payloads and bump the list versions used for ETags when
+the rows they are built from change.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import caching, conditional, sharding
+from .models import Task, CrudUser, UserProfile, Author, Book, Student, Course, Enrollment
+
+
+@receiver([post_save, post_delete], sender=Task)
+def task_changed(sender, instance, **kwargs):
+    caching.invalidate('task', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=CrudUser)
+def user_changed(sender, instance, **kwargs):
+    caching.invalidate('user', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def profile_changed(sender, instance, **kwargs):
+    # The profile is embedded in its user's detail payload
+    caching.invalidate('user', instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Author)
+def author_changed(sender, instance, **kwargs):
+    caching.invalidate('author', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Book)
+def book_changed(sender, instance, **kwargs):
+    # Books are embedded in their author's detail payload
+    caching.invalidate('author', instance.author_id)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def enrollment_changed(sender, instance, **kwargs):
+    caching.invalidate('enrollment', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Student)
+def student_changed(sender, instance, **kwargs):
+    if kwargs.get('created'):
+        return  # a new row has no enrollments yet
+    # A student's enrollments live on the same database (shard) as the student
+    enrollment_ids = Enrollment.objects.using(kwargs['using']).filter(student_id=instance.pk).values_list('id', flat=True)
+    caching.invalidate('enrollment', *enrollment_ids)
+
+
+@receiver([post_save, post_delete], sender=Course)
+def course_changed(sender, instance, **kwargs):
+    if kwargs.get('created'):
+        return  # a new row has no enrollments yet
+    enrollment_ids = [
+        pk
+        for part in sharding.scatter(Enrollment.objects.filter(course_id=instance.pk))
+        for pk in part.values_list('id', flat=True)
+    ]
+    caching.invalidate('enrollment', *enrollment_ids)
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, using, **kwargs):
+    # Courses are written on the home shard and copied to every other shard
+    if sharding.enabled() and using == sharding.home_shard():
+        sharding.replicate(Course, [instance.pk])
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, using, **kwargs):
+    if sharding.enabled() and using == sharding.home_shard():
+        for alias in sharding.shards()[1:]:
+            Course.objects.using(alias).filter(pk=instance.pk).delete()
+
+
+def version_changed(sender, **kwargs):
+    conditional.bump(sender)
+
+
+for model in (Task, CrudUser, UserProfile, Author, Book, Student, Course, Enrollment):
+    post_save.connect(version_changed, sender=model, dispatch_uid=f'version_changed_{model.__name__}')
+    post_delete.connect(version_changed, sender=model, dispatch_uid=f'version_changed_{model.__name__}')
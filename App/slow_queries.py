@@ -0,0 +1,186 @@
+"""
+Slow-query log.
+
+``SlowQueryMiddleware`` times every statement run while serving a request.
+Statements slower than ``settings.APP_SLOW_QUERIES['THRESHOLD']`` seconds
+are appended to ``LOG`` as one JSON object per line: the SQL, its
+parameters redacted to type and length, the view (``url_name``) that
+issued it, the database alias, the duration and the query plan
+(``EXPLAIN QUERY PLAN`` on SQLite) taken right after the statement ran.
+
+Statements with the same shape share a ``fingerprint``: the SQL with
+literals, placeholders and ``IN`` lists normalized away. A process takes
+the plan the first time it logs a fingerprint and again at most every
+``PLAN_INTERVAL`` seconds; other entries carry ``"plan": null``.
+``manage.py slow_queries`` groups the log by fingerprint and lists the
+top offenders.
+
+Each entry is written with a single ``O_APPEND`` write, so worker
+processes can share the file.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import query_hooks
+
+DEFAULTS = {
+    'ENABLED': True,
+    'THRESHOLD': 0.1,
+    'LOG': 'slow_queries.log',
+    'PLAN_INTERVAL': 300,
+}
+
+# Statements EXPLAIN can describe without running them
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\bIN \((?:\?, )*\?\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'\bVALUES (?:\((?:\?, )*\?\), )*\((?:\?, )*\?\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+# fingerprint -> time.monotonic() of the last plan this process logged for it
+_planned = {}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'APP_SLOW_QUERIES', {})}
+
+
+def normalize(sql):
+    """The shape of ``sql``: literals and placeholders become ``?``, lists of them ``(...)``."""
+    sql = _SPACE.sub(' ', sql).strip()
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _VALUES_LIST.sub('VALUES (...)', sql)
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:16]
+
+
+def redact(value):
+    """Describe a parameter without revealing it."""
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (str, bytes, memoryview)):
+        return f'<{type(value).__name__}:{len(value)}>'
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return f'<{type(value).__name__}>'
+
+
+def explain(connection, sql, params):
+    """The plan of ``sql`` as text lines, or None when it cannot be explained."""
+    if not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    prefix = connection.ops.explain_query_prefix()
+    # A backend cursor: no execute wrappers, so the EXPLAIN is neither timed nor logged
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'{prefix} {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+    except Exception as exc:
+        return [f'EXPLAIN failed: {exc}']
+    finally:
+        cursor.close()
+
+
+def write_entry(path, entry):
+    line = (json.dumps(entry, default=str) + '\n').encode()
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def read_log(path):
+    """Entries of the log at ``path``; lines that do not parse are skipped."""
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+class SlowQueryRecorder:
+    """``execute_wrapper`` logging the statements of one request that exceed the threshold."""
+
+    def __init__(self, request, threshold, path, plan_interval):
+        self.request = request
+        self.threshold = threshold
+        self.path = path
+        self.plan_interval = plan_interval
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - start
+        if duration >= self.threshold:
+            self.log(sql, params, many, duration, context['connection'])
+        return result
+
+    def log(self, sql, params, many, duration, connection):
+        key = fingerprint(sql)
+        plan = None
+        now = time.monotonic()
+        if not many and (key not in _planned or now - _planned[key] >= self.plan_interval):
+            plan = explain(connection, sql, params)
+            _planned[key] = now
+        match = self.request.resolver_match
+        write_entry(self.path, {
+            'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'fingerprint': key,
+            'duration_ms': round(duration * 1000, 3),
+            'view': (match.url_name or match.view_name) if match else '',
+            'method': self.request.method,
+            'alias': connection.alias,
+            'sql': sql,
+            'params': None if many else redact(params),
+            'plan': plan,
+        })
+
+
+class SlowQueryMiddleware:
+    """Log the slow statements of every request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = get_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = config['THRESHOLD']
+        self.path = config['LOG']
+        self.plan_interval = config['PLAN_INTERVAL']
+        # Under ASGI stay async, so async views are not pushed onto the sync thread pool
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder = SlowQueryRecorder(request, self.threshold, self.path, self.plan_interval)
+        with query_hooks.wrapping_queries(recorder):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        recorder = SlowQueryRecorder(request, self.threshold, self.path, self.plan_interval)
+        async with query_hooks.awrapping_queries(recorder):
+            return await self.get_response(request)
@@ -0,0 +1,21 @@
+"""
+Per-connection SQLite tuning.
+
+``apply_pragmas`` runs on ``connection_created`` and issues the PRAGMAs from
+``settings.SQLITE_PRAGMAS`` (empty unless the production database profile is
+selected, see ``DJANGO_CRUD_DB_PROFILE`` in settings). With persistent
+connections (``CONN_MAX_AGE``) this happens once per worker thread rather
+than once per request.
+"""
+from django.conf import settings
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
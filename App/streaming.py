@@ -0,0 +1,69 @@
+"""
+Streaming JSON / NDJSON responses for large exports.
+
+Rows are read from the database in chunks with ``QuerySet.iterator()`` and
+each chunk is serialized and written out before the next one is fetched, so
+peak memory is bounded by the chunk size rather than the table size.
+"""
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+
+from . import sharding
+from .serialization import dumps
+
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def wants_stream(request):
+    return 'stream' in request.GET
+
+
+def stream_format(request):
+    # ?stream=ndjson (or ?format=ndjson) selects newline-delimited JSON
+    value = request.GET.get('format') or request.GET.get('stream')
+    return 'ndjson' if value == 'ndjson' else 'json'
+
+
+def iter_chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_json_array(chunks):
+    yield b'['
+    first = True
+    for items in chunks:
+        if not items:
+            continue
+        body = b','.join(dumps(item) for item in items)
+        yield body if first else b',' + body
+        first = False
+    yield b']'
+
+
+def iter_ndjson(chunks):
+    for items in chunks:
+        if items:
+            yield b''.join(dumps(item) + b'\n' for item in items)
+
+
+def streaming_response(request, queryset, serialize, chunk_size=CHUNK_SIZE):
+    """
+    Stream every row of ``queryset`` through ``serialize`` (which turns a
+    batch of rows into a list of dicts) as a JSON array or NDJSON.
+    """
+    fmt = stream_format(request)
+    rows = sharding.iterate(queryset, chunk_size)
+    chunks = (serialize(chunk) for chunk in iter_chunks(rows, chunk_size))
+    body = iter_ndjson(chunks) if fmt == 'ndjson' else iter_json_array(chunks)
+    return StreamingHttpResponse(body, content_type=CONTENT_TYPES[fmt])
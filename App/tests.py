@@ -1,3 +1,1757 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import os
+import pstats
+import shutil
+import sqlite3
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models.signals import post_delete
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import bulk, caching, conditional, jobs, listing, metrics, profiling, routers, serialization, sharding, slow_queries, streaming, transfer, writer
+from .management.commands.explain_hot_queries import is_full_scan
+from .models import Task, CrudUser, UserProfile, Author, Book, Student, Course, Enrollment, Job
+
+
+class AppTestCase(TestCase):
+    """Cached payloads must not leak between tests, whose rolled back rows reuse ids."""
+
+    def setUp(self):
+        caching.get_cache().clear()
+        caching.reset_stats()
+
+
+def make_tasks(count):
+    Task.objects.bulk_create(
+        Task(title=f'Task {i}', description=f'Description {i}') for i in range(count)
+    )
+
+
+def make_users(count):
+    users = CrudUser.objects.bulk_create(
+        CrudUser(username=f'user{i}', email=f'user{i}@example.com') for i in range(count)
+    )
+    UserProfile.objects.bulk_create(
+        UserProfile(user=user, bio=f'Bio {user.username}') for user in users
+    )
+
+
+def make_authors(count, books_per_author=3):
+    authors = Author.objects.bulk_create(
+        Author(name=f'Author {i}', bio=f'Bio {i}') for i in range(count)
+    )
+    Book.objects.bulk_create(
+        Book(author=author, book_name=f'{author.name} book {j}', content='...')
+        for author in authors
+        for j in range(books_per_author)
+    )
+
+
+def make_enrollments(count):
+    start = Student.objects.count()
+    students = Student.objects.bulk_create(
+        Student(name=f'Student {i}', email=f'student{i}@example.com') for i in range(start, start + count)
+    )
+    course = Course.objects.create(title='Maths', description='Algebra', start_date=datetime.date(2024, 9, 1))
+    Enrollment.objects.bulk_create(
+        Enrollment(student=student, course=course, grade='A') for student in students
+    )
+
+
+def without_versions(queries):
+    """Captured queries other than the list version reads and writes of App/conditional.py."""
+    return [q for q in queries if '"App_modelversion"' not in q['sql']]
+
+
+class ListingQueryCountTests(AppTestCase):
+    """List endpoints must issue a fixed number of queries regardless of row count."""
+
+    def assertQueriesIndependentOfRows(self, url, make_rows, expected_queries):
+        for count in (1, 25):
+            make_rows(count)
+            # Plus one for the list version behind the ETag
+            with self.assertNumQueries(expected_queries + 1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_tasks(self):
+        self.assertQueriesIndependentOfRows('/api/getmymodel/', make_tasks, 1)
+
+    def test_authors_with_books(self):
+        self.assertQueriesIndependentOfRows('/api/get_all_authors_one_to_many/', make_authors, 2)
+
+    def test_users_with_profiles(self):
+        self.assertQueriesIndependentOfRows('/api/get_all/', make_users, 1)
+
+    def test_enrollments(self):
+        self.assertQueriesIndependentOfRows('/api/get_student_course_many_to_many/', make_enrollments, 1)
+
+    def test_listing_payloads(self):
+        make_authors(2, books_per_author=2)
+        data = self.client.get('/api/get_all_authors_one_to_many/').json()
+        self.assertEqual([len(author['books']) for author in data], [2, 2])
+        self.assertEqual(data[0]['books'][0]['book_name'], 'Author 0 book 0')
+
+    def test_user_without_profile(self):
+        user = CrudUser.objects.create(username='lonely', email='lonely@example.com')
+        data = self.client.get('/api/get_all/').json()
+        self.assertEqual(data, [{
+            'id': user.id,
+            'username': 'lonely',
+            'email': 'lonely@example.com',
+            'profile': {'bio': None, 'website': None},
+        }])
+
+    def test_user_detail(self):
+        make_users(1)
+        user = CrudUser.objects.get()
+        # One query for the ETag validators, one for the user and profile
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/get_by_id/{user.id}/')
+        self.assertEqual(response.json()['profile']['bio'], 'Bio user0')
+
+
+class CursorPaginationTests(AppTestCase):
+
+    def walk(self, url, limit):
+        pages = []
+        response = self.client.get(url, {'limit': limit})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            pages.append(page['results'])
+            if page['next'] is None:
+                return pages
+            response = self.client.get(url, {'limit': limit, 'cursor': page['next']})
+
+    def test_pages_cover_every_row_once(self):
+        make_tasks(7)
+        pages = self.walk('/api/getmymodel/', 3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        ids = [task['id'] for page in pages for task in page]
+        self.assertEqual(ids, list(Task.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_exact_multiple_has_no_trailing_empty_page(self):
+        make_authors(4)
+        pages = self.walk('/api/get_all_authors_one_to_many/', 2)
+        self.assertEqual([len(page) for page in pages], [2, 2])
+        self.assertEqual(len(pages[0][0]['books']), 3)
+
+    def test_page_query_count(self):
+        make_enrollments(30)
+        # The list versions, then the page
+        with self.assertNumQueries(2):
+            self.client.get('/api/get_student_course_many_to_many/', {'limit': 10})
+        make_users(30)
+        with self.assertNumQueries(2):
+            self.client.get('/api/get_all/', {'limit': 10})
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/getmymodel/', {'limit': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/getmymodel/', {'limit': 0}).status_code, 400)
+        self.assertEqual(self.client.get('/api/getmymodel/', {'cursor': '!!'}).status_code, 400)
+
+
+class StreamingExportTests(AppTestCase):
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_json_array_matches_list_endpoint(self):
+        make_authors(3)
+        streamed = json.loads(self.read(self.client.get('/api/get_all_authors_one_to_many/', {'stream': 1})))
+        self.assertEqual(streamed, self.client.get('/api/get_all_authors_one_to_many/').json())
+
+    def test_ndjson_export(self):
+        make_tasks(5)
+        response = self.client.get('/api/export/tasks/', {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = self.read(response).splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], [f'Task {i}' for i in range(5)])
+
+    def test_chunked_prefetch(self):
+        make_authors(5)
+        response = streaming.streaming_response(
+            RequestFactory().get('/', {'stream': 1}), listing.author_queryset(), listing.serialize_authors,
+            chunk_size=2,
+        )
+        # One cursor over the authors plus one books query per chunk of two
+        with self.assertNumQueries(4):
+            data = json.loads(self.read(response))
+        self.assertEqual(len(data), 5)
+
+    def test_empty_and_unknown_exports(self):
+        self.assertEqual(json.loads(self.read(self.client.get('/api/export/books/'))), [])
+        self.assertEqual(self.client.get('/api/export/nope/').status_code, 404)
+
+
+class BulkBookCreateTests(AppTestCase):
+
+    def post(self, url, payload):
+        return self.client.post(url, json.dumps(payload), content_type='application/json')
+
+    def test_books_are_inserted_in_batches(self):
+        author = Author.objects.create(name='Prolific', bio='Writes a lot')
+        books = [{'book_name': f'Book {i}', 'content': 'text'} for i in range(2000)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(f'/api/only_book_post_one_to_many/{author.id}/', books)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Book.objects.filter(author=author).count(), 2000)
+        self.assertLess(len(queries), 30)
+        self.assertEqual(response.json()['books'][0], {
+            'author_id': author.id, 'author_name': 'Prolific', 'book_name': 'Book 0', 'content': 'text',
+        })
+
+    def test_invalid_book_rejects_whole_payload(self):
+        author = Author.objects.create(name='Careful', bio='')
+        books = [{'book_name': 'Good', 'content': 'text'}, {'book_name': 'Bad'}]
+        response = self.post(f'/api/only_book_post_one_to_many/{author.id}/', books)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Book.objects.exists())
+
+    def test_author_with_invalid_book_is_not_created(self):
+        response = self.post('/api/post_one_to_many/', {
+            'author_name': 'Half', 'author_bio': 'valid',
+            'books': [{'book_name': 'Good', 'content': 'text'}, {'content': 'no name'}],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Author.objects.exists())
+
+    def test_author_with_books(self):
+        response = self.post('/api/post_one_to_many/', {
+            'author_name': 'Whole', 'author_bio': 'valid',
+            'books': [{'book_name': 'One', 'content': 'text'}, {'book_name': 'Two', 'content': 'text'}],
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(Book.objects.values_list('book_name', 'author__name')), [('One', 'Whole'), ('Two', 'Whole')])
+
+
+class BulkEnrollmentTests(AppTestCase):
+
+    def post(self, payload):
+        return self.client.post(
+            '/api/bulk_create_student_course_many_to_many/', json.dumps(payload), content_type='application/json'
+        )
+
+    def item(self, student, course, grade='A'):
+        return {
+            'student': {'name': f'Student {student}', 'email': f'student{student}@example.com'},
+            'course': {'title': f'Course {course}', 'description': 'desc', 'start_date': '2024-09-01'},
+            'grade': grade,
+        }
+
+    def test_statuses(self):
+        Student.objects.create(name='Existing', email='student0@example.com')
+        self.post([self.item(0, 0)])
+        response = self.post([
+            self.item(0, 0),            # already enrolled
+            self.item(0, 1),            # existing student, new course
+            self.item(1, 1),            # new student, course created earlier in this payload
+            self.item(1, 1),            # duplicate within the payload
+            {'student': {'name': 'x'}},  # invalid
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([r['status'] for r in data['results']], ['exists', 'created', 'created', 'exists', 'error'])
+        self.assertEqual((data['created'], data['existing'], data['errors']), (2, 2, 1))
+        self.assertEqual(Student.objects.count(), 2)
+        self.assertEqual(Course.objects.count(), 2)
+        self.assertEqual(Enrollment.objects.count(), 3)
+        self.assertEqual(Student.objects.get(email='student0@example.com').name, 'Existing')
+
+    def test_malformed_items_are_per_item_errors(self):
+        response = self.post([
+            {'student': 'x', 'course': {}},
+            {**self.item(0, 0), 'course': ['Course 0']},
+            {**self.item(1, 0), 'student': {'name': 'Student 1', 'email': 5}},
+            self.item(2, 0),
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([r['status'] for r in data['results']], ['error', 'error', 'error', 'created'])
+        self.assertEqual(Enrollment.objects.count(), 1)
+
+    def test_items_are_validated_by_the_model_fields(self):
+        response = self.post([
+            {**self.item(0, 0), 'student': {'name': 'Student 0', 'email': 'notanemail'}},
+            {**self.item(1, 0), 'student': {'name': 'x' * 300, 'email': 'student1@example.com'}},
+            {**self.item(2, 0), 'course': {'title': 'x' * 300, 'description': 'desc', 'start_date': '2024-09-01'}},
+            {**self.item(3, 0), 'course': {'title': 'Course', 'description': 'desc', 'start_date': '2024-02-30'}},
+            self.item(4, 0, grade='ABC'),
+            self.item(5, 0),
+        ])
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], ['error'] * 5 + ['created'])
+        self.assertIn('Student email', results[0]['error'])
+        self.assertEqual(Student.objects.count(), 1)
+
+    def test_a_pair_written_concurrently_is_reported_as_existing(self):
+        self.post([self.item(0, 0)])
+        # As if another import inserted the pair after this one looked for it
+        with mock.patch.object(bulk, 'existing_enrollments', return_value=set()):
+            data = self.post([self.item(0, 0), self.item(1, 0)]).json()
+        self.assertEqual([r['status'] for r in data['results']], ['exists', 'created'])
+        self.assertEqual(Enrollment.objects.count(), 2)
+
+    def test_query_count_is_independent_of_payload_size(self):
+        for size in (5, 200):
+            payload = [self.item(f'{size}-{i}', i % 7) for i in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                data = self.post(payload).json()
+            self.assertEqual(data['created'], size)
+            self.assertLessEqual(len(queries), 12)
+
+
+class DetailCacheTests(AppTestCase):
+
+    def test_task_detail_is_served_from_cache(self):
+        task = Task.objects.create(title='Cached', description='once')
+        # Only the ETag validator query is left once the payload is cached
+        with self.assertNumQueries(2):
+            first = self.client.get(f'/api/getbyid/{task.id}/').json()
+        with self.assertNumQueries(1):
+            second = self.client.get(f'/api/getbyid/{task.id}/').json()
+        self.assertEqual(first, second)
+        self.assertEqual(caching.stats(), {'task': {'hits': 1, 'misses': 1}})
+
+    def test_missing_rows_are_not_cached(self):
+        self.assertEqual(self.client.get('/api/getbyid/999/').status_code, 404)
+        Task.objects.create(id=999, title='Now here', description='')
+        self.assertEqual(self.client.get('/api/getbyid/999/').status_code, 200)
+
+    def test_book_change_invalidates_author_detail(self):
+        make_authors(1, books_per_author=1)
+        author = Author.objects.get()
+        url = f'/api/get_author_detail_by_id_one_to_many/{author.id}/'
+        self.client.get(url)
+        Book.objects.filter(author=author).get().delete()
+        self.assertEqual(self.client.get(url).json()['books'], [])
+        self.client.post(
+            f'/api/only_book_post_one_to_many/{author.id}/',
+            json.dumps([{'book_name': 'New', 'content': 'text'}]), content_type='application/json',
+        )
+        self.assertEqual([b['book_name'] for b in self.client.get(url).json()['books']], ['New'])
+
+    def test_related_changes_invalidate_enrollment_and_user_detail(self):
+        make_enrollments(1)
+        enrollment = Enrollment.objects.get()
+        url = f'/api/get_student_course_many_to_many/{enrollment.id}/'
+        self.client.get(url)
+        enrollment.course.title = 'Geometry'
+        enrollment.course.save()
+        self.assertEqual(self.client.get(url).json()['course']['title'], 'Geometry')
+
+        make_users(1)
+        user = CrudUser.objects.get()
+        self.client.get(f'/api/get_by_id/{user.id}/')
+        UserProfile.objects.filter(user=user).get().delete()
+        self.assertEqual(self.client.get(f'/api/get_by_id/{user.id}/').json()['profile']['bio'], None)
+
+
+class ConditionalGetTests(AppTestCase):
+
+    def test_list_not_modified_until_a_write(self):
+        make_authors(3)
+        url = '/api/get_all_authors_one_to_many/'
+        etag = self.client.get(url)['ETag']
+        # Only the list versions are read
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Book.objects.first().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_version_is_shared_through_the_database(self):
+        make_tasks(2)
+        etag = self.client.get('/api/getmymodel/')['ETag']
+        # Nothing about it lives in this process's cache
+        caching.get_cache().clear()
+        self.assertEqual(self.client.get('/api/getmymodel/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Task.objects.create(title='New', description='...')
+        self.assertEqual(self.client.get('/api/getmymodel/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_bulk_writes_change_list_etag(self):
+        url = '/api/get_student_course_many_to_many/'
+        etag = self.client.get(url)['ETag']
+        self.client.post(
+            '/api/bulk_create_student_course_many_to_many/',
+            json.dumps([{
+                'student': {'name': 'New', 'email': 'new@example.com'},
+                'course': {'title': 'Art', 'description': 'Paint', 'start_date': '2024-09-01'},
+            }]),
+            content_type='application/json',
+        )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_author_detail_etag_tracks_books(self):
+        make_authors(1, books_per_author=2)
+        author = Author.objects.get()
+        url = f'/api/get_author_detail_by_id_one_to_many/{author.id}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Book.objects.filter(author=author).first().delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_detail_is_still_404(self):
+        self.assertEqual(self.client.get('/api/getbyid/404/').status_code, 404)
+        self.assertEqual(self.client.get('/api/get_student_course_many_to_many/404/').status_code, 404)
+
+
+class SerializationTests(AppTestCase):
+
+    def test_datetimes_are_formatted_alike_on_every_endpoint(self):
+        make_authors(1, books_per_author=1)
+        book = Book.objects.get()
+        task = Task.objects.create(title='T', description='D')
+        expected_book = serialization.format_datetime(book.created_at)
+        self.assertRegex(expected_book, r'^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d$')
+
+        self.assertEqual(self.client.get('/api/get_all_authors_one_to_many/').json()[0]['books'][0]['created_at'], expected_book)
+        detail = self.client.get(f'/api/get_author_detail_by_id_one_to_many/{book.author_id}/').json()
+        self.assertEqual(detail['books'][0]['created_at'], expected_book)
+        updated = self.client.put(
+            f'/api/update_book_one_to_many/{book.id}/', json.dumps({'book_name': 'Renamed'}),
+            content_type='application/json',
+        ).json()
+        self.assertEqual(updated['book']['created_at'], expected_book)
+        self.assertEqual(
+            self.client.get(f'/api/getbyid/{task.id}/').json()['created_at'],
+            serialization.format_datetime(task.created_at),
+        )
+
+    def test_nested_plan(self):
+        make_enrollments(1)
+        self.assertEqual(self.client.get('/api/get_student_course_many_to_many/').json()[0]['course']['start_date'], '2024-09-01')
+
+    def test_stdlib_fallback_matches_fast_encoder(self):
+        data = [{'a': 1, 'b': 'x', 'c': None, 'd': [1.5]}]
+        self.assertEqual(json.loads(serialization.dumps(data)), data)
+        with mock.patch.object(serialization, 'orjson', None):
+            self.assertEqual(json.loads(serialization.dumps(data)), data)
+
+
+class AsyncViewTests(AppTestCase):
+
+    async def test_lists_match_sync_endpoints(self):
+        await sync_to_async(make_authors)(3)
+        await sync_to_async(make_enrollments)(2)
+        await sync_to_async(make_users)(2)
+        for async_url, sync_url in [
+            ('/api/async/authors/', '/api/get_all_authors_one_to_many/'),
+            ('/api/async/enrollments/', '/api/get_student_course_many_to_many/'),
+            ('/api/async/users/', '/api/get_all/'),
+        ]:
+            expected = (await self.async_client.get(sync_url)).json()
+            self.assertEqual((await self.async_client.get(async_url)).json(), expected)
+
+        page = (await self.async_client.get('/api/async/authors/', {'limit': 2})).json()
+        self.assertEqual(len(page['results']), 2)
+        self.assertIsNotNone(page['next'])
+
+    async def test_task_crud(self):
+        self.assertEqual((await self.async_client.get('/api/async/tasks/')).json(), {'message': 'No tasks found'})
+        response = await self.async_client.post(
+            '/api/async/tasks/', json.dumps({'title': 'Async', 'description': 'task'}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        url = f'/api/async/tasks/{response.json()["task_id"]}/'
+        response = await self.async_client.put(url, json.dumps({'title': 'Renamed'}), content_type='application/json')
+        self.assertEqual(response.json()['task']['title'], 'Renamed')
+        for body in ({'title': ['x']}, {'title': 'x' * 256}, ['title']):
+            response = await self.async_client.put(url, json.dumps(body), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual((await self.async_client.get(url)).json()['description'], 'task')
+        self.assertEqual((await self.async_client.delete(url)).status_code, 200)
+        self.assertEqual((await self.async_client.get(url)).status_code, 404)
+
+    async def send(self, method, url, body):
+        return await getattr(self.async_client, method)(url, json.dumps(body), content_type='application/json')
+
+    async def test_user_writes(self):
+        response = await self.send('post', '/api/async/users/', {
+            'username': 'async', 'email': 'async@example.com', 'bio': 'Bio', 'website': 'https://example.com',
+        })
+        self.assertEqual(response.status_code, 201)
+        url = f'/api/async/users/{response.json()["user_id"]}/'
+        self.assertEqual((await self.send('put', url, {'bio': 'Put', 'username': 'renamed'})).status_code, 200)
+        self.assertEqual((await self.send('patch', url, {'website': 'https://example.org'})).status_code, 200)
+        user = (await self.async_client.get(url)).json()
+        self.assertEqual((user['username'], user['profile']['bio']), ('renamed', 'Put'))
+        self.assertEqual(user['profile']['website'], 'https://example.org')
+        self.assertEqual((await self.send('put', url, {'email': 'not an email'})).status_code, 400)
+        self.assertEqual((await self.send('patch', url, {'bio': ['x']})).status_code, 400)
+        response = await self.send('patch', '/api/async/users/999999/', {'bio': 'x'})
+        self.assertEqual(response.json(), {'error': 'User not found'})
+        self.assertEqual((await self.send('post', '/api/async/users/', {'email': 'x@example.com'})).status_code, 400)
+
+    async def test_author_and_book_writes(self):
+        response = await self.send('post', '/api/async/authors/', {'author_name': 'Async', 'author_bio': 'Bio'})
+        self.assertEqual(response.status_code, 201)
+        author_id = response.json()['author']['id']
+        other = await Author.objects.acreate(name='Other', bio='')
+        book = await Book.objects.acreate(author_id=author_id, book_name='One', content='text')
+        url = f'/api/async/authors/{author_id}/books/{book.id}/'
+
+        response = await self.send('put', url, {'book_name': 'Renamed', 'content': ''})
+        self.assertEqual(response.json()['book']['book_name'], 'Renamed')
+        self.assertEqual((await self.send('put', url, {'book_name': 'x' * 500})).status_code, 400)
+        self.assertEqual((await self.send('patch', url, {'author_id': 999999})).status_code, 404)
+        response = await self.send('patch', url, {'author_id': other.id})
+        self.assertEqual(response.json()['book_id'], book.id)
+        self.assertEqual((await self.send('patch', url, {'content': 'x'})).status_code, 404)  # moved to the other author
+
+        moved = f'/api/async/authors/{other.id}/books/{book.id}/'
+        self.assertEqual((await self.async_client.delete(moved)).status_code, 200)
+        self.assertFalse(await Book.objects.filter(pk=book.pk).aexists())
+        self.assertEqual((await self.async_client.delete(f'/api/async/authors/{author_id}/')).status_code, 200)
+        self.assertEqual((await self.async_client.delete(f'/api/async/authors/{author_id}/')).status_code, 404)
+        self.assertEqual((await self.send('post', '/api/async/authors/', {'author_bio': 'x'})).status_code, 400)
+
+    async def test_enrollment_writes(self):
+        item = {
+            'student': {'name': 'Async', 'email': 'async@example.com'},
+            'course': {'title': 'Course', 'description': 'desc', 'start_date': '2024-09-01'},
+            'grade': 'A',
+        }
+        response = await self.send('post', '/api/async/enrollments/', item)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((await self.send('post', '/api/async/enrollments/', item)).status_code, 400)  # exists
+        self.assertEqual((await self.send('post', '/api/async/enrollments/', {'student': {}})).status_code, 400)
+
+        enrollment = await Enrollment.objects.aget()
+        url = f'/api/async/enrollments/{enrollment.id}/'
+        response = await self.send('put', url, {'grade': 'B', 'course': {'title': 'Renamed'}})
+        self.assertEqual((response.json()['grade'], response.json()['course']['title']), ('B', 'Renamed'))
+        self.assertEqual((await self.send('put', url, {'grade': 'ABC'})).status_code, 400)
+        self.assertEqual((await self.send('put', url, {'student': 'x'})).status_code, 400)
+        self.assertEqual((await self.async_client.get(url)).json()['grade'], 'B')
+
+    async def test_book_create_and_author_detail(self):
+        author = await Author.objects.acreate(name='Async', bio='')
+        response = await self.async_client.post(
+            f'/api/async/authors/{author.id}/books/',
+            json.dumps([{'book_name': 'One', 'content': 'text'}]), content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        detail = (await self.async_client.get(f'/api/async/authors/{author.id}/')).json()
+        self.assertEqual([book['book_name'] for book in detail['books']], ['One'])
+
+
+class ExplainHotQueriesTests(AppTestCase):
+
+    def test_no_route_scans_a_whole_table(self):
+        make_authors(3)
+        make_enrollments(3)
+        out = io.StringIO()
+        call_command('explain_hot_queries', '--fail-on-scan', stdout=out)
+        self.assertIn('0 with full table scans', out.getvalue())
+        # Exports and unindexed bulk delete filters read whole tables by design
+        self.assertIn('EXPECTED SCAN: GET /api/export/tasks/', out.getvalue())
+        self.assertIn('EXPECTED SCAN: POST /api/bulk_delete/enrollments/', out.getvalue())
+
+    def test_scans_are_flagged(self):
+        self.assertTrue(is_full_scan('SCAN App_task'))
+        self.assertFalse(is_full_scan('SCAN App_task USING INDEX App_task_created_c1a602_idx'))
+        self.assertFalse(is_full_scan('SEARCH App_task USING INTEGER PRIMARY KEY (rowid>?)'))
+        self.assertFalse(is_full_scan('SCAN App_book_fts VIRTUAL TABLE INDEX 0:M2'))
+        self.assertTrue(is_full_scan('SCAN App_book_fts VIRTUAL TABLE INDEX 0:'))
+
+
+class SqlitePragmaTests(AppTestCase):
+
+    def connect(self):
+        # A fresh connection fires connection_created outside the test transaction
+        new_connection = connections.create_connection('default')
+        self.addCleanup(new_connection.close)
+        new_connection.ensure_connection()
+        return new_connection
+
+    def pragma(self, db, name):
+        with db.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_on_connect(self):
+        with self.settings(SQLITE_PRAGMAS={'synchronous': 'NORMAL', 'busy_timeout': 1234}):
+            db = self.connect()
+        self.assertEqual(self.pragma(db, 'synchronous'), 1)
+        self.assertEqual(self.pragma(db, 'busy_timeout'), 1234)
+
+    def test_development_profile_leaves_connection_alone(self):
+        with self.settings(SQLITE_PRAGMAS={}):
+            db = self.connect()
+        self.assertEqual(self.pragma(db, 'synchronous'), 2)
+
+
+class WriteQueueTests(TransactionTestCase):
+    """The writer thread needs committed data, so these tests do not run inside a transaction."""
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.addCleanup(writer.shutdown)
+
+    def start_queue(self, **kwargs):
+        queue = writer.WriteQueue(**kwargs)
+        self.addCleanup(queue.stop)
+        return queue
+
+    def submit_concurrently(self, queue, calls):
+        results = [None] * len(calls)
+
+        def submit(index, fn, kwargs):
+            try:
+                results[index] = queue.submit(fn, **kwargs)
+            except Exception as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=submit, args=(i, fn, kwargs)) for i, (fn, kwargs) in enumerate(calls)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_writes_share_transactions(self):
+        queue = self.start_queue(max_wait=0.05)
+        results = self.submit_concurrently(queue, [
+            (Task.objects.create, {'title': f'Task {i}', 'description': '...'}) for i in range(20)
+        ])
+        self.assertEqual(Task.objects.count(), 20)
+        self.assertEqual(sorted(task.title for task in results), sorted(f'Task {i}' for i in range(20)))
+        self.assertLess(queue.batches, 20)
+
+    def test_failing_write_only_fails_its_caller(self):
+        Student.objects.create(name='Taken', email='taken@example.com')
+        queue = self.start_queue(max_wait=0.05)
+        results = self.submit_concurrently(queue, [
+            (Student.objects.create, {'name': 'Duplicate', 'email': 'taken@example.com'}),
+            (Student.objects.create, {'name': 'Fresh', 'email': 'fresh@example.com'}),
+        ])
+        self.assertIsInstance(results[0], IntegrityError)
+        self.assertEqual(results[1].name, 'Fresh')
+        self.assertEqual(Student.objects.count(), 2)
+
+    def test_write_endpoints_go_through_the_queue(self):
+        with self.settings(APP_WRITE_QUEUE={'ENABLED': True}):
+            response = self.client.post(
+                '/api/mymodel/', {'title': 'Queued', 'description': '...'}, content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 201)
+            self.assertIsNotNone(writer._queue)
+            self.assertEqual(writer._queue.batches, 1)
+        self.assertTrue(Task.objects.filter(title='Queued').exists())
+
+    def test_disabled_queue_runs_inline(self):
+        with self.settings(APP_WRITE_QUEUE={'ENABLED': False}):
+            task = writer.run(Task.objects.create, title='Inline', description='...')
+        self.assertIsNone(writer._queue)
+        self.assertEqual(Task.objects.get().pk, task.pk)
+
+
+class ReplicaRouterTests(SimpleTestCase):
+
+    def read_alias(self, request):
+        # Run a "view" behind the middleware that reports where a read would go
+        seen = {}
+
+        def view(request):
+            seen['alias'] = routers.ReplicaRouter().db_for_read(Task)
+            return HttpResponse()
+
+        response = routers.ReplicaMiddleware(view)(request)
+        return seen['alias'], response
+
+    def test_reads_go_to_the_primary_without_replicas(self):
+        alias, _ = self.read_alias(RequestFactory().get('/api/getmymodel/'))
+        self.assertEqual(alias, 'default')
+
+    def test_get_requests_read_from_a_replica(self):
+        with self.settings(APP_READ_REPLICAS=['replica_1']):
+            alias, _ = self.read_alias(RequestFactory().get('/api/getmymodel/'))
+        self.assertEqual(alias, 'replica_1')
+        # Outside a request (commands, the writer thread) reads stay on the primary
+        self.assertEqual(routers.ReplicaRouter().db_for_read(Task), 'default')
+
+    def test_client_reads_its_writes_from_the_primary(self):
+        factory = RequestFactory()
+        with self.settings(APP_READ_REPLICAS=['replica_1'], APP_READ_YOUR_WRITES_SECONDS=30):
+            alias, response = self.read_alias(factory.post('/api/mymodel/'))
+            self.assertEqual(alias, 'default')
+            cookie = response.cookies[routers.STICKY_COOKIE]
+            self.assertEqual(cookie['max-age'], 30)
+
+            request = factory.get('/api/getmymodel/')
+            request.COOKIES[routers.STICKY_COOKIE] = cookie.value
+            alias, _ = self.read_alias(request)
+            self.assertEqual(alias, 'default')
+
+            request.COOKIES[routers.STICKY_COOKIE] = '0'
+            alias, _ = self.read_alias(request)
+            self.assertEqual(alias, 'replica_1')
+
+    async def test_async_chain_stays_async(self):
+        seen = {}
+
+        async def view(request):
+            seen['alias'] = routers.ReplicaRouter().db_for_read(Task)
+            return HttpResponse()
+
+        middleware = routers.ReplicaMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with self.settings(APP_READ_REPLICAS=['replica_1']):
+            await middleware(RequestFactory().get('/api/getmymodel/'))
+            response = await middleware(RequestFactory().post('/api/mymodel/'))
+        self.assertEqual(seen['alias'], 'default')
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+
+    def test_a_request_reads_one_replica_throughout(self):
+        seen = []
+
+        def view(request):
+            seen.extend(routers.ReplicaRouter().db_for_read(Task) for _ in range(20))
+            return HttpResponse()
+
+        with self.settings(APP_READ_REPLICAS=['replica_1', 'replica_2']):
+            routers.ReplicaMiddleware(view)(RequestFactory().get('/api/getmymodel/'))
+        self.assertEqual(len(set(seen)), 1)
+        self.assertIn(seen[0], ['replica_1', 'replica_2'])
+
+    def test_shared_payloads_and_validators_are_read_from_the_primary(self):
+        seen = {}
+
+        def view(request):
+            with routers.primary():
+                seen['primary'] = routers.ReplicaRouter().db_for_read(Task)
+            seen['cached'] = caching.cached_detail('probe', 1, lambda: routers.ReplicaRouter().db_for_read(Task))
+            seen['after'] = routers.ReplicaRouter().db_for_read(Task)
+            return HttpResponse()
+
+        caching.get_cache().delete(caching.detail_key('probe', 1))
+        with self.settings(APP_READ_REPLICAS=['replica_1']):
+            routers.ReplicaMiddleware(view)(RequestFactory().get('/api/getmymodel/'))
+        caching.get_cache().delete(caching.detail_key('probe', 1))
+        self.assertEqual(seen, {'primary': 'default', 'cached': 'default', 'after': 'replica_1'})
+
+
+class ReplicateDbTests(TransactionTestCase):
+
+    def test_copies_the_primary_into_a_replica_file(self):
+        make_tasks(3)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'replica.sqlite3')
+            call_command('replicate_db', '--to', path, stdout=io.StringIO())
+            replica = sqlite3.connect(path)
+            try:
+                self.assertEqual(replica.execute('SELECT COUNT(*) FROM App_task').fetchone()[0], 3)
+            finally:
+                replica.close()
+
+
+class ShardingTests(TransactionTestCase):
+    """Two fresh SQLite shard files per test, registered as database aliases."""
+
+    aliases = ['test_shard_0', 'test_shard_1']
+
+    def setUp(self):
+        caching.get_cache().clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        for alias in self.aliases:
+            connections.settings[alias] = {
+                **connections.settings['default'], 'NAME': os.path.join(tmp.name, f'{alias}.sqlite3'),
+            }
+            self.addCleanup(self.drop_alias, alias)
+        # Let the test touch the shards; they are dropped, not flushed, afterwards
+        databases = type(self).databases
+        type(self).databases = {*databases, *self.aliases}
+        self.addCleanup(setattr, type(self), 'databases', databases)
+
+        override = self.settings(APP_SHARDS=self.aliases)
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command('init_shards', stdout=io.StringIO())
+
+    def drop_alias(self, alias):
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+    def enroll(self, email, title='Maths', grade='A'):
+        return self.client.post('/api/create_student_course_many_to_many/', {
+            'student': {'name': email.split('@')[0], 'email': email},
+            'course': {'title': title, 'description': 'Algebra', 'start_date': '2024-09-01'},
+            'grade': grade,
+        }, content_type='application/json')
+
+    def emails_by_shard(self, count):
+        # Enough emails to put students on every shard
+        emails = [f'student{i}@example.com' for i in range(count)]
+        self.assertEqual({sharding.shard_for_email(email) for email in emails}, set(self.aliases))
+        return emails
+
+    def test_students_and_enrollments_live_on_the_email_shard(self):
+        for email in self.emails_by_shard(8):
+            self.assertEqual(self.enroll(email).status_code, 201)
+            alias = sharding.shard_for_email(email)
+            student = Student.objects.on(alias).get(email=email)
+            self.assertEqual(sharding.shard_for_id(student.pk), alias)
+            enrollment = Enrollment.objects.on(alias).get(student=student)
+            self.assertEqual(sharding.shard_for_id(enrollment.pk), alias)
+        # Each course exists once, with the same id, on every shard
+        courses = [list(Course.objects.using(alias).values_list('id', 'title')) for alias in self.aliases]
+        self.assertEqual(courses[0], courses[1])
+        self.assertEqual(len(courses[0]), 1)
+        self.assertFalse(Student.objects.using('default').exists())
+
+    def test_lists_merge_every_shard_in_id_order(self):
+        emails = self.emails_by_shard(8)
+        for email in emails:
+            self.enroll(email)
+        ids = [row['id'] for row in self.client.get('/api/get_student_course_many_to_many/').json()]
+        self.assertEqual(len(ids), 8)
+        self.assertEqual(ids, sorted(ids))
+
+        paged, cursor = [], None
+        while True:
+            params = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+            page = self.client.get('/api/get_student_course_many_to_many/', params).json()
+            paged += [row['id'] for row in page['results']]
+            cursor = page['next']
+            if cursor is None:
+                break
+        self.assertEqual(paged, ids)
+
+        streamed = [json.loads(line)['id'] for line in b''.join(
+            self.client.get('/api/export/enrollments/', {'format': 'ndjson'}).streaming_content
+        ).splitlines()]
+        self.assertEqual(streamed, ids)
+
+    def test_detail_routes_by_id(self):
+        emails = self.emails_by_shard(8)
+        for email in emails:
+            self.enroll(email)
+        enrollment = Enrollment.objects.on(self.aliases[1]).select_related('student').first()
+        url = f'/api/get_student_course_many_to_many/{enrollment.pk}/'
+        self.assertEqual(self.client.get(url).json()['student']['email'], enrollment.student.email)
+
+        response = self.client.put(
+            f'/api/put_student_course_many_to_many/{enrollment.pk}/',
+            {'grade': 'B', 'course': {'title': 'Geometry'}}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url).json()['grade'], 'B')
+        # The course change reached every shard
+        for alias in self.aliases:
+            self.assertEqual(Course.objects.using(alias).get().title, 'Geometry')
+
+        response = self.client.delete(f'/api/delete_student_course_many_to_many/{enrollment.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_bulk_import_splits_by_shard(self):
+        emails = self.emails_by_shard(8)
+        items = [
+            {'student': {'name': 'S', 'email': email}, 'course': {'title': 'Art', 'description': 'Paint', 'start_date': '2024-09-01'}}
+            for email in emails
+        ]
+        response = self.client.post('/api/bulk_create_student_course_many_to_many/', items, content_type='application/json')
+        self.assertEqual(response.json()['created'], 8)
+        for alias in self.aliases:
+            self.assertEqual(Course.objects.using(alias).count(), 1)
+            for student_id, email in Student.objects.on(alias).values_list('id', 'email'):
+                self.assertEqual(sharding.shard_for_email(email), alias)
+                self.assertEqual(sharding.shard_for_id(student_id), alias)
+        self.assertEqual(sum(Enrollment.objects.on(alias).count() for alias in self.aliases), 8)
+
+
+    def test_list_version_is_bumped_again_when_a_shard_commits(self):
+        with transaction.atomic(using=self.aliases[1]):
+            conditional.bump(Enrollment)
+            during = conditional.model_version(Enrollment)
+        self.assertNotEqual(conditional.model_version(Enrollment), during)
+
+    def test_unsharded_dump_is_spread_over_the_shards_by_email(self):
+        emails = self.emails_by_shard(8)
+        with self.settings(APP_SHARDS=[]), tempfile.TemporaryDirectory() as directory:
+            for email in emails:
+                self.enroll(email)
+            # Every id is in the first shard's range
+            self.assertTrue(all(pk < 1 << sharding.SHARD_ID_BITS for pk in Student.objects.values_list('pk', flat=True)))
+            call_command('export_data', directory, stdout=io.StringIO())
+            Enrollment.objects.all().delete()
+            Student.objects.all().delete()
+            Course.objects.all().delete()
+            with self.settings(APP_SHARDS=self.aliases):
+                call_command('import_data', directory, stdout=io.StringIO())
+                # A second run adds nothing
+                call_command('import_data', directory, stdout=io.StringIO())
+
+        for email in emails:
+            alias = sharding.shard_for_email(email)
+            student = Student.objects.on(alias).get(email=email)
+            self.assertEqual(sharding.shard_for_id(student.pk), alias)
+            enrollment = Enrollment.objects.on(alias).get(student=student)
+            self.assertEqual(sharding.shard_for_id(enrollment.pk), alias)
+        for alias in self.aliases:
+            self.assertEqual(Student.objects.on(alias).count(), Enrollment.objects.on(alias).count())
+            self.assertEqual(Course.objects.using(alias).count(), 1)
+        self.assertEqual(sum(Student.objects.on(alias).count() for alias in self.aliases), len(emails))
+
+    def test_data_transfer_puts_rows_back_on_their_shards(self):
+        for email in self.emails_by_shard(8):
+            self.enroll(email)
+        before = {
+            alias: [list(model.objects.using(alias).order_by('pk').values_list('pk')) for model in (Student, Course, Enrollment)]
+            for alias in self.aliases
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('export_data', directory, stdout=io.StringIO())
+            for alias in self.aliases:
+                for model in (Enrollment, Student, Course):
+                    model.objects.using(alias).all().delete()
+            call_command('import_data', directory, stdout=io.StringIO())
+        after = {
+            alias: [list(model.objects.using(alias).order_by('pk').values_list('pk')) for model in (Student, Course, Enrollment)]
+            for alias in self.aliases
+        }
+        self.assertEqual(after, before)
+
+
+class SeedBenchTests(AppTestCase):
+
+    def test_seeds_every_model(self):
+        call_command('seed_bench', scale='small', stdout=io.StringIO())
+        for model in (Task, CrudUser, UserProfile, Author, Book, Student, Course, Enrollment):
+            self.assertTrue(model.objects.exists(), model.__name__)
+        self.assertEqual(Enrollment.objects.count(), Student.objects.count() * 4)
+
+    def test_flush_replaces_the_dataset(self):
+        call_command('seed_bench', scale='small', stdout=io.StringIO())
+        call_command('seed_bench', scale='small', flush=True, stdout=io.StringIO())
+        self.assertEqual(Task.objects.count(), 1000)
+        self.assertEqual(Student.objects.count(), 500)
+
+
+class MetricsTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def scrape(self):
+        response = self.client.get('/api/metrics')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode().splitlines()
+
+    def value(self, lines, prefix):
+        matches = [line for line in lines if line.startswith(prefix)]
+        self.assertEqual(len(matches), 1, prefix)
+        return float(matches[0].rsplit(' ', 1)[1])
+
+    def test_records_requests_per_view_and_method(self):
+        make_tasks(3)
+        self.client.get('/api/getmymodel/')
+        self.client.get('/api/getmymodel/')
+        self.client.get('/api/getbyid/999999/')
+
+        lines = self.scrape()
+        labels = 'view="getmymodel",route="api/getmymodel/",method="GET"'
+        self.assertEqual(self.value(lines, f'app_http_requests_total{{{labels},status="200"}}'), 2)
+        self.assertEqual(self.value(lines, f'app_http_request_duration_seconds_count{{{labels}}}'), 2)
+        self.assertEqual(self.value(lines, f'app_http_request_duration_seconds_bucket{{{labels},le="+Inf"}}'), 2)
+        self.assertGreater(self.value(lines, f'app_db_queries_total{{{labels}}}'), 0)
+        self.assertGreater(self.value(lines, f'app_http_response_size_bytes_total{{{labels}}}'), 0)
+        self.assertIn('app_http_requests_total{view="getbyid",route="api/getbyid/<int:task_id>/",'
+                      'method="GET",status="404"} 1', lines)
+
+    async def test_async_views_are_recorded_without_leaving_the_event_loop(self):
+        async def view(request):
+            return HttpResponse(b'ok')
+
+        self.assertTrue(iscoroutinefunction(metrics.MetricsMiddleware(view)))
+        await sync_to_async(make_tasks)(2)
+        await self.async_client.get('/api/async/tasks/')
+        lines = await sync_to_async(self.scrape)()
+        labels = 'view="AsyncTaskListView",route="api/async/tasks/",method="GET"'
+        self.assertEqual(self.value(lines, f'app_http_requests_total{{{labels},status="200"}}'), 1)
+        self.assertGreater(self.value(lines, f'app_db_queries_total{{{labels}}}'), 0)
+
+    def test_folds_in_threads_that_exited(self):
+        thread = threading.Thread(target=metrics.record, args=('v', 'r', 'GET', 200, 0.02, 3, 0.001, 10))
+        thread.start()
+        thread.join()
+        metrics.record('v', 'r', 'GET', 500, 20.0, 1, 0.001, 5)
+
+        totals = metrics.snapshot()['v\tr\tGET']
+        self.assertEqual(totals['statuses'], {'200': 1, '500': 1})
+        self.assertEqual(totals['queries'], 4)
+        self.assertEqual(totals['buckets'][metrics.BUCKETS.index(0.025)], 1)
+        self.assertEqual(totals['buckets'][-1], 1)
+        self.assertNotIn(thread, [t for t, store in metrics._stores])
+
+    def test_adds_up_worker_processes_through_the_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        other = {'v\tr\tGET': {'statuses': {'200': 5}, 'buckets': [5] + [0] * len(metrics.BUCKETS),
+                               'seconds': 0.01, 'queries': 10, 'query_seconds': 0.005, 'bytes': 100}}
+        with open(os.path.join(directory, '1-other.json'), 'w') as f:
+            json.dump(other, f)
+
+        with self.settings(APP_METRICS={'DIR': directory}):
+            metrics.record('v', 'r', 'GET', 200, 0.001, 2, 0.001, 50)
+            totals = metrics.collect()
+        self.assertEqual(len(os.listdir(directory)), 2)
+        self.assertEqual(totals['v\tr\tGET']['statuses'], {'200': 6})
+        self.assertEqual(totals['v\tr\tGET']['queries'], 12)
+        self.assertEqual(totals['v\tr\tGET']['bytes'], 150)
+
+
+class ProfilingTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        override = self.settings(APP_PROFILING={'DIR': self.directory})
+        override.enable()
+        self.addCleanup(override.disable)
+        make_authors(3)
+
+    def test_untouched_without_header_or_flag(self):
+        response = self.client.get('/api/get_all_authors_one_to_many/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_signed_header_writes_profile_and_sql_log(self):
+        response = self.client.get('/api/get_all_authors_one_to_many/', HTTP_X_APP_PROFILE=profiling.make_token())
+        self.assertEqual(response.status_code, 200)
+        timings = dict(part.split(';dur=') for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timings), {'db', 'serialization', 'view', 'total'})
+        self.assertGreater(float(timings['db']), 0)
+
+        name = response['X-App-Profile-Id']
+        self.assertIn('AuthorsView', name)
+        pstats.Stats(os.path.join(self.directory, f'{name}.prof'))
+        with open(os.path.join(self.directory, f'{name}.sql.log')) as f:
+            log = f.read()
+        self.assertIn('SELECT', log)
+        self.assertIn('App_author', log)
+
+    def test_bad_token_is_ignored(self):
+        response = self.client.get('/api/get_all_authors_one_to_many/', HTTP_X_APP_PROFILE='profile:forged')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_query_flag_only_from_allowed_addresses(self):
+        # Loopback is not trusted by default: a local reverse proxy makes every request come from it
+        response = self.client.get('/api/get_all_authors_one_to_many/?__profile=1')
+        self.assertNotIn('Server-Timing', response)
+        with self.settings(APP_PROFILING={'DIR': self.directory, 'ALLOWED_IPS': ('127.0.0.1',)}):
+            # A new client builds its middleware with the setting in force
+            client = self.client_class()
+            response = client.get('/api/get_all_authors_one_to_many/?__profile=1')
+            self.assertIn('Server-Timing', response)
+            response = client.get('/api/get_all_authors_one_to_many/?__profile=1', REMOTE_ADDR='10.0.0.1')
+            self.assertNotIn('Server-Timing', response)
+
+    async def test_async_views_are_profiled_on_the_event_loop(self):
+        async def view(request):
+            return HttpResponse(b'ok')
+
+        self.assertTrue(iscoroutinefunction(profiling.ProfilingMiddleware(view)))
+        response = await self.async_client.get('/api/async/authors/', headers={'X-App-Profile': profiling.make_token()})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Server-Timing', response)
+        self.assertIn('AsyncAuthorListView', response['X-App-Profile-Id'])
+        timings = dict(part.split(';dur=') for part in response['Server-Timing'].split(', '))
+        self.assertGreater(float(timings['db']), 0)
+
+
+class SlowQueryLogTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.log = os.path.join(directory, 'slow.log')
+        # Every statement counts as slow
+        override = self.settings(APP_SLOW_QUERIES={'THRESHOLD': 0, 'LOG': self.log})
+        override.enable()
+        self.addCleanup(override.disable)
+        slow_queries._planned.clear()
+        make_tasks(3)
+
+    def test_fingerprint_ignores_literals_and_list_lengths(self):
+        self.assertEqual(
+            slow_queries.fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s) AND "x" = \'a\' LIMIT 21'),
+            slow_queries.fingerprint('SELECT  * FROM "t" WHERE "id" IN (%s, %s, %s) AND "x" = \'b\' LIMIT 5'),
+        )
+        self.assertNotEqual(slow_queries.fingerprint('SELECT "a" FROM "t"'), slow_queries.fingerprint('SELECT "b" FROM "t"'))
+
+    def test_logs_statements_with_view_redacted_params_and_plan(self):
+        task = Task.objects.first()
+        self.client.get(f'/api/getbyid/{task.pk}/')
+        caching.get_cache().clear()
+        self.client.get(f'/api/getbyid/{task.pk}/')
+
+        entries = [entry for entry in slow_queries.read_log(self.log) if '"title"' in entry['sql']]
+        self.assertEqual(len(entries), 2)
+        first, second = entries
+        self.assertEqual(first['fingerprint'], second['fingerprint'])
+        self.assertEqual(first['view'], 'getbyid')
+        self.assertEqual(set(first['params']), {'<int>'})
+        self.assertTrue(any('App_task' in detail for detail in first['plan']))
+        # The plan of a shape is captured once per PLAN_INTERVAL
+        self.assertIsNone(second['plan'])
+
+    async def test_async_views_are_logged_without_leaving_the_event_loop(self):
+        async def view(request):
+            return HttpResponse(b'ok')
+
+        self.assertTrue(iscoroutinefunction(slow_queries.SlowQueryMiddleware(view)))
+        task = await Task.objects.afirst()
+        await self.async_client.get(f'/api/async/tasks/{task.pk}/')
+        entries = slow_queries.read_log(self.log)
+        self.assertIn('AsyncTaskDetailView', {entry['view'] for entry in entries})
+
+    def test_report_groups_by_fingerprint(self):
+        for i in range(3):
+            caching.get_cache().clear()
+            self.client.get(f'/api/getbyid/{Task.objects.first().pk}/')
+        out = io.StringIO()
+        call_command('slow_queries', log=self.log, stdout=out)
+        report = out.getvalue()
+        # The version lookup for the ETag and the detail read, three times each
+        self.assertEqual(report.count('count 3'), 2)
+        self.assertIn('GET getbyid (3)', report)
+        self.assertIn('6 slow statements in 2 distinct shapes.', report)
+
+
+class SearchTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = Author.objects.create(name='Author', bio='Bio')
+        self.title_hit = Book.objects.create(author=self.author, book_name='Gardening', content='soil and seeds')
+        self.body_hit = Book.objects.create(author=self.author, book_name='Notes', content='a chapter on gardening tools')
+        Book.objects.create(author=self.author, book_name='Cooking', content='pasta')
+
+    def search(self, resource, **params):
+        response = self.client.get(f'/api/search/{resource}/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_ranks_title_matches_first_with_snippets(self):
+        results = self.search('books', q='gardening')['results']
+        self.assertEqual([book['id'] for book in results], [self.title_hit.id, self.body_hit.id])
+        self.assertEqual(results[1]['snippet'], 'a chapter on <mark>gardening</mark> tools')
+        self.assertEqual(results[0]['author_id'], self.author.id)
+        self.assertGreater(results[0]['score'], results[1]['score'])
+
+    def test_snippets_escape_stored_html(self):
+        Book.objects.create(author=self.author, book_name='Markup', content='<b>weeding</b> & <script>x</script>')
+        results = self.search('books', q='weeding')['results']
+        self.assertEqual(
+            results[0]['snippet'], '&lt;b&gt;<mark>weeding</mark>&lt;/b&gt; &amp; &lt;script&gt;x&lt;/script&gt;',
+        )
+
+    def test_prefix_and_phrase_queries(self):
+        self.assertEqual(len(self.search('books', q='garden*')['results']), 2)
+        self.assertEqual(len(self.search('books', q='garden')['results']), 0)
+        self.assertEqual([b['id'] for b in self.search('books', q='"gardening tools"')['results']], [self.body_hit.id])
+
+    def test_pages_through_every_match_once(self):
+        make_tasks(25)
+        seen, cursor = [], None
+        while True:
+            params = {'q': 'description', 'limit': 10}
+            if cursor:
+                params['cursor'] = cursor
+            page = self.search('tasks', **params)
+            seen += [task['id'] for task in page['results']]
+            cursor = page['next']
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(Task.objects.values_list('id', flat=True)))
+
+    def test_index_follows_updates_and_deletes(self):
+        Book.objects.filter(pk=self.body_hit.pk).update(content='nothing relevant')
+        self.title_hit.delete()
+        self.assertEqual(self.search('books', q='gardening')['results'], [])
+        Book.objects.bulk_create([Book(author=self.author, book_name='Gardening again', content='...')])
+        self.assertEqual(len(self.search('books', q='gardening')['results']), 1)
+
+    def test_query_syntax_is_treated_as_text(self):
+        self.assertEqual(self.search('books', q='gardening" OR NEAR(pasta')['results'], [])
+        self.assertEqual(self.client.get('/api/search/books/', {'q': '()*'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/search/authors/', {'q': 'x'}).status_code, 404)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO App_book_fts(App_book_fts) VALUES ('delete-all')")
+        self.assertEqual(self.search('books', q='gardening')['results'], [])
+        call_command('rebuild_search_index', index=['books'], stdout=io.StringIO())
+        self.assertEqual(len(self.search('books', q='gardening')['results']), 2)
+
+
+class SparseFieldsetTests(AppTestCase):
+
+    def test_task_list_reads_only_requested_columns(self):
+        make_tasks(3)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/getmymodel/', {'fields': 'id,title'})
+        self.assertEqual(response.json()[0], {'id': Task.objects.order_by('id').first().id, 'title': 'Task 0'})
+        select = [q['sql'] for q in queries if 'FROM "App_task"' in q['sql']][-1]
+        self.assertNotIn('description', select)
+
+    def test_nested_book_fields_and_skipped_books_query(self):
+        make_authors(2, books_per_author=2)
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/get_all_authors_one_to_many/', {'fields': 'author_name,books.book_name'}).json()
+        self.assertEqual(data[0], {'author_name': 'Author 0', 'books': [
+            {'book_name': 'Author 0 book 0'}, {'book_name': 'Author 0 book 1'},
+        ]})
+        self.assertFalse(any('"content"' in q['sql'] or '"bio"' in q['sql'] for q in queries))
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/get_all_authors_one_to_many/', {'fields': 'id', 'limit': 1}).json()
+        self.assertEqual(list(data['results'][0]), ['id'])
+        self.assertIsNotNone(data['next'])
+        self.assertFalse(any('App_book' in q['sql'] for q in queries))
+
+    def test_prefix_selects_nested_object(self):
+        make_enrollments(1)
+        data = self.client.get('/api/get_student_course_many_to_many/', {'fields': 'student,grade'}).json()
+        self.assertEqual(set(data[0]), {'student', 'grade'})
+        self.assertEqual(set(data[0]['student']), {'id', 'name', 'email'})
+
+    def test_unknown_field_is_rejected(self):
+        make_tasks(1)
+        for path in ('/api/getmymodel/', '/api/get_all_authors_one_to_many/', '/api/async/tasks/'):
+            response = self.client.get(path, {'fields': 'id,nope'})
+            self.assertEqual(response.status_code, 400, path)
+        response = self.client.get('/api/get_all_authors_one_to_many/', {'fields': 'books.author_id'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_async_and_export_accept_fields(self):
+        make_authors(1, books_per_author=1)
+        data = self.client.get('/api/async/authors/', {'fields': 'author_name,books.book_name'}).json()
+        self.assertEqual(data, [{'author_name': 'Author 0', 'books': [{'book_name': 'Author 0 book 0'}]}])
+        response = self.client.get('/api/export/books/', {'fields': 'book_name', 'format': 'ndjson'})
+        self.assertEqual(b''.join(response.streaming_content).decode().strip(), '{"book_name":"Author 0 book 0"}')
+
+
+class PartialUpdateTests(AppTestCase):
+
+    def patch(self, path, body, **headers):
+        return self.client.patch(path, json.dumps(body), content_type='application/json', **headers)
+
+    def test_task_patch_is_one_update_of_the_sent_columns(self):
+        task = Task.objects.create(title='Old', description='Long text')
+        self.client.get(f'/api/getbyid/{task.pk}/')  # cache the detail
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch(f'/api/put/{task.pk}/', {'title': 'New'})
+        self.assertEqual(response.json(), {'message': 'Task updated successfully', 'task_id': task.pk})
+        queries = without_versions(queries)
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('UPDATE'))
+        self.assertNotIn('description', queries[0]['sql'])
+
+        task.refresh_from_db()
+        self.assertEqual((task.title, task.description), ('New', 'Long text'))
+        self.assertGreater(task.updated_at, task.created_at)
+        self.assertEqual(self.client.get(f'/api/getbyid/{task.pk}/').json()['title'], 'New')
+
+    def test_task_patch_representation_and_errors(self):
+        task = Task.objects.create(title='Old', description='Long text')
+        response = self.patch(f'/api/put/{task.pk}/', {'description': 'Short'}, HTTP_PREFER='return=representation')
+        self.assertEqual(response.json()['task']['description'], 'Short')
+        self.assertEqual(response.json()['task']['title'], 'Old')
+        self.assertEqual(self.patch('/api/put/999999/', {'title': 'x'}).status_code, 404)
+        self.assertEqual(self.patch(f'/api/put/{task.pk}/', {'title': None}).status_code, 400)
+        self.assertEqual(self.patch(f'/api/put/{task.pk}/', {'other': 1}).status_code, 400)
+        self.assertEqual(self.patch(f'/api/put/{task.pk}/', {'title': 'x' * 256}).status_code, 400)
+        self.assertEqual(self.patch(f'/api/put/{task.pk}/', {'title': ['x']}).status_code, 400)
+        self.assertEqual(self.patch(f'/api/put/{task.pk}/', {'description': {'text': 'x'}}).status_code, 400)
+        self.assertEqual(self.patch(f'/api/put/{task.pk}/', {'title': 5}).status_code, 400)
+        response = self.client.put(f'/api/put/{task.pk}/', json.dumps({'title': ['x']}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Task.objects.get().title, 'Old')
+
+    def test_book_patch_and_put_write_only_changed_columns(self):
+        make_authors(2, books_per_author=1)
+        first, second = Author.objects.order_by('id')
+        book = Book.objects.get(author=first)
+        self.client.get(f'/api/get_author_detail_by_id_one_to_many/{first.pk}/')  # cache the old author
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch(f'/api/update_book_one_to_many/{book.pk}/', {'book_name': 'Renamed'})
+        self.assertEqual(response.status_code, 200)
+        update = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(update), 1)
+        self.assertNotIn('"content"', update[0])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(
+                f'/api/update_book_one_to_many/{book.pk}/', json.dumps({'author_id': second.pk}),
+                content_type='application/json',
+            )
+        self.assertEqual(response.json()['book']['author'], second.name)
+        # The book with its author, the new author, the update
+        self.assertEqual(len(without_versions(queries)), 3)
+        detail = self.client.get(f'/api/get_author_detail_by_id_one_to_many/{first.pk}/').json()
+        self.assertEqual(detail['books'], [])
+
+        response = self.patch(f'/api/update_book_one_to_many/{book.pk}/', {'author_id': 999999})
+        self.assertEqual(response.status_code, 404)
+        response = self.patch(f'/api/update_book_one_to_many/{book.pk}/', {'author_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        for body in ({'book_name': 'x' * 500}, {'content': ['x']}, {'author_id': 'abc'}):
+            response = self.client.put(
+                f'/api/update_book_one_to_many/{book.pk}/', json.dumps(body), content_type='application/json',
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(Book.objects.get(pk=book.pk).book_name, 'Renamed')
+
+    def test_user_patch_updates_each_table_once(self):
+        make_users(1)
+        user = CrudUser.objects.get()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch(f'/api/put_one_by_one/{user.pk}/', {'email': 'new@example.com', 'bio': 'New bio'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 2)
+        self.assertFalse([q for q in queries if q['sql'].startswith('SELECT')])
+        self.assertEqual(self.client.get(f'/api/get_by_id/{user.pk}/').json()['profile']['bio'], 'New bio')
+
+        self.assertEqual(self.patch('/api/put_one_by_one/999999/', {'email': 'x@example.com'}).status_code, 404)
+        response = self.patch('/api/put_one_by_one/999999/', {'bio': 'x'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['error'], 'User not found')
+        self.assertEqual(self.patch(f'/api/put_one_by_one/{user.pk}/', {'email': 'not an email'}).status_code, 400)
+
+
+class NestedUpdateTests(AppTestCase):
+    """The nested PUT handlers read once, save only what changed and commit once."""
+
+    def put(self, path, body):
+        return self.client.put(path, json.dumps(body), content_type='application/json')
+
+    def statements(self, queries):
+        return [q['sql'] for q in without_versions(queries) if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]
+
+    def test_enrollment_grade_only_put_is_one_read_and_one_update(self):
+        make_enrollments(1)
+        enrollment = Enrollment.objects.get()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.put(f'/api/put_student_course_many_to_many/{enrollment.pk}/', {'grade': 'B'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['student']['name'], enrollment.student.name)
+        self.assertEqual(response.json()['grade'], 'B')
+        statements = self.statements(queries)
+        self.assertEqual(len(statements), 2)
+        self.assertTrue(statements[0].startswith('SELECT'))
+        self.assertIn('JOIN', statements[0])
+        self.assertTrue(statements[1].startswith('UPDATE "App_enrollment"'))
+
+    def test_enrollment_put_skips_unchanged_objects(self):
+        make_enrollments(1)
+        enrollment = Enrollment.objects.get()
+        body = {
+            'student': {'name': enrollment.student.name, 'email': enrollment.student.email},
+            'course': {'title': 'Maths', 'start_date': '2024-09-01'},
+            'grade': 'A',
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.put(f'/api/put_student_course_many_to_many/{enrollment.pk}/', body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statements(queries), [queries[0]['sql']])
+
+        body['course']['description'] = 'Geometry'
+        with CaptureQueriesContext(connection) as queries:
+            self.put(f'/api/put_student_course_many_to_many/{enrollment.pk}/', body)
+        updates = [sql for sql in self.statements(queries) if sql.startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertTrue(updates[0].startswith('UPDATE "App_course" SET "description"'))
+        self.assertNotIn('"title"', updates[0])
+
+    def test_enrollment_put_errors(self):
+        make_enrollments(2)
+        first, second = Enrollment.objects.select_related('student').order_by('id')
+        path = f'/api/put_student_course_many_to_many/{first.pk}/'
+        self.assertEqual(self.put(path, {'course': {'start_date': 'soon'}}).status_code, 400)
+        self.assertEqual(self.put(path, {'student': {'email': second.student.email}}).status_code, 400)
+        self.assertEqual(self.put(path, {'grade': 'ABC'}).status_code, 400)
+        self.assertEqual(self.put(path, {'student': {'email': 'not an email'}}).status_code, 400)
+        self.assertEqual(self.put(path, {'student': 'x'}).status_code, 400)
+        self.assertEqual(self.put(path, {'course': ['title']}).status_code, 400)
+        self.assertEqual(Enrollment.objects.get(pk=first.pk).grade, first.grade)
+        self.assertEqual(self.put('/api/put_student_course_many_to_many/999999/', {'grade': 'B'}).status_code, 404)
+        self.assertEqual(Course.objects.get().start_date, datetime.date(2024, 9, 1))
+
+    def test_user_put_reads_once_and_writes_only_the_changed_table(self):
+        make_users(1)
+        user = CrudUser.objects.get()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.put(f'/api/put_one_by_one/{user.pk}/', {'username': user.username, 'bio': 'New bio'})
+        self.assertEqual(response.status_code, 200)
+        statements = self.statements(queries)
+        self.assertEqual(len(statements), 2)
+        self.assertIn('JOIN', statements[0])
+        self.assertTrue(statements[1].startswith('UPDATE "App_userprofile"'))
+
+        self.assertEqual(self.put('/api/put_one_by_one/999999/', {'bio': 'x'}).json(), {'error': 'User not found'})
+        orphan = CrudUser.objects.create(username='orphan', email='orphan@example.com')
+        response = self.put(f'/api/put_one_by_one/{orphan.pk}/', {'bio': 'x'})
+        self.assertEqual(response.json(), {'error': 'User profile not found'})
+
+    def test_user_create_is_all_or_nothing(self):
+        response = self.client.post(
+            '/api/create/', json.dumps({'username': 'new', 'email': 'new@example.com', 'bio': None}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CrudUser.objects.filter(username='new').exists())
+
+
+class DeletionTests(AppTestCase):
+
+    def bulk_delete(self, resource, body):
+        return self.client.post(f'/api/bulk_delete/{resource}/', json.dumps(body), content_type='application/json')
+
+    def test_author_delete_is_two_statements_however_many_books(self):
+        make_authors(2, books_per_author=50)
+        author = Author.objects.order_by('id').first()
+        self.client.get(f'/api/get_author_detail_by_id_one_to_many/{author.pk}/')  # cache the detail
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f'/api/delete_author_one_to_many/{author.pk}/')
+        self.assertEqual(response.status_code, 200)
+        statements = [q['sql'] for q in without_versions(queries) if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]
+        self.assertEqual([sql.split(' WHERE')[0] for sql in statements], ['DELETE FROM "App_book"', 'DELETE FROM "App_author"'])
+        self.assertEqual(Book.objects.count(), 50)
+        self.assertEqual(self.client.get(f'/api/get_author_detail_by_id_one_to_many/{author.pk}/').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/delete_author_one_to_many/{author.pk}/').status_code, 404)
+
+    def test_single_deletes_do_not_read_first(self):
+        make_tasks(1)
+        make_enrollments(1)
+        task, enrollment = Task.objects.get(), Enrollment.objects.get()
+        self.client.get(f'/api/getbyid/{task.pk}/')  # cache the detail
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.delete(f'/api/tasks/{task.pk}/delete/').status_code, 200)
+        self.assertEqual(len(without_versions(queries)), 1)
+        self.assertEqual(self.client.get(f'/api/getbyid/{task.pk}/').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/tasks/{task.pk}/delete/').status_code, 404)
+
+        response = self.client.delete(f'/api/delete_student_course_many_to_many/{enrollment.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Enrollment.objects.exists())
+
+    def test_collector_mode_sends_signals(self):
+        make_authors(1, books_per_author=2)
+        author = Author.objects.get()
+        deleted = []
+        receiver = lambda sender, instance, **kwargs: deleted.append(instance.pk)
+        post_delete.connect(receiver, sender=Book)
+        try:
+            with self.settings(APP_DELETION={'FAST': False}):
+                self.client.delete(f'/api/delete_author_one_to_many/{author.pk}/')
+        finally:
+            post_delete.disconnect(receiver, sender=Book)
+        self.assertEqual(len(deleted), 2)
+        self.assertFalse(Author.objects.exists())
+
+    def test_bulk_delete_by_ids_and_filter_in_batches(self):
+        make_tasks(7)
+        ids = list(Task.objects.order_by('id').values_list('id', flat=True))
+        with self.settings(APP_DELETION={'BATCH_SIZE': 2}):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.bulk_delete('tasks', {'ids': ids[:5] + [999999]})
+            self.assertEqual(response.json(), {'deleted': 5})
+            self.assertEqual(len([q for q in queries if q['sql'].startswith('DELETE')]), 3)
+
+            make_authors(2, books_per_author=3)
+            first = Author.objects.order_by('id').first()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.bulk_delete('books', {'filter': {'author_id': first.pk}})
+            self.assertEqual(response.json(), {'deleted': 3})
+            # Each batch after the first starts past the ids already deleted
+            selects = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and '"App_book"' in q['sql']]
+            self.assertEqual(len(selects), 2)
+            self.assertNotIn('"App_book"."id" >', selects[0])
+            self.assertIn('"App_book"."id" >', selects[1])
+        self.assertEqual(Task.objects.count(), 2)
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertEqual(self.client.get(f'/api/get_author_detail_by_id_one_to_many/{first.pk}/').json()['books'], [])
+
+        make_enrollments(3)
+        response = self.bulk_delete('enrollments', {'filter': {'grade': 'A'}})
+        self.assertEqual(response.json(), {'deleted': 3})
+
+    def test_bulk_delete_errors(self):
+        self.assertEqual(self.bulk_delete('authors', {'ids': [1]}).status_code, 404)
+        self.assertEqual(self.bulk_delete('tasks', {}).status_code, 400)
+        self.assertEqual(self.bulk_delete('tasks', {'filter': {}}).status_code, 400)
+        self.assertEqual(self.bulk_delete('tasks', {'ids': ['1']}).status_code, 400)
+        self.assertEqual(self.bulk_delete('tasks', {'ids': [10 ** 30]}).status_code, 400)
+        self.assertEqual(self.bulk_delete('books', {'filter': {'author_id': 10 ** 30}}).status_code, 400)
+        self.assertEqual(self.bulk_delete('tasks', {'filter': {'description__contains': 'x'}}).status_code, 400)
+        self.assertEqual(self.bulk_delete('books', {'filter': {'created_at__lt': 'soon'}}).status_code, 400)
+        self.assertEqual(self.bulk_delete('books', {'filter': {'author_id': [1]}}).status_code, 400)
+        self.assertEqual(self.bulk_delete('tasks', {'filter': {'created_at__lt': [1]}}).status_code, 400)
+        self.assertEqual(self.bulk_delete('enrollments', {'filter': {'grade': None}}).status_code, 400)
+
+
+class JobTests(AppTestCase):
+    async_header = {'HTTP_PREFER': 'respond-async'}
+
+    def register(self, kind, fn):
+        jobs.handler(kind)(fn)
+        self.addCleanup(jobs.HANDLERS.pop, kind)
+
+    def test_async_author_delete_runs_as_a_job(self):
+        make_authors(1, books_per_author=5)
+        author = Author.objects.get()
+        response = self.client.delete(f'/api/delete_author_one_to_many/{author.pk}/', **self.async_header)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Location'], f'/api/jobs/{response.json()["job_id"]}/')
+        self.assertTrue(Author.objects.exists())
+        self.assertEqual(self.client.get(response['Location']).json()['status'], 'queued')
+
+        with self.settings(APP_DELETION={'BATCH_SIZE': 2}):
+            job = jobs.run_next('test')
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        status = self.client.get(response['Location']).json()
+        self.assertEqual((status['status'], status['progress'], status['total']), ('succeeded', 5, 5))
+        self.assertEqual(status['result'], {'authors': 1, 'books': 5})
+        self.assertFalse(Book.objects.exists())
+        self.assertIsNone(jobs.run_next('test'))
+
+        response = self.client.delete('/api/delete_author_one_to_many/999999/', **self.async_header)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get('/api/jobs/999999/').status_code, 404)
+
+    def test_async_imports(self):
+        author = Author.objects.create(name='Author', bio='Bio')
+        books = [{'book_name': f'Book {i}', 'content': '...'} for i in range(5)]
+        response = self.client.post(
+            f'/api/only_book_post_one_to_many/{author.pk}/', json.dumps(books),
+            content_type='application/json', **self.async_header,
+        )
+        self.assertEqual(response.status_code, 202)
+        items = [
+            {'student': {'name': 'Ann', 'email': 'ann@example.com'},
+             'course': {'title': 'Maths', 'description': 'Algebra', 'start_date': '2024-09-01'}, 'grade': 'A'},
+            {'student': {'name': 'Bob'}},
+        ]
+        response = self.client.post(
+            '/api/bulk_create_student_course_many_to_many/', json.dumps(items),
+            content_type='application/json', **self.async_header,
+        )
+        self.assertEqual(response.status_code, 202)
+
+        with self.settings(APP_JOBS={'CHUNK_SIZE': 2}):
+            books_job, enrollments_job = jobs.run_next('test'), jobs.run_next('test')
+        self.assertEqual(books_job.result, {'created': 5})
+        self.assertEqual(Book.objects.filter(author=author).count(), 5)
+        self.assertEqual(enrollments_job.result['created'], 1)
+        self.assertEqual(enrollments_job.result['errors'], 1)
+        self.assertEqual(enrollments_job.result['error_items'][0]['index'], 1)
+
+    def test_import_resumes_after_committed_chunks(self):
+        author = Author.objects.create(name='Author', bio='Bio')
+        books = [{'book_name': f'Book {i}', 'content': '...'} for i in range(5)]
+        job = jobs.enqueue('import_books', {'author_id': author.pk, 'books': books})
+        Job.objects.filter(pk=job.pk).update(progress=2)
+        jobs.run_next('test')
+        self.assertEqual(list(Book.objects.values_list('book_name', flat=True)), ['Book 2', 'Book 3', 'Book 4'])
+
+    def test_failed_jobs_are_retried_then_given_up(self):
+        calls = []
+
+        def flaky(job, fail_times):
+            calls.append(job.attempts)
+            if len(calls) <= fail_times:
+                raise RuntimeError('boom')
+            return 'ok'
+
+        self.register('flaky', flaky)
+        with self.settings(APP_JOBS={'RETRY_DELAY': 0}):
+            job = jobs.enqueue('flaky', {'fail_times': 1}, max_attempts=2)
+            self.assertEqual(jobs.run_next('test').status, Job.QUEUED)
+            self.assertIn('RuntimeError: boom', Job.objects.get(pk=job.pk).error)
+            self.assertEqual(jobs.run_next('test').result, 'ok')
+            self.assertEqual(calls, [1, 2])
+
+            calls.clear()
+            job = jobs.enqueue('flaky', {'fail_times': 5}, max_attempts=2)
+            jobs.run_next('test')
+            self.assertEqual(jobs.run_next('test').status, Job.FAILED)
+            self.assertIsNone(jobs.run_next('test'))
+
+        with self.settings(APP_JOBS={'RETRY_DELAY': 60}):
+            jobs.enqueue('flaky', {'fail_times': 5})
+            jobs.run_next('test')
+            self.assertIsNone(jobs.run_next('test'))  # backing off
+
+    def test_claims_are_exclusive_and_stale_jobs_are_taken_over(self):
+        self.register('noop', lambda job: None)
+        job = jobs.enqueue('noop')
+        self.assertEqual(jobs.claim('first').pk, job.pk)
+        self.assertIsNone(jobs.claim('second'))
+
+        Job.objects.filter(pk=job.pk).update(locked_at=job.created_at - datetime.timedelta(hours=1))
+        taken = jobs.claim('second')
+        self.assertEqual((taken.pk, taken.locked_by, taken.attempts), (job.pk, 'second', 2))
+
+        # A search rebuild cannot heartbeat while it runs, so its lease is longer
+        Job.objects.filter(pk=job.pk).update(status=Job.SUCCEEDED)
+        rebuild = jobs.enqueue('rebuild_search_index', {'index': 'tasks'})
+        self.assertEqual(jobs.claim('first').pk, rebuild.pk)
+        Job.objects.filter(pk=rebuild.pk).update(locked_at=timezone.now() - datetime.timedelta(minutes=10))
+        self.assertIsNone(jobs.claim('second'))
+        Job.objects.filter(pk=rebuild.pk).update(locked_at=timezone.now() - datetime.timedelta(hours=2))
+        self.assertEqual(jobs.claim('second').pk, rebuild.pk)
+        with self.assertRaises(ValueError):
+            jobs.enqueue('unknown')
+
+    def test_run_workers_once(self):
+        make_tasks(1)
+        job = jobs.enqueue('rebuild_search_index', {'index': 'tasks'})
+        out = io.StringIO()
+        call_command('run_workers', '--once', '--threads', '1', stdout=out)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.SUCCEEDED)
+        self.assertIn('rebuild_search_index', out.getvalue())
+
+
+class DataTransferTests(AppTestCase):
+    models = (Task, CrudUser, UserProfile, Author, Book, Student, Course, Enrollment)
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        make_tasks(7)
+        make_users(3)
+        UserProfile.objects.filter(pk=UserProfile.objects.first().pk).update(website='https://example.com')
+        make_authors(2, books_per_author=3)
+        make_enrollments(4)
+
+    def snapshot(self):
+        return {
+            model: list(model.objects.order_by('pk').values_list(*transfer.columns(model)))
+            for model in self.models
+        }
+
+    def clear(self):
+        for model in reversed(self.models):
+            model.objects.all().delete()
+
+    def call(self, *args):
+        out = io.StringIO()
+        call_command(*args, stdout=out)
+        return out.getvalue()
+
+    def test_round_trip_keeps_every_column(self):
+        before = self.snapshot()
+        for fmt in transfer.FORMATS:
+            with self.subTest(fmt=fmt):
+                directory = os.path.join(self.directory, fmt)
+                output = self.call('export_data', directory, '--format', fmt, '--chunk-size', '2')
+                self.assertIn('task: 7 rows', output)
+                self.clear()
+                output = self.call('import_data', directory, '--batch-size', '2')
+                self.assertIn('enrollment: 4 rows', output)
+                self.assertEqual(self.snapshot(), before)
+                self.assertFalse(os.path.exists(os.path.join(directory, transfer.CHECKPOINT)))
+
+        # New rows get ids after the imported ones, and the search index followed the inserts
+        self.assertGreater(Task.objects.create(title='New', description='x').pk, before[Task][-1][0])
+        self.assertEqual(len(self.client.get('/api/search/tasks/?q=Description').json()['results']), 7)
+
+    def test_import_drops_only_the_cached_details_it_changes(self):
+        author = Author.objects.order_by('pk').first()
+        url = f'/api/get_author_detail_by_id_one_to_many/{author.pk}/'
+        self.call('export_data', self.directory, '--model', 'book')
+        Book.objects.filter(author=author).delete()
+        self.assertEqual(self.client.get(url).json()['books'], [])  # cached without its books
+        caching.get_cache().set('unrelated', 1)
+
+        self.call('import_data', self.directory)
+        self.assertEqual(len(self.client.get(url).json()['books']), 3)
+        self.assertEqual(caching.get_cache().get('unrelated'), 1)
+
+    def test_import_resumes_from_the_checkpoint(self):
+        self.call('export_data', self.directory, '--model', 'task')
+        ids = list(Task.objects.order_by('pk').values_list('pk', flat=True))
+        Task.objects.filter(pk__in=ids[3:]).delete()
+        with open(os.path.join(self.directory, transfer.CHECKPOINT), 'w') as out:
+            json.dump({'task': 3}, out)
+
+        with CaptureQueriesContext(connection) as queries:
+            output = self.call('import_data', self.directory, '--resume', '--batch-size', '2')
+        self.assertIn('task: 4 rows', output)
+        self.assertIn('resumed after 3', output)
+        self.assertEqual(len([q for q in without_versions(queries) if 'INSERT' in q['sql']]), 2)
+        self.assertEqual(list(Task.objects.order_by('pk').values_list('pk', flat=True)), ids)
+
+        # Without --resume every row is read again; rows that exist are left alone
+        output = self.call('import_data', self.directory)
+        self.assertIn('task: 7 rows', output)
+        self.assertIn('7 already present', output)
+        self.assertEqual(Task.objects.count(), 7)
+
+    def test_import_stops_at_rows_that_hold_a_dump_id(self):
+        self.call('export_data', self.directory, '--model', 'author', '--model', 'book')
+        author = Author.objects.order_by('pk').first()
+        Book.objects.all().delete()
+        Author.objects.filter(pk=author.pk).update(name='Someone else')
+
+        with self.assertRaisesMessage(CommandError, f'ids {author.pk})'):
+            self.call('import_data', self.directory)
+        # The books would have been listed under the unrelated author
+        self.assertFalse(Book.objects.exists())
+        self.assertEqual(Author.objects.get(pk=author.pk).name, 'Someone else')
+
+        # A unique key held by another row is a conflict too
+        profile = UserProfile.objects.order_by('pk').first()
+        self.call('export_data', self.directory, '--model', 'userprofile')
+        UserProfile.objects.filter(pk=profile.pk).delete()
+        UserProfile.objects.create(user_id=profile.user_id, bio='Other')
+        with self.assertRaisesMessage(CommandError, 'userprofile'):
+            self.call('import_data', self.directory, '--model', 'userprofile')
+
+    def test_import_names_a_missing_csv_column(self):
+        self.call('export_data', self.directory, '--model', 'task', '--format', 'csv')
+        path = os.path.join(self.directory, 'task.csv')
+        with open(path, newline='') as source:
+            rows = [row[:2] for row in csv.reader(source)]
+        with open(path, 'w', newline='') as out:
+            csv.writer(out).writerows(rows)
+        with self.assertRaisesMessage(CommandError, 'has no description'):
+            self.call('import_data', self.directory)
+
+    def test_export_resume_skips_finished_files(self):
+        self.call('export_data', self.directory, '--model', 'task', '--format', 'csv')
+        output = self.call('export_data', self.directory, '--format', 'csv', '--resume')
+        self.assertIn('task: already exported', output)
+        self.assertIn('book: 6 rows', output)
+        with self.assertRaises(CommandError):
+            call_command('import_data', os.path.join(self.directory, 'missing'))
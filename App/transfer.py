@@ -0,0 +1,459 @@
+"""
+Streaming export and import of the App tables (``manage.py export_data`` /
+``manage.py import_data``).
+
+A dump is a directory with one file per model, ``<model>.ndjson`` (one JSON
+object per row) or ``<model>.csv`` (a header row of column names, then one
+row per line). Every concrete column is written under its attribute name
+(``author_id``, not ``author``), including the primary key and the
+timestamps, so a dump can be loaded into another database as it was.
+
+Export reads ``values_list`` rows with ``.iterator()`` and writes them out a
+chunk at a time, so memory stays flat whatever the table size. Dates and
+datetimes are written as the database stores them as text (in UTC).
+Each file is written under a temporary name and renamed when complete.
+
+Import reads a file lazily and inserts it in batches, each one
+``executemany`` of a single ``INSERT`` in its own transaction, parents
+before children (``MODELS`` order). ``bulk_create`` would prepare every
+value through the ORM, which costs more than the insert itself; here only
+the columns that need it (numbers, dates, datetimes) go through their
+field's ``get_db_prep_save``, and the stored ``auto_now`` timestamps are
+kept. Foreign keys are the exported ids, which the import keeps, so they
+resolve to the rows imported before them. Courses are copied to every shard.
+With sharding on, a student goes to the shard of its email, whatever shard
+(if any) it came from, and its enrollments follow it. A student or
+enrollment keeps its id when that id belongs to the shard; otherwise (a dump
+of an unsharded database, or of a different set of shards) the shard gives
+it a new id from its own range, and enrollments are pointed at the student's
+new id, looked up by email. After each batch the number of rows done is checkpointed in the dump
+directory, and ``resume`` skips them.
+
+The target need not be empty. A row that is already there as the dump has
+it (a batch that committed just before a crash, before its checkpoint, or
+a second import of the same dump) is left alone and counted as present.
+Any other row holding a dump row's id or unique key (an unrelated task
+with the same id, another profile for the same user) stops the import
+with a ``DumpError`` before that batch is written, since the rows after it
+would point at the wrong parent. With sharding on, a student whose email
+is already on its shard is that student: it is counted as present and its
+enrollments are pointed at it; an enrollment of a (student, course) pair
+that exists is present too.
+
+In CSV, NULL and the empty string are both written as an empty field;
+import reads an empty field back as NULL for nullable columns.
+"""
+import csv
+import datetime
+import json
+import os
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connections, models, router, transaction
+from django.db.models.constants import OnConflict
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import bulk, caching, conditional, sharding
+from .models import Task, CrudUser, UserProfile, Author, Book, Student, Course, Enrollment
+from .serialization import dumps
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Parents before children, the order import_data loads them in
+MODELS = {
+    'task': Task,
+    'cruduser': CrudUser,
+    'userprofile': UserProfile,
+    'author': Author,
+    'book': Book,
+    'student': Student,
+    'course': Course,
+    'enrollment': Enrollment,
+}
+
+# Detail payload a new row can appear in: (cache name, column holding its id)
+CACHED_AS = {
+    Task: ('task', 'id'),
+    CrudUser: ('user', 'id'),
+    UserProfile: ('user', 'user_id'),
+    Author: ('author', 'id'),
+    Book: ('author', 'author_id'),
+    Enrollment: ('enrollment', 'id'),
+}
+
+FORMATS = ('ndjson', 'csv')
+CHUNK_SIZE = 5000
+CHECKPOINT = '.import-checkpoint.json'
+
+
+class DumpError(ValueError):
+    pass
+
+
+def columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def selected_columns(model):
+    """``columns()`` as read for a dump: dates and datetimes as the database's text."""
+    # Converting each one to a Python object and back to text would take most of the export's time
+    return [
+        Cast(field.attname, models.TextField()) if isinstance(field, models.DateField) else field.attname
+        for field in model._meta.concrete_fields
+    ]
+
+
+def path_for(directory, name, fmt):
+    return os.path.join(directory, f'{name}.{fmt}')
+
+
+def find_file(directory, name):
+    """``(path, format)`` of the dump file for ``name``, or None if the dump has none."""
+    for fmt in FORMATS:
+        path = path_for(directory, name, fmt)
+        if os.path.exists(path):
+            return path, fmt
+    return None
+
+
+# Export
+
+def export_rows(model, chunk_size=CHUNK_SIZE):
+    """Every row of ``model`` as a tuple in ``columns()`` order, in primary key order, from every shard."""
+    queryset = model._base_manager.order_by('pk').values_list(*selected_columns(model))
+    return sharding.iterate(queryset, chunk_size)
+
+
+def export_model(model, path, fmt, chunk_size=CHUNK_SIZE):
+    """Write ``model``'s table to ``path``; return the number of rows."""
+    names = columns(model)
+    rows = export_rows(model, chunk_size)
+    count = 0
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w' if fmt == 'csv' else 'wb', **({'newline': ''} if fmt == 'csv' else {})) as out:
+        if fmt == 'csv':
+            writer = csv.writer(out)
+            writer.writerow(names)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            if fmt == 'csv':
+                writer.writerows(chunk)
+            else:
+                out.write(b''.join(dumps(dict(zip(names, row))) + b'\n' for row in chunk))
+            count += len(chunk)
+    # A dump file only appears under its real name once it is complete
+    os.replace(tmp, path)
+    return count
+
+
+# Import
+
+def parse_datetime_utc(value):
+    """A dump datetime; text without an offset is UTC (how SQLite stores aware datetimes)."""
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f'Invalid datetime {value!r}') from None
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+def to_int(value):
+    return None if value is None else int(value)
+
+
+def read_rows(path, fmt, model):
+    """Rows of a dump file as tuples in ``columns(model)`` order, read lazily."""
+    names = columns(model)
+    if fmt == 'csv':
+        with open(path, newline='') as source:
+            reader = csv.reader(source)
+            header = next(reader, None)
+            if header is None:
+                return
+            missing = [name for name in names if name not in header]
+            if missing:
+                raise DumpError(f'{path} has no {", ".join(missing)} column.')
+            order = [header.index(name) for name in names]
+            nullable = [model._meta.get_field(name).null for name in names]
+            for record in reader:
+                yield tuple(
+                    None if value == '' and null else value
+                    for value, null in zip((record[index] for index in order), nullable)
+                )
+    else:
+        loads = orjson.loads if orjson is not None else json.loads
+        with open(path, 'rb') as source:
+            for line in source:
+                if line.strip():
+                    data = loads(line)
+                    yield tuple(data.get(name) for name in names)
+
+
+def preparers(model, connection):
+    """
+    Per column, a function turning a dump value into a query parameter, or
+    None to pass it as is. Text and numbers take a shortcut; every other
+    column goes through its field's ``get_db_prep_save``.
+    """
+    prepare = []
+    for field in model._meta.concrete_fields:
+        target = field.target_field if field.is_relation else field
+        if isinstance(field, (models.CharField, models.TextField)):
+            prepare.append(None)
+        elif isinstance(target, models.IntegerField):
+            prepare.append(to_int)
+        elif isinstance(field, models.DateTimeField):
+            adapt = connection.ops.adapt_datetimefield_value
+            prepare.append(lambda value, adapt=adapt: None if value is None else adapt(parse_datetime_utc(value)))
+        elif isinstance(field, models.DateField):
+            adapt = connection.ops.adapt_datefield_value
+            prepare.append(lambda value, adapt=adapt: None if value is None else adapt(datetime.date.fromisoformat(value)))
+        else:
+            prepare.append(lambda value, field=field: field.get_db_prep_save(value, connection))
+    return prepare
+
+
+def insert_sql(model, connection, keep_ids=True):
+    """
+    ``INSERT`` of every column (but the primary key, unless ``keep_ids``)
+    that leaves rows whose primary key or other unique key exists alone.
+    """
+    ops = connection.ops
+    fields = [field for field in model._meta.concrete_fields if keep_ids or not field.primary_key]
+    parts = [
+        ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        f'{ops.quote_name(model._meta.db_table)} ({", ".join(ops.quote_name(field.column) for field in fields)})',
+        f'VALUES ({", ".join(["%s"] * len(fields))})',
+        ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None),
+    ]
+    return ' '.join(part for part in parts if part)
+
+
+def write_rows(model, alias, rows, keep_ids=True):
+    """
+    Insert ``rows`` into ``model``'s table on ``alias`` in one transaction;
+    without ``keep_ids`` the database allocates their primary keys. Return
+    how many were inserted (the rest held an existing id or unique key).
+    """
+    if not rows:
+        return 0
+    connection = connections[alias]
+    prepare = preparers(model, connection)
+    if not keep_ids:
+        # The primary key is the first column
+        prepare = prepare[1:]
+        rows = [row[1:] for row in rows]
+    params = [[value if fn is None else fn(value) for value, fn in zip(row, prepare)] for row in rows]
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        cursor.executemany(insert_sql(model, connection, keep_ids), params)
+        return cursor.rowcount
+
+
+def as_text(row):
+    """A row with every value as text, so dump rows (CSV or NDJSON) and stored rows compare equal."""
+    return tuple(None if value is None else str(value) for value in row)
+
+
+def unique_keys(model):
+    """Column positions of each of ``model``'s unique keys but the primary key."""
+    names = columns(model)
+    keys = [(field.attname,) for field in model._meta.concrete_fields if field.unique and not field.primary_key]
+    keys += [
+        tuple(model._meta.get_field(name).attname for name in together) for together in model._meta.unique_together
+    ]
+    return [tuple(names.index(name) for name in key) for key in keys]
+
+
+def check_existing(model, alias, rows):
+    """
+    How many of ``rows`` are already in the table on ``alias`` as the dump
+    has them. Raise ``DumpError`` if any other row holds the id or a unique
+    key of one of them.
+    """
+    rows = [as_text(row) for row in rows]
+    names = columns(model)
+    keys = unique_keys(model)
+    queryset = model._base_manager.using(alias).values_list(*selected_columns(model))
+    stored = {}
+    for chunk in bulk.chunked(row[0] for row in rows):
+        stored.update((row[0], row) for row in map(as_text, queryset.filter(pk__in=chunk)))
+    # Unique key values -> id of the row holding them, looked up by the key's first column
+    holders = {}
+    for key in keys:
+        for chunk in bulk.chunked({row[key[0]] for row in rows if row[key[0]] is not None}):
+            for row in map(as_text, queryset.filter(**{f'{names[key[0]]}__in': chunk})):
+                holders[key, tuple(row[index] for index in key)] = row[0]
+
+    present, conflicts = 0, []
+    for row in rows:
+        if stored.get(row[0]) == row:
+            present += 1
+        elif row[0] in stored or any(
+            holders.get((key, tuple(row[index] for index in key)), row[0]) != row[0] for key in keys
+        ):
+            conflicts.append(row[0])
+    if conflicts:
+        shown = ', '.join(conflicts[:5]) + (', ...' if len(conflicts) > 5 else '')
+        raise DumpError(
+            f'{len(conflicts)} {model._meta.model_name} rows of the dump (ids {shown}) conflict with different '
+            f'rows in the database holding their id or a unique key; none of their batch was imported.'
+        )
+    return present
+
+
+def insert_students(rows):
+    """
+    Put each student on the shard of its email, with a new id there if its
+    own belongs elsewhere; return how many were there already.
+    """
+    email = columns(Student).index('email')
+    groups = {}
+    for row in rows:
+        groups.setdefault(sharding.shard_for_email(row[email]), []).append(row)
+    inserted = 0
+    for alias, group in groups.items():
+        inserted += write_rows(Student, alias, [row for row in group if sharding.shard_for_id(row[0]) == alias])
+        # Rows with another shard's id, or whose id was already taken there, get one from the shard
+        found = set()
+        for chunk in bulk.chunked(row[email] for row in group):
+            found.update(Student.objects.on(alias).filter(email__in=chunk).values_list('email', flat=True))
+        inserted += write_rows(Student, alias, [row for row in group if row[email] not in found], keep_ids=False)
+    return len(rows) - inserted
+
+
+def moved_students(directory):
+    """Old id -> id on its shard of each student of the dump in ``directory`` imported under a new id."""
+    dump = find_file(directory, 'student')
+    if dump is None:
+        return {}
+    email = columns(Student).index('email')
+    moved = {}
+    rows = read_rows(*dump, Student)
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            return moved
+        by_shard = {}
+        for row in chunk:
+            by_shard.setdefault(sharding.shard_for_email(row[email]), {})[row[email]] = to_int(row[0])
+        for alias, old_ids in by_shard.items():
+            for part in bulk.chunked(old_ids):
+                for address, pk in Student.objects.on(alias).filter(email__in=part).values_list('email', 'id'):
+                    if pk != old_ids[address]:
+                        moved[old_ids[address]] = pk
+
+
+def insert_enrollments(rows, moved):
+    """
+    Put each enrollment on its student's shard, with a new id there if its
+    own belongs elsewhere; return how many were there already.
+    """
+    names = columns(Enrollment)
+    student, course = names.index('student_id'), names.index('course_id')
+    groups = {}
+    for row in rows:
+        row = list(row)
+        row[student] = moved.get(to_int(row[student]), to_int(row[student]))
+        row[course] = to_int(row[course])
+        groups.setdefault(sharding.shard_for_id(row[student]) or sharding.home_shard(), []).append(tuple(row))
+    inserted = 0
+    for alias, group in groups.items():
+        inserted += write_rows(Enrollment, alias, [row for row in group if sharding.shard_for_id(row[0]) == alias])
+        # An enrollment is one per (student, course): insert the ones that did not make it with a new id
+        found = set()
+        for chunk in bulk.chunked({row[student] for row in group}):
+            found.update(
+                Enrollment.objects.on(alias).filter(student_id__in=chunk).values_list('student_id', 'course_id')
+            )
+        inserted += write_rows(
+            Enrollment, alias, [row for row in group if (row[student], row[course]) not in found], keep_ids=False,
+        )
+    return len(rows) - inserted
+
+
+def insert_batch(model, rows, moved=None):
+    """Insert one batch of dump rows; return how many were in the database already."""
+    if sharding.is_sharded(model):
+        if model is Student:
+            return insert_students(rows)
+        return insert_enrollments(rows, moved or {})
+    alias = router.db_for_write(model)
+    present = check_existing(model, alias, rows)
+    write_rows(model, alias, rows)
+    if sharding.enabled() and model._meta.model_name in sharding.REPLICATED_MODELS:
+        sharding.replicate(model, [row[0] for row in rows])
+    return present
+
+
+def reset_sequences(model):
+    """Let new rows get ids after the imported ones (a no-op on SQLite, which uses max(id))."""
+    aliases = sharding.shards() if sharding.is_sharded(model) else [router.db_for_write(model)]
+    for alias in aliases:
+        connection = connections[alias]
+        statements = connection.ops.sequence_reset_sql(no_style(), [model])
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+
+class Checkpoint:
+    """Rows imported so far per dump file, saved in the dump directory after every batch."""
+
+    def __init__(self, directory, resume):
+        self.path = os.path.join(directory, CHECKPOINT)
+        self.done = {}
+        if resume and os.path.exists(self.path):
+            with open(self.path) as source:
+                self.done = json.load(source)
+
+    def save(self, name, count):
+        self.done[name] = count
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as out:
+            json.dump(self.done, out)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def import_model(model, path, fmt, checkpoint, name, batch_size=CHUNK_SIZE):
+    """
+    Load a dump file into ``model``'s table; return ``(rows read now, rows
+    skipped as done, rows read that were in the database already)``.
+    """
+    skipped = checkpoint.done.get(name, 0)
+    rows = islice(read_rows(path, fmt, model), skipped, None)
+    # Enrollments follow their students to the ids those got on their shards
+    moved = moved_students(os.path.dirname(path)) if sharding.is_sharded(model) and model is Enrollment else None
+    count = present = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        present += insert_batch(model, batch, moved)
+        if model in CACHED_AS:
+            # The INSERTs send no signals: drop the cached details the new rows belong in by hand
+            cache_name, column = CACHED_AS[model]
+            index = columns(model).index(column)
+            caching.invalidate(cache_name, *{row[index] for row in batch})
+        count += len(batch)
+        checkpoint.save(name, skipped + count)
+    reset_sequences(model)
+    conditional.bump(model)
+    return count, skipped, present
@@ -1,9 +1,11 @@
 # api/urls.py
 
 from django.urls import path
+from . import async_views
 from .views import CreateTaskView, CreateTaskViewGetById, TaskDeleteView, UserProfileCurdView, UpdateUserProfile, \
     AuthorCreateView, OnlyAuthorCreateView, BookCreateView, GetAllAuthorsView, AuthorDetailByIdAPIView, UpdateBookView, \
-    DeleteAuthorView, DeleteBookView, EnrollmentCreateView, EnrollmentGetByIdView
+    DeleteAuthorView, DeleteBookView, EnrollmentCreateView, EnrollmentGetByIdView, ExportView, \
+    EnrollmentBulkCreateView, BulkDeleteView, JobView, CacheStatsView, MetricsView, SearchView
 
 urlpatterns = [
     path('mymodel/', CreateTaskView.as_view(), name='mymodel'),
@@ -30,8 +32,32 @@ urlpatterns = [
     path('delete_book_one_to_many/<int:author_id>/<int:book_id>/', DeleteBookView.as_view(), name='DeleteBookView'),
     # many_to_many POST
     path('create_student_course_many_to_many/', EnrollmentCreateView.as_view(), name='EnrollmentCreateView'),
+    path('bulk_create_student_course_many_to_many/', EnrollmentBulkCreateView.as_view(), name='EnrollmentBulkCreateView'),
     path('get_student_course_many_to_many/', EnrollmentCreateView.as_view(), name='EnrollmentCreateViewGet'),
     path('get_student_course_many_to_many/<int:id>/', EnrollmentGetByIdView.as_view(), name='EnrollmentGetByIdView'),
     path('delete_student_course_many_to_many/<int:id>/', EnrollmentGetByIdView.as_view(), name='EnrollmentGetByIdView'),
     path('put_student_course_many_to_many/<int:id>/', EnrollmentGetByIdView.as_view(), name='EnrollmentGetByIdView'),
+    # bulk deletes in bounded batches (tasks, books, enrollments)
+    path('bulk_delete/<str:resource>/', BulkDeleteView.as_view(), name='BulkDeleteView'),
+    # background jobs started with Prefer: respond-async
+    path('jobs/<int:job_id>/', JobView.as_view(), name='JobView'),
+    # full-text search (books, tasks)
+    path('search/<str:resource>/', SearchView.as_view(), name='SearchView'),
+    # streaming exports
+    path('export/<str:resource>/', ExportView.as_view(), name='ExportView'),
+    # async (ASGI) versions of the CRUD endpoints
+    path('async/tasks/', async_views.AsyncTaskListView.as_view(), name='AsyncTaskListView'),
+    path('async/tasks/<int:pk>/', async_views.AsyncTaskDetailView.as_view(), name='AsyncTaskDetailView'),
+    path('async/users/', async_views.AsyncUserListView.as_view(), name='AsyncUserListView'),
+    path('async/users/<int:user_id>/', async_views.AsyncUserDetailView.as_view(), name='AsyncUserDetailView'),
+    path('async/authors/', async_views.AsyncAuthorListView.as_view(), name='AsyncAuthorListView'),
+    path('async/authors/<int:author_id>/', async_views.AsyncAuthorDetailView.as_view(), name='AsyncAuthorDetailView'),
+    path('async/authors/<int:author_id>/books/', async_views.AsyncBookCreateView.as_view(), name='AsyncBookCreateView'),
+    path('async/authors/<int:author_id>/books/<int:book_id>/', async_views.AsyncBookDetailView.as_view(), name='AsyncBookDetailView'),
+    path('async/enrollments/', async_views.AsyncEnrollmentListView.as_view(), name='AsyncEnrollmentListView'),
+    path('async/enrollments/<int:id>/', async_views.AsyncEnrollmentDetailView.as_view(), name='AsyncEnrollmentDetailView'),
+    # detail cache
+    path('cache_stats/', CacheStatsView.as_view(), name='CacheStatsView'),
+    # Prometheus scrape target, at the conventional slash-less path
+    path('metrics', MetricsView.as_view(), name='MetricsView'),
 ]
@@ -1,4 +1,7 @@
-from django.http import JsonResponse
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.views import View
 from django.utils.decorators import method_decorator
@@ -7,10 +10,13 @@ import json
 
 from rest_framework.generics import UpdateAPIView
 from rest_framework.views import APIView
-from .models import Task, CrudUser, UserProfile, Author, Book, Student, Course, Enrollment
+from .models import Task, CrudUser, UserProfile, Author, Book, Student, Course, Enrollment, Job
+from . import bulk, caching, conditional, deletion, jobs, listing, metrics, pagination, partial, search, sharding, streaming, writer
+from .serialization import FieldPlan, FieldsError, format_datetime, json_response
 
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(conditional.conditional_get(conditional.ModelVersions(Task)), name='get')
 class CreateTaskView(APIView):
     def post(self, request, *args, **kwargs):
         try:
@@ -23,8 +29,8 @@ class CreateTaskView(APIView):
             if not title or not description:
                 return JsonResponse({'error': 'Title and description are required.'}, status=400)
 
-            # Create a new task
-            task = Task.objects.create(title=title, description=description)
+            # Create a new task (through the write queue when it is enabled)
+            task = writer.run(Task.objects.create, title=title, description=description)
 
             # Respond with the created task's ID and message
             return JsonResponse({
@@ -35,55 +41,55 @@ class CreateTaskView(APIView):
             return JsonResponse({'error': 'Invalid JSON format.'}, status=400)
 
     def get(self, request):
-        # Fetch all tasks from the database
-        tasks = Task.objects.all()
-
-        # Prepare the data without using a serializer
-        task_list = []
-        for task in tasks:
-            task_list.append({
-                'id': task.id,
-                'title': task.title,
-                'description': task.description,
-                'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S')  # Format datetime
-            })
+        # Read only the columns named by ?fields= (all of them without it)
+        try:
+            queryset, serialize = listing.project('tasks', listing.requested_fields(request))
+        except FieldsError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        # Serve a single page when ?limit= or ?cursor= is given
+        if streaming.wants_stream(request):
+            return streaming.streaming_response(request, queryset, serialize)
+        if pagination.wants_pagination(request):
+            return pagination.paginated_response(request, queryset, serialize)
+
+        # Fetch all tasks from the database and prepare the data without using a serializer
+        task_list = serialize(queryset)
+
         # Check if there are no tasks in the database
-        if not tasks.exists():
+        if not task_list:
             return JsonResponse({'message': 'No tasks found'}, status=200)
 
         # Return a Response with the list of tasks
-        return JsonResponse(task_list, safe=False)
+        return json_response(task_list)
 
+@method_decorator(conditional.conditional_get(
+    conditional.RowVersions(Task.objects.all(), 'task_id', 'updated_at')
+), name='get')
 class CreateTaskViewGetById(View):
 
     def get(self, request, task_id):
         try:
-            # Fetch task by ID or raise 404 if not found
-            task = Task.objects.get(id=task_id)
+            # Fetch task by ID (through the detail cache) or raise 404 if not found
+            task_data = caching.cached_detail('task', task_id, lambda: self.build(task_id))
         except Task.DoesNotExist:
             # Return custom 404 response when the task is not found
             return JsonResponse({'error': f'Task with id {task_id} not found'}, status=404)
 
-        # Prepare the response manually without using a serializer
-        task_data = {
-            'id': task.id,
-            'title': task.title,
-            'description': task.description,
-            'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S')  # Format datetime
-        }
-
         # Return the task data as JSON
-        return JsonResponse(task_data, status=200)
+        return json_response(task_data, status=200)
+
+    def build(self, task_id):
+        # Same fields as the task list, read without building a model instance
+        return listing.TASK_PLAN.to_dict(listing.task_queryset().get(id=task_id))
 
 # Delete task by ID
 class TaskDeleteView(APIView):
     def delete(self, request, pk):
-        try:
-            task = Task.objects.get(pk=pk)
-            task.delete()
-            return JsonResponse({'message': 'Task deleted successfully'}, status=200)
-        except Task.DoesNotExist:
+        # One DELETE by primary key; the task is not read first
+        if not writer.run(deletion.delete_task, pk):
             return JsonResponse({'error': 'Task not found'}, status=404)
+        return JsonResponse({'message': 'Task deleted successfully'}, status=200)
 
     def put(self, request, pk):
         try:
@@ -94,33 +100,79 @@ class TaskDeleteView(APIView):
             body_unicode = request.body.decode('utf-8')
             body_data = json.loads(body_unicode)
 
-            # Update task fields
-            title = body_data.get('title', task.title)
-            description = body_data.get('description', task.description)
-
-            task.title = title
-            task.description = description
-            task.save()  # Save the updated task
+            # Update only the task fields that were sent, validated by their model fields
+            values = partial.changes(Task, body_data, ('title', 'description'))
+            writer.run(partial.save_columns, task, values)  # Save the updated columns
 
             # Return success response
             return JsonResponse({
                 'message': 'Task updated successfully',
-                'task': {
-                    'id': task.id,
-                    'title': task.title,
-                    'description': task.description,
-                    'created_at': task.created_at
-                }
+                'task': self.task_data(task)
             }, status=200)
 
         except Task.DoesNotExist:
             return JsonResponse({'error': 'Task not found'}, status=404)
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except partial.PatchError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+    def patch(self, request, pk):
+        try:
+            # Collect the columns to write from the JSON body
+            values = partial.changes(Task, json.loads(request.body), ('title', 'description'))
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except partial.PatchError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if not values:
+            return JsonResponse({'error': 'Send title and/or description.'}, status=400)
+
+        if partial.wants_representation(request):
+            # The response shows the whole task, so read it and save just the sent columns
+            try:
+                task = Task.objects.get(pk=pk)
+            except Task.DoesNotExist:
+                return JsonResponse({'error': 'Task not found'}, status=404)
+            writer.run(partial.save_columns, task, values)
+            return JsonResponse({'message': 'Task updated successfully', 'task': self.task_data(task)}, status=200)
+
+        # Otherwise one UPDATE, without reading the task first
+        if not writer.run(self.update_task, pk, values):
+            return JsonResponse({'error': 'Task not found'}, status=404)
+        return JsonResponse({'message': 'Task updated successfully', 'task_id': pk}, status=200)
+
+    def update_task(self, pk, values):
+        updated = partial.update_columns(Task.objects.filter(pk=pk), values)
+        if updated:
+            # update() sends no post_save: drop the cached detail and the list version by hand
+            caching.invalidate('task', pk)
+            conditional.bump(Task)
+        return updated
+
+    def task_data(self, task):
+        return {
+            'id': task.id,
+            'title': task.title,
+            'description': task.description,
+            'created_at': format_datetime(task.created_at)
+        }
 
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(conditional.conditional_get(conditional.ByUrlKwarg(
+    'user_id',
+    detail=conditional.RowVersions(CrudUser.objects.all(), 'user_id', 'updated_at', 'userprofile__updated_at'),
+    list=conditional.ModelVersions(CrudUser, UserProfile),
+)), name='get')
 class UserProfileCurdView(View):
+    detail_plan = FieldPlan(CrudUser, {
+        'username': 'username',
+        'email': 'email',
+        'profile.bio': 'userprofile__bio',
+        'profile.website': 'userprofile__website',
+    })
+
     def post(self, request, *args, **kwargs):
         try:
             # Parse JSON data
@@ -130,11 +182,8 @@ class UserProfileCurdView(View):
             bio = data.get('bio')
             website = data.get('website')
 
-            # Create the User
-            user = CrudUser.objects.create(username=username, email=email)
-
-            # Create the UserProfile
-            user_profile = UserProfile.objects.create(user=user, bio=bio, website=website)
+            # Create the User and its UserProfile
+            user, user_profile = writer.run(self.create_user, username, email, bio, website)
 
             # Success Response
             return JsonResponse({
@@ -147,95 +196,126 @@ class UserProfileCurdView(View):
             # Error Response
             return JsonResponse({"error": str(e)}, status=400)
 
+    def create_user(self, username, email, bio, website):
+        # Both rows commit together, or neither does
+        with transaction.atomic():
+            user = CrudUser.objects.create(username=username, email=email)
+            user_profile = UserProfile.objects.create(user=user, bio=bio, website=website)
+        return user, user_profile
 
-    def get(self, request, user_id):
-        # Get the CrudUser instance
-        user = get_object_or_404(CrudUser, id=user_id)
+    def get(self, request, user_id=None):
+        # Both get_all/ and get_by_id/<user_id>/ are served here
+        if user_id is not None:
+            return self.get_by_id(request, user_id)
 
-        # Fetch associated UserProfile if it exists
         try:
-            profile = user.userprofile
-            profile_data = {
-                'bio': profile.bio,
-                'website': profile.website,
-            }
-        except UserProfile.DoesNotExist:
-            profile_data = {
-                'bio': None,
-                'website': None,
-            }
-
-        # Manually construct the response
-        response_data = {
-            'username': user.username,
-            'email': user.email,
-            'profile': profile_data
-        }
+            queryset, serialize = listing.project('users', listing.requested_fields(request))
+        except FieldsError as e:
+            return JsonResponse({'error': str(e)}, status=400)
 
-        return JsonResponse(response_data)
+        if streaming.wants_stream(request):
+            return streaming.streaming_response(request, queryset, serialize)
+        if pagination.wants_pagination(request):
+            return pagination.paginated_response(request, queryset, serialize)
 
-    def get(self, request):
         try:
-            # Get all CrudUser instances
-            users = CrudUser.objects.all()
-
-            # Create a list to store user data
-            users_data = []
-
-            # Loop through all users and extract the needed information
-            for user in users:
-                # Get the associated user profile
-                user_profile = user.userprofile
-
-                # Create a dictionary for each user
-                user_data = {
-                    'id': user.id,
-                    'username': user.username,
-                    'email': user.email,
-                    'profile': {
-                        'bio': user_profile.bio,
-                        'website': user_profile.website,
-                    }
-                }
-
-                # Add the user data to the list
-                users_data.append(user_data)
+            # Get all CrudUser instances together with their profiles
+            users_data = serialize(queryset)
 
             # Return the list as JSON response
-            return JsonResponse(users_data,safe=False )
+            return json_response(users_data)
         except Exception as e:
             # Error Response
             return JsonResponse({"error": str(e)}, status=400)
 
+    def get_by_id(self, request, user_id):
+        response_data = caching.cached_detail('user', user_id, lambda: self.build(user_id))
+        return json_response(response_data)
+
+    def build(self, user_id):
+        # Get the CrudUser along with its profile (None fields if it has none) or 404
+        row = get_object_or_404(self.detail_plan.values(), id=user_id)
+        return self.detail_plan.to_dict(row)
+
 class UpdateUserProfile(UpdateAPIView):
     def put(self, request, user_id):
         try:
-            # Get user by id
-            user = CrudUser.objects.get(pk=user_id)
-            user_profile = UserProfile.objects.get(user=user)
+            # Get the profile and its user in one query
+            user_profile = UserProfile.objects.select_related('user').get(user_id=user_id)
+            user = user_profile.user
 
             # Get data from the request
             data = request.data
 
-            # Update user fields
-            user.username = data.get('username', user.username)
-            user.email = data.get('email', user.email)
-            user.save()
+            # Only the user and profile fields whose values changed are written
+            user_values = partial.changed(user, data, ('username', 'email'))
+            profile_values = partial.changed(user_profile, data, ('bio', 'website'))
 
-            # Update profile fields
-            user_profile.bio = data.get('bio', user_profile.bio)
-            user_profile.website = data.get('website', user_profile.website)
-            user_profile.save()
+            writer.run(self.save_user, user, user_values, user_profile, profile_values)
 
             return JsonResponse({'message': 'User profile updated successfully'}, status=200)
 
-        except CrudUser.DoesNotExist:
-            return JsonResponse({'error': 'User not found'}, status=404)
         except UserProfile.DoesNotExist:
+            # Only a miss pays for telling a missing user from a missing profile
+            if not CrudUser.objects.filter(pk=user_id).exists():
+                return JsonResponse({'error': 'User not found'}, status=404)
             return JsonResponse({'error': 'User profile not found'}, status=404)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
+    def save_user(self, user, user_values, user_profile, profile_values):
+        # One transaction; an unchanged user or profile is not saved at all
+        with transaction.atomic():
+            partial.save_columns(user, user_values)
+            partial.save_columns(user_profile, profile_values)
+
+    def patch(self, request, user_id):
+        try:
+            user_values = partial.changes(CrudUser, request.data, ('username', 'email'))
+            profile_values = partial.changes(UserProfile, request.data, ('bio', 'website'))
+        except partial.PatchError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if not user_values and not profile_values:
+            return JsonResponse({'error': 'Send username, email, bio and/or website.'}, status=400)
+
+        # One UPDATE per table that has sent fields, without reading either row
+        missing = writer.run(self.update_user, user_id, user_values, profile_values)
+        if missing:
+            return JsonResponse({'error': f'{missing} not found'}, status=404)
+        return JsonResponse({'message': 'User profile updated successfully'}, status=200)
+
+    def update_user(self, user_id, user_values, profile_values):
+        missing = self.update_rows(user_id, user_values, profile_values)
+        if missing:
+            # Only a miss pays for telling a missing user from a missing profile
+            if missing == 'User profile' and not user_values and not CrudUser.objects.filter(pk=user_id).exists():
+                return 'User'
+            return missing
+
+        # update() sends no post_save: drop the cached detail and the list versions by hand
+        caching.invalidate('user', user_id)
+        conditional.bump(*[model for model, values in ((CrudUser, user_values), (UserProfile, profile_values)) if values])
+        return None
+
+    def update_rows(self, user_id, user_values, profile_values):
+        """Write both tables in one transaction; the name of the row that was missing, if any."""
+        with transaction.atomic():
+            if user_values and not partial.update_columns(CrudUser.objects.filter(pk=user_id), user_values):
+                return 'User'
+            if profile_values and not partial.update_columns(UserProfile.objects.filter(user_id=user_id), profile_values):
+                # Undo the user columns written above
+                transaction.set_rollback(True)
+                return 'User profile'
+        return None
+
+def valid_books(books):
+    # Every book needs a non-empty book_name and content
+    return all(
+        isinstance(book_data, dict) and book_data.get('book_name') and book_data.get('content')
+        for book_data in books
+    )
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class AuthorCreateView(View):
     def post(self, request):
@@ -252,19 +332,12 @@ class AuthorCreateView(View):
             if not author_name or not books:
                 return JsonResponse({'error': 'Author name and books are required'}, status=400)
 
-            # Create the Author
-            author = Author.objects.create(name=author_name, bio=author_bio)
-
-            # Create each book associated with the author
-            for book_data in books:
-                book_name = book_data.get('book_name')
-                content = book_data.get('content')
+            # Validate every book before writing anything
+            if not valid_books(books):
+                return JsonResponse({'error': 'Each book must have a title and a published date'}, status=400)
 
-                # Ensure both title and published_date are present for each book
-                if book_name and content:
-                    Book.objects.create(author=author, book_name=book_name, content=content)
-                else:
-                    return JsonResponse({'error': 'Each book must have a title and a published date'}, status=400)
+            # Create the Author and all of its books in a single transaction
+            writer.run(self.create_author, author_name, author_bio, books)
 
             # Return a success response
             return JsonResponse({'message': 'Author and books created successfully'}, status=201)
@@ -272,6 +345,12 @@ class AuthorCreateView(View):
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
 
+    def create_author(self, author_name, author_bio, books):
+        with transaction.atomic():
+            author = Author.objects.create(name=author_name, bio=author_bio)
+            bulk.insert_books(author.id, books)
+        return author
+
 @method_decorator(csrf_exempt, name='dispatch')
 class OnlyAuthorCreateView(View):
     def post(self, request, *args, **kwargs):
@@ -288,7 +367,7 @@ class OnlyAuthorCreateView(View):
                 return JsonResponse({'error': 'Author name is required'}, status=400)
 
             # Create the Author
-            author = Author.objects.create(name=author_name, bio=author_bio)
+            author = writer.run(Author.objects.create, name=author_name, bio=author_bio)
 
             # Return a success response
             return JsonResponse({
@@ -316,27 +395,28 @@ class BookCreateView(View):
 
             # Parse the incoming JSON data
             data = json.loads(request.body)
-            book_list = []
 
-            for book_data in data:
-                book_name = book_data.get('book_name')
-                content = book_data.get('content')
+            # Ensure both book_name and content are present for each book before inserting any
+            if not isinstance(data, list) or not valid_books(data):
+                return JsonResponse({'error': 'Each book must have a book name and content'}, status=400)
 
-                # Ensure both book_name and content are present for each book
-                if book_name and content:
-                    book = Book.objects.create(author=author, book_name=book_name, content=content)
+            # Prefer: respond-async imports the books in a background job instead
+            if jobs.wants_async(request):
+                return jobs.accepted(writer.run(jobs.enqueue, 'import_books', {'author_id': author.id, 'books': data}))
 
-                    # Collect book details for the response
-                    book_dict = {
-                        'author_id': book.author.id,  # Use author id or name instead of the whole object
-                        'author_name': book.author.name,
-                        'book_name': book.book_name,
-                        'content': book.content,
-                    }
-                    book_list.append(book_dict)
+            # Insert all books in batched INSERTs inside one transaction
+            books = writer.run(bulk.insert_books, author.id, data)
 
-                else:
-                    return JsonResponse({'error': 'Each book must have a book name and content'}, status=400)
+            # Collect book details for the response from the author already in memory
+            book_list = [
+                {
+                    'author_id': author.id,
+                    'author_name': author.name,
+                    'book_name': book.book_name,
+                    'content': book.content,
+                }
+                for book in books
+            ]
 
             # Return a success response with the created book list
             return JsonResponse({
@@ -347,77 +427,57 @@ class BookCreateView(View):
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
 
+@method_decorator(conditional.conditional_get(conditional.ModelVersions(Author, Book)), name='get')
 class GetAllAuthorsView(APIView):
     def get(self, request):
+        # ?fields=id,author_name,books.book_name reads no bio or content; without books fields, no books at all
         try:
-            # Query all authors
-            authors = Author.objects.all()
-
-            # Create a list to store the response
-            data = []
-
-            for author in authors:
-                # For each author, get their books
-                books = Book.objects.filter(author=author)
-
-                # Create a list to store the books for each author
-                books_list = []
-
-                for book in books:
-                    # Append each book's details to the books_list
-                    books_list.append({
-                        "id": book.id,
-                        "book_name": book.book_name,
-                        "content": book.content,
-                        "created_at": book.created_at
-                    })
-
-                # Construct the author and books information
-                author_data = {
-                    "id": author.id,
-                    "author_name": author.name,
-                    "bio": author.bio,
-                    "books": books_list
-                }
+            queryset, serialize = listing.project('authors', listing.requested_fields(request))
+        except FieldsError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        if streaming.wants_stream(request):
+            return streaming.streaming_response(request, queryset, serialize)
+        if pagination.wants_pagination(request):
+            return pagination.paginated_response(request, queryset, serialize)
+
+        try:
+            # Query all authors and their books in two queries
+            data = serialize(queryset)
 
-                # Append the author data to the response list
-                data.append(author_data)
             # Return the response as JSON
-            return JsonResponse(data, safe=False)
+            return json_response(data)
 
         except Exception as e:
             # Error Response
             return JsonResponse({"error": str(e)}, status=400)
 
 
+# The book count catches deleted books, the newest updated_at any other change
+@method_decorator(conditional.conditional_get(conditional.RowVersions(
+    Author.objects.annotate(books_updated_at=Max('book__updated_at'), book_count=Count('book')),
+    'author_id', 'updated_at', 'books_updated_at', 'book_count',
+)), name='get')
 class AuthorDetailByIdAPIView(APIView):
+    author_plan = FieldPlan(Author, {'author_name': 'name', 'bio': 'bio'})
+    book_plan = FieldPlan(Book, {'book_name': 'book_name', 'content': 'content', 'created_at': 'created_at'})
+
     def get(self, request, author_id):
-        # Get the author by ID or return a 404 if not found
-        author = get_object_or_404(Author, id=author_id)
+        author_data = caching.cached_detail('author', author_id, lambda: self.build(author_id))
 
-        # Get all books for the specified author
-        books = Book.objects.filter(author=author)
+        # Return the response as JSON
+        return json_response(author_data)
 
-        # Create a list to store the books for the author
-        books_list = []
+    def build(self, author_id):
+        # Get the author by ID or return a 404 if not found
+        author_data = self.author_plan.to_dict(get_object_or_404(self.author_plan.values(), id=author_id))
 
-        for book in books:
-            # Append each book's details to the books_list
-            books_list.append({
-                "book_name": book.book_name,
-                "content": book.content,
-                "created_at": book.created_at
-            })
+        # Get all books for the specified author
+        books = self.book_plan.values(Book.objects.filter(author_id=author_id).order_by('id'))
 
         # Construct the author and books information
-        author_data = {
-            "author_name": author.name,
-            "bio": author.bio,
-            "books": books_list
-        }
-
-        # Return the response as JSON
-        return JsonResponse(author_data, safe=False)
+        author_data["books"] = self.book_plan.to_dicts(books)
+        return author_data
 
 
 @method_decorator(csrf_exempt, name='dispatch')  # To exempt CSRF for testing purposes, not recommended for production
@@ -425,7 +485,8 @@ class UpdateBookView(View):
 
     def put(self, request, pk):
         try:
-            book = Book.objects.get(pk=pk)
+            # The response names the author, so read it along with the book
+            book = Book.objects.select_related('author').get(pk=pk)
         except Book.DoesNotExist:
             return JsonResponse({'error': 'Book not found'}, status=404)
 
@@ -435,48 +496,98 @@ class UpdateBookView(View):
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
 
-        # Update book details
-        book_name = data.get('book_name')
-        content = data.get('content')
-        author_id = data.get('author_id')
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Expected a JSON object'}, status=400)
 
-        if book_name:
-            book.book_name = book_name
-        if content:
-            book.content = content
-        if author_id:
-            try:
-                author = Author.objects.get(pk=author_id)
-                book.author = author
-            except Author.DoesNotExist:
-                return JsonResponse({'error': 'Author not found'}, status=404)
+        # Update book details; empty values are ignored and only the columns that change are written
+        try:
+            values = partial.changes(
+                Book, {name: value for name, value in data.items() if value}, ('book_name', 'content', 'author_id'),
+            )
+        except partial.PatchError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        author_id = book.author_id
+        response = self.move(book, values)
+        if response is not None:
+            return response
 
         # Save the updated book
-        book.save()
+        writer.run(self.save_book, book, values, author_id)
 
-        return JsonResponse({
-            'message': 'Book updated successfully',
-            'book': {
-                'id': book.id,
-                'book_name': book.book_name,
-                'content': book.content,
-                'author': book.author.name,
-                'created_at': book.created_at
-            }
-        }, status=200)
+        return JsonResponse({'message': 'Book updated successfully', 'book': self.book_data(book)}, status=200)
+
+    def patch(self, request, pk):
+        try:
+            values = partial.changes(Book, json.loads(request.body), ('book_name', 'content', 'author_id'))
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except partial.PatchError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if not values:
+            return JsonResponse({'error': 'Send book_name, content and/or author_id.'}, status=400)
+
+        representation = partial.wants_representation(request)
+        try:
+            if representation:
+                book = Book.objects.select_related('author').get(pk=pk)
+            else:
+                # The author id keys the author's cached detail; nothing else is read
+                book = Book.objects.only('author_id').get(pk=pk)
+        except Book.DoesNotExist:
+            return JsonResponse({'error': 'Book not found'}, status=404)
+
+        author_id = book.author_id
+        response = self.move(book, values)
+        if response is not None:
+            return response
+        writer.run(self.save_book, book, values, author_id)
+
+        if representation:
+            return JsonResponse({'message': 'Book updated successfully', 'book': self.book_data(book)}, status=200)
+        return JsonResponse({'message': 'Book updated successfully', 'book_id': book.id}, status=200)
+
+    def move(self, book, values):
+        """Point ``book`` at the author in ``values``; an error response if there is no such author."""
+        if 'author_id' not in values:
+            return None
+        if values['author_id'] == book.author_id:
+            del values['author_id']
+            return None
+        try:
+            # One query checks the author exists and reads the name the response shows
+            values['author'] = Author.objects.only('name').get(pk=values.pop('author_id'))
+        except (Author.DoesNotExist, ValueError, TypeError):
+            return JsonResponse({'error': 'Author not found'}, status=404)
+        return None
+
+    def save_book(self, book, values, author_id):
+        partial.save_columns(book, values)
+        # post_save dropped the new author's cached detail; the old author listed the book too
+        if book.author_id != author_id:
+            caching.invalidate('author', author_id)
+
+    def book_data(self, book):
+        return {
+            'id': book.id,
+            'book_name': book.book_name,
+            'content': book.content,
+            'author': book.author.name,
+            'created_at': format_datetime(book.created_at)
+        }
 
 @method_decorator(csrf_exempt, name='dispatch')  # Exempt CSRF for testing purposes
 class DeleteAuthorView(View):
 
     def delete(self, request, pk):
-        try:
-            # Fetch the author instance by primary key
-            author = Author.objects.get(pk=pk)
-        except Author.DoesNotExist:
-            return JsonResponse({'error': 'Author not found'}, status=404)
+        if jobs.wants_async(request):
+            # Prefer: respond-async queues the delete, which then removes the books in bounded batches
+            if not Author.objects.filter(pk=pk).exists():
+                return JsonResponse({'error': 'Author not found'}, status=404)
+            return jobs.accepted(writer.run(jobs.enqueue, 'delete_author', {'author_id': pk}))
 
-        # Delete the author, which will also delete all related books due to CASCADE
-        author.delete()
+        # Delete the books and then the author with one DELETE each, without loading any of them
+        if not writer.run(deletion.delete_author, pk):
+            return JsonResponse({'error': 'Author not found'}, status=404)
 
         return JsonResponse({'message': 'Author and all related books deleted successfully'}, status=200)
 
@@ -491,11 +602,12 @@ class DeleteBookView(View):
             return JsonResponse({'error': 'Book not found for this author'}, status=404)
 
         # Delete the book instance
-        book.delete()
+        writer.run(book.delete)
 
         return JsonResponse({'message': 'Book deleted successfully'}, status=200)
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(conditional.conditional_get(conditional.ModelVersions(Enrollment, Student, Course)), name='get')
 class EnrollmentCreateView(View):
     def post(self, request):
         data = json.loads(request.body)
@@ -503,6 +615,25 @@ class EnrollmentCreateView(View):
         course_data = data.get("course")
         grade = data.get("grade")
 
+        # Get or create the student, course and enrollment as one unit of work on the writer
+        # (on the student's shard when sharding is enabled)
+        student, course, enrollment, created = writer.run(
+            sharding.on_shard, sharding.shard_for_email(student_data["email"]),
+            self.enroll, student_data, course_data, grade,
+        )
+        if created:
+            response = {
+                "message": "Enrollment created successfully",
+                "student": student.name,
+                "course": course.title,
+                "enrollment_date": enrollment.enrollment_date,
+                "grade": enrollment.grade,
+            }
+            return JsonResponse(response, status=201)
+        else:
+            return JsonResponse({"message": "Enrollment already exists"}, status=400)
+
+    def enroll(self, student_data, course_data, grade):
         # Check if the student exists; create if not
         student = Student.objects.filter(
             name=student_data["name"],
@@ -529,127 +660,254 @@ class EnrollmentCreateView(View):
 
         # Check if the enrollment exists; create if not
         enrollment = Enrollment.objects.filter(student=student, course=course).first()
-        if not enrollment:
-            enrollment = Enrollment.objects.create(
-                student=student,
-                course=course,
-                grade=grade
-            )
-            response = {
-                "message": "Enrollment created successfully",
-                "student": student.name,
-                "course": course.title,
-                "enrollment_date": enrollment.enrollment_date,
-                "grade": enrollment.grade,
-            }
-            return JsonResponse(response, status=201)
-        else:
-            return JsonResponse({"message": "Enrollment already exists"}, status=400)
+        if enrollment:
+            return student, course, enrollment, False
+        enrollment = Enrollment.objects.create(
+            student=student,
+            course=course,
+            grade=grade
+        )
+        return student, course, enrollment, True
 
     def get(self, request):
-        # Get all enrollment records
-        enrollments = Enrollment.objects.all()
-
-        # Format enrollment data into the specified structure
-        enrollment_data = []
-        for enrollment in enrollments:
-            enrollment_data.append({
-                "student": {
-                    "id": enrollment.student.id,
-                    "name": enrollment.student.name,
-                    "email": enrollment.student.email,
-                },
-                "course": {
-                    "id": enrollment.course.id,
-                    "title": enrollment.course.title,
-                    "description": enrollment.course.description,
-                    "start_date": enrollment.course.start_date,
-                },
-                "grade": enrollment.grade,
-                "id": enrollment.id,
-            })
+        try:
+            queryset, serialize = listing.project('enrollments', listing.requested_fields(request))
+        except FieldsError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        if streaming.wants_stream(request):
+            return streaming.streaming_response(request, queryset, serialize)
+        if pagination.wants_pagination(request):
+            return pagination.paginated_response(request, queryset, serialize)
+
+        # Get all enrollment records with their student and course in one query (per shard)
+        enrollment_data = serialize(sharding.fetch(queryset))
 
         # Return data as JSON response
-        return JsonResponse(enrollment_data, safe=False)
+        return json_response(enrollment_data)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class EnrollmentBulkCreateView(View):
+    def post(self, request):
+        try:
+            items = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        if not isinstance(items, list):
+            return JsonResponse({'error': 'Expected a list of enrollments'}, status=400)
+
+        # Prefer: respond-async imports the items in a background job instead
+        if jobs.wants_async(request):
+            return jobs.accepted(writer.run(jobs.enqueue, 'import_enrollments', {'items': items}))
 
+        # Resolve students and courses and insert the enrollments in a few set-based queries
+        results = writer.run(bulk.upsert_enrollments, items)
+
+        statuses = [result['status'] for result in results]
+        return JsonResponse({
+            'created': statuses.count('created'),
+            'existing': statuses.count('exists'),
+            'errors': statuses.count('error'),
+            'results': results,
+        }, status=200)
+
+@method_decorator(sharding.route_by_kwarg('id'), name='dispatch')
+@method_decorator(conditional.conditional_get(conditional.RowVersions(
+    Enrollment.objects.all(), 'id', 'updated_at', 'student__updated_at', 'course__updated_at',
+)), name='get')
 class EnrollmentGetByIdView(APIView):
+    detail_plan = FieldPlan(Enrollment, {
+        'student.name': 'student__name',
+        'student.email': 'student__email',
+        'course.title': 'course__title',
+        'course.description': 'course__description',
+        'course.start_date': 'course__start_date',
+        'grade': 'grade',
+    })
+
     def get(self, request, id):
         try:
-            # Retrieve the specific enrollment by ID
-            enrollment = Enrollment.objects.get(id=id)
-
-            # Structure the response data
-            enrollment_data = {
-                "student": {
-                    "name": enrollment.student.name,
-                    "email": enrollment.student.email,
-                },
-                "course": {
-                    "title": enrollment.course.title,
-                    "description": enrollment.course.description,
-                    "start_date": enrollment.course.start_date,
-                },
-                "grade": enrollment.grade,
-            }
+            # Retrieve the specific enrollment by ID (through the detail cache)
+            enrollment_data = caching.cached_detail('enrollment', id, lambda: self.build(id))
 
             # Return data as JSON response
-            return JsonResponse(enrollment_data, status=200)
+            return json_response(enrollment_data, status=200)
         except Enrollment.DoesNotExist:
             # Return a 404 error if the enrollment is not found
             return JsonResponse({"error": "Enrollment not found"}, status=404)
 
-    def delete(self, request, id):
-        try:
-            # Retrieve and delete the specific enrollment by ID
-            enrollment = Enrollment.objects.get(id=id)
-            enrollment.delete()
+    def build(self, id):
+        # Structure the response data from one joined row
+        return self.detail_plan.to_dict(self.detail_plan.values().get(id=id))
 
-            # Return a success response
-            return JsonResponse({"message": "Enrollment deleted successfully"}, status=200)
-        except Enrollment.DoesNotExist:
+    def delete(self, request, id):
+        # Delete the specific enrollment by ID on its shard, without reading it first
+        if not writer.run(sharding.on_shard, sharding.current_shard(), deletion.delete_enrollment, id):
             # Return a 404 error if the enrollment is not found
             return JsonResponse({"error": "Enrollment not found"}, status=404)
 
+        # Return a success response
+        return JsonResponse({"message": "Enrollment deleted successfully"}, status=200)
+
     def put(self, request, id):
         try:
-            enrollment = Enrollment.objects.get(id=id)
             data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Expected a JSON object"}, status=400)
+        if any(not isinstance(data.get(name, {}), dict) for name in ("student", "course")):
+            return JsonResponse({"error": "student and course must be JSON objects"}, status=400)
 
-            # Update student information if provided
-            student_data = data.get("student")
-            if student_data:
-                enrollment.student.name = student_data.get("name", enrollment.student.name)
-                enrollment.student.email = student_data.get("email", enrollment.student.email)
-                enrollment.student.save()
-
-            # Update course information if provided
-            course_data = data.get("course")
-            if course_data:
-                enrollment.course.title = course_data.get("title", enrollment.course.title)
-                enrollment.course.description = course_data.get("description", enrollment.course.description)
-                enrollment.course.start_date = course_data.get("start_date", enrollment.course.start_date)
-                enrollment.course.save()
-
-            # Update grade if provided
-            grade = data.get("grade")
-            if grade:
-                enrollment.grade = grade
-
-            enrollment.save()
-
-            # Prepare the response data in the specified format
-            updated_data = {
-                "student": {
-                    "name": enrollment.student.name,
-                    "email": enrollment.student.email,
-                },
-                "course": {
-                    "title": enrollment.course.title,
-                    "description": enrollment.course.description,
-                    "start_date": enrollment.course.start_date,
-                },
-                "grade": enrollment.grade,
-            }
-            return JsonResponse(updated_data, status=200)
+        try:
+            # Read the enrollment with its student and course in one query
+            enrollment = Enrollment.objects.select_related('student', 'course').get(id=id)
         except Enrollment.DoesNotExist:
-            return JsonResponse({"error": "Enrollment not found"}, status=404)
\ No newline at end of file
+            return JsonResponse({"error": "Enrollment not found"}, status=404)
+
+        try:
+            writer.run(sharding.on_shard, sharding.current_shard(), self.update, enrollment, data)
+        except ValidationError as e:
+            return JsonResponse({"error": " ".join(e.messages)}, status=400)
+        except IntegrityError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        return JsonResponse(self.enrollment_data(enrollment), status=200)
+
+    def enrollment_data(self, enrollment):
+        # The response data in the specified format
+        return {
+            "student": {
+                "name": enrollment.student.name,
+                "email": enrollment.student.email,
+            },
+            "course": {
+                "title": enrollment.course.title,
+                "description": enrollment.course.description,
+                "start_date": enrollment.course.start_date,
+            },
+            "grade": enrollment.grade,
+        }
+
+    def update(self, enrollment, data):
+        # Work out every change first: objects without one are not saved at all
+        student_values = partial.changed(enrollment.student, data.get("student") or {}, ("name", "email"))
+        course_values = partial.changed(
+            enrollment.course, data.get("course") or {}, ("title", "description", "start_date"),
+        )
+        grade = data.get("grade")
+        enrollment_values = partial.changed(enrollment, {"grade": grade} if grade else {}, ("grade",))
+
+        # One transaction (one commit) for the student and enrollment, saving only changed columns.
+        # Courses are written on the home shard when sharded, in that database's own transaction.
+        with transaction.atomic(using=enrollment._state.db):
+            partial.save_columns(enrollment.student, student_values)
+            partial.save_columns(enrollment.course, course_values)
+            partial.save_columns(enrollment, enrollment_values)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BulkDeleteView(View):
+    """
+    Delete many tasks, books or enrollments in bounded batches (App/deletion.py):
+    ``{"ids": [...]}`` or ``{"filter": {...}}`` with the lookups in ``filters``.
+    """
+    models = {'tasks': Task, 'books': Book, 'enrollments': Enrollment}
+    filters = {
+        'tasks': {'title', 'created_at__lt', 'created_at__gte'},
+        'books': {'author_id', 'book_name', 'created_at__lt', 'created_at__gte'},
+        'enrollments': {'student_id', 'course_id', 'grade'},
+    }
+    # Ids outside a signed 64-bit integer cannot be bound as query parameters
+    max_id = 2 ** 63 - 1
+
+    def post(self, request, resource):
+        if resource not in self.models:
+            return JsonResponse({'error': f'Unknown resource {resource}'}, status=404)
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+
+        # Delete the rows by id list or by filter, never the whole table
+        model = self.models[resource]
+        ids, lookups = data.get('ids'), data.get('filter')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(
+                isinstance(pk, int) and not isinstance(pk, bool) and -self.max_id <= pk <= self.max_id for pk in ids
+            ):
+                return JsonResponse({'error': 'ids must be a list of 64-bit integers'}, status=400)
+            deleted = deletion.bulk_delete_ids(model, ids)
+        elif isinstance(lookups, dict) and lookups:
+            unknown = set(lookups) - self.filters[resource]
+            if unknown:
+                return JsonResponse({'error': f'Unknown filter {sorted(unknown)[0]!r}'}, status=400)
+            # Every lookup compares against one value: lists, objects and null are not filters
+            invalid = sorted(name for name, value in lookups.items() if not isinstance(value, (str, int, float)))
+            if invalid:
+                return JsonResponse({'error': f'Filter {invalid[0]!r} must be a string or a number'}, status=400)
+            try:
+                queryset = model.objects.filter(**lookups)
+            except (ValidationError, ValueError, TypeError) as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            try:
+                deleted = deletion.bulk_delete(queryset)
+            except OverflowError:
+                return JsonResponse({'error': 'Filter values must fit in a 64-bit integer'}, status=400)
+        else:
+            return JsonResponse({'error': 'Send ids or a non-empty filter'}, status=400)
+
+        return JsonResponse({'deleted': deleted}, status=200)
+
+
+class JobView(View):
+    """Status, progress and result of a background job (App/jobs.py)."""
+
+    def get(self, request, job_id):
+        try:
+            job = jobs.queue().get(pk=job_id)
+        except Job.DoesNotExist:
+            return JsonResponse({'error': 'Job not found'}, status=404)
+        return JsonResponse(jobs.job_data(job))
+
+
+class CacheStatsView(View):
+    """Detail cache hit/miss counters of the worker process serving the request."""
+
+    def get(self, request):
+        return JsonResponse(caching.stats())
+
+
+class MetricsView(View):
+    """Request metrics of every worker process, in Prometheus text format (App/metrics.py)."""
+
+    def get(self, request):
+        return HttpResponse(metrics.render(metrics.collect()), content_type=metrics.CONTENT_TYPE)
+
+
+class ExportView(View):
+    """Stream a whole table as a JSON array (default) or NDJSON (?format=ndjson), optionally with ?fields=."""
+
+    def get(self, request, resource):
+        if resource not in listing.RESOURCES:
+            return JsonResponse({'error': f'Unknown export {resource}'}, status=404)
+        try:
+            queryset, serialize = listing.project(resource, listing.requested_fields(request))
+        except FieldsError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return streaming.streaming_response(request, queryset, serialize)
+
+
+class SearchView(View):
+    """Ranked full-text search: ``?q=`` plus ``?limit=&cursor=`` like the list endpoints (App/search.py)."""
+
+    def get(self, request, resource):
+        if resource not in search.INDEXES:
+            return JsonResponse({'error': f'Unknown search {resource}'}, status=404)
+        try:
+            matches, next_cursor = search.search(resource, request)
+        except (search.SearchError, pagination.PaginationError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return json_response({'results': matches, 'next': next_cursor})
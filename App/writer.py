@@ -0,0 +1,147 @@
+"""
+Single-writer queue for the write endpoints.
+
+SQLite allows one writer at a time, so concurrent POST/PUT/DELETE requests
+otherwise queue on the database lock (or fail with "database is locked").
+With ``settings.APP_WRITE_QUEUE['ENABLED']`` the views hand their write
+work to ``run()``, which passes it to one writer thread per process. The
+writer takes whatever is waiting (up to ``MAX_BATCH`` items, lingering
+``MAX_WAIT`` seconds for more) and runs the batch in one transaction,
+each item in its own savepoint: one commit (and one fsync) covers many
+requests, and a failing item only rolls back its own savepoint and
+re-raises in its caller.
+
+Disabled (the default), ``run()`` simply calls the function in the request
+thread. Work submitted from inside an atomic block also runs inline, since
+the writer's connection could not see the caller's uncommitted rows.
+"""
+import contextvars
+import queue
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+DEFAULTS = {
+    'ENABLED': False,
+    'MAX_BATCH': 64,
+    'MAX_WAIT': 0.002,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'APP_WRITE_QUEUE', {})}
+
+
+class WriteJob:
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        # Routing state (e.g. the selected shard) follows the work to the writer thread
+        self.context = contextvars.copy_context()
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class WriteQueue:
+    """One writer thread committing batches of submitted writes (group commit)."""
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, max_batch=DEFAULTS['MAX_BATCH'], max_wait=DEFAULTS['MAX_WAIT']):
+        self.using = using
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.jobs = queue.Queue()
+        self.batches = 0
+        self.thread = threading.Thread(target=self.loop, name='App-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` and block until its batch has committed."""
+        job = WriteJob(fn, args, kwargs)
+        self.jobs.put(job)
+        return job.wait()
+
+    def stop(self):
+        self.jobs.put(None)
+        self.thread.join()
+
+    def loop(self):
+        try:
+            while True:
+                batch = self.collect()
+                if batch[-1] is None:
+                    batch.pop()
+                    if batch:
+                        self.commit(batch)
+                    return
+                self.commit(batch)
+        finally:
+            connections.close_all()
+
+    def collect(self):
+        # Block for the first job, then take what arrives within max_wait
+        batch = [self.jobs.get()]
+        while batch[-1] is not None and len(batch) < self.max_batch:
+            try:
+                batch.append(self.jobs.get(timeout=self.max_wait))
+            except queue.Empty:
+                break
+        return batch
+
+    def commit(self, batch):
+        connection = connections[self.using]
+        connection.close_if_unusable_or_obsolete()
+        try:
+            with transaction.atomic(using=self.using):
+                for job in batch:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            job.result = job.context.run(job.fn, *job.args, **job.kwargs)
+                    except Exception as e:
+                        job.error = e
+        except Exception as e:
+            # The commit itself failed: nothing in the batch was written
+            for job in batch:
+                if job.error is None:
+                    job.error = e
+            connection.close()
+        self.batches += 1
+        for job in batch:
+            job.done.set()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            config = get_config()
+            _queue = WriteQueue(max_batch=config['MAX_BATCH'], max_wait=config['MAX_WAIT'])
+        return _queue
+
+
+def shutdown():
+    """Stop the writer thread (a new one starts on the next ``run()``)."""
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            _queue.stop()
+            _queue = None
+
+
+def run(fn, *args, **kwargs):
+    """Run the write ``fn(*args, **kwargs)`` and return its result."""
+    if not get_config()['ENABLED'] or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return fn(*args, **kwargs)
+    return get_queue().submit(fn, *args, **kwargs)
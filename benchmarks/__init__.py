@@ -0,0 +1,7 @@
+"""
+Benchmarks for the App API.
+
+Each module is a standalone script run from the project root, e.g.
+``python -m benchmarks.serialization``. They build a throwaway test database,
+seed it and print their results; nothing touches ``db.sqlite3``.
+"""
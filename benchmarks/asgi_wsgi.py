@@ -0,0 +1,104 @@
+"""
+Requests per second and latency percentiles at high concurrency: the sync
+endpoints under WSGI (gunicorn, threaded) against the async /api/async/
+endpoints under ASGI (uvicorn), plus the sync endpoints under ASGI.
+
+    pip install gunicorn uvicorn
+    python -m benchmarks.asgi_wsgi [--concurrency 500] [--duration 15] [--rows 2000]
+
+Each server runs a single worker process over a seeded throwaway database
+file. Pass --wsgi-url / --asgi-url to measure servers you started yourself
+against the same data instead.
+"""
+import argparse
+import tempfile
+from pathlib import Path
+
+from .common import server, use_database_file
+from .loadgen import run_load
+
+WSGI_PORT = 8701
+ASGI_PORT = 8702
+
+SYNC_REQUESTS = [
+    ('GET', '/api/getmymodel/?limit=50', None),
+    ('GET', '/api/getbyid/{task_id}/', None),
+    ('GET', '/api/get_all_authors_one_to_many/?limit=20', None),
+    ('GET', '/api/get_student_course_many_to_many/?limit=50', None),
+]
+
+ASYNC_REQUESTS = [
+    ('GET', '/api/async/tasks/?limit=50', None),
+    ('GET', '/api/async/tasks/{task_id}/', None),
+    ('GET', '/api/async/authors/?limit=20', None),
+    ('GET', '/api/async/enrollments/?limit=50', None),
+]
+
+
+def seed(rows):
+    import datetime
+    from App.models import Task, Author, Book, Student, Course, Enrollment
+
+    Task.objects.bulk_create(Task(title=f'Task {i}', description='lorem ipsum ' * 20) for i in range(rows))
+    authors = Author.objects.bulk_create(Author(name=f'Author {i}', bio='bio') for i in range(rows // 10))
+    Book.objects.bulk_create(
+        Book(author=author, book_name=f'Book {j}', content='lorem ipsum ' * 20) for author in authors for j in range(5)
+    )
+    students = Student.objects.bulk_create(
+        Student(name=f'Student {i}', email=f'student{i}@example.com') for i in range(rows)
+    )
+    course = Course.objects.create(title='Course', description='desc', start_date=datetime.date(2024, 9, 1))
+    Enrollment.objects.bulk_create(Enrollment(student=student, course=course) for student in students)
+    return Task.objects.order_by('id').values_list('id', flat=True).first()
+
+
+def fill(requests, **values):
+    return [(method, path.format(**values), body) for method, path, body in requests]
+
+
+def report(name, result):
+    print(
+        f'{name:<22}{result["rps"]:>10,.0f}{result["p50_ms"] or 0:>10.1f}{result["p99_ms"] or 0:>10.1f}'
+        f'{result["requests"]:>10}{result["errors"]:>8}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--wsgi-url')
+    parser.add_argument('--asgi-url')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / 'bench.sqlite3'
+        use_database_file(db)
+        task_id = seed(args.rows)
+        env = {'DJANGO_CRUD_DB': str(db)}
+
+        print(f'{args.concurrency} connections, {args.duration:.0f}s per run')
+        print(f'{"setup":<22}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"requests":>10}{"errors":>8}')
+        runs = [
+            ('WSGI sync views', args.wsgi_url, SYNC_REQUESTS,
+             ['gunicorn', 'django_crud.wsgi:application', '--workers', '1', '--threads', '32',
+              '--bind', f'127.0.0.1:{WSGI_PORT}'], WSGI_PORT),
+            ('ASGI async views', args.asgi_url, ASYNC_REQUESTS,
+             ['uvicorn', 'django_crud.asgi:application', '--workers', '1', '--no-access-log',
+              '--port', str(ASGI_PORT)], ASGI_PORT),
+            ('ASGI sync views', args.asgi_url, SYNC_REQUESTS,
+             ['uvicorn', 'django_crud.asgi:application', '--workers', '1', '--no-access-log',
+              '--port', str(ASGI_PORT)], ASGI_PORT),
+        ]
+        for name, url, requests, argv, port in runs:
+            requests = fill(requests, task_id=task_id)
+            if url:
+                report(name, run_load(url, requests, args.concurrency, args.duration))
+                continue
+            with server(argv, port, env) as url:
+                report(name, run_load(url, requests, args.concurrency, args.duration))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+import contextlib
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup_django(settings_module='django_crud.settings'):
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+@contextlib.contextmanager
+def test_database():
+    """Create (and afterwards destroy) a migrated test database, like the test runner does."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def best_of(fn, repeat=5):
+    """Run ``fn`` ``repeat`` times and return the fastest wall time in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def use_database_file(path):
+    """Point the project at ``path`` (must run before ``setup_django``) and migrate it."""
+    os.environ['DJANGO_CRUD_DB'] = str(path)
+    setup_django()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def wait_for_port(host, port, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on {host}:{port} did not start within {timeout}s')
+
+
+@contextlib.contextmanager
+def server(argv, port, env=None):
+    """Run a server command from the project root until the block exits."""
+    if shutil.which(argv[0]) is None:
+        raise SystemExit(f'{argv[0]} is not installed (pip install {argv[0]}) or pass the server URLs explicitly')
+    process = subprocess.Popen(
+        argv, cwd=ROOT, env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port('127.0.0.1', port)
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
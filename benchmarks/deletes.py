@@ -0,0 +1,67 @@
+"""
+Deleting an author with many books, and many tasks at once, through the
+deletion collector against the set-based path of App/deletion.py.
+
+    python -m benchmarks.deletes [--books 50000] [--tasks 100000]
+
+Every case deletes freshly seeded rows once (a delete cannot be repeated),
+so the times are single runs. "peak MiB" is the largest Python allocation
+made during the delete (tracemalloc), i.e. the rows the collector loads.
+"""
+import argparse
+import time
+import tracemalloc
+
+from .common import setup_django, test_database
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=50_000)
+    parser.add_argument('--tasks', type=int, default=100_000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from App import deletion
+    from App.models import Task, Author, Book
+
+    def seed_author():
+        author = Author.objects.create(name='Prolific', bio='...')
+        Book.objects.bulk_create(
+            (Book(author=author, book_name=f'Book {i}', content='...') for i in range(args.books)), batch_size=5000,
+        )
+        return author.pk
+
+    def seed_tasks():
+        Task.objects.bulk_create(
+            (Task(title=f'Task {i}', description='...') for i in range(args.tasks)), batch_size=5000,
+        )
+        return Task.objects.all()
+
+    with test_database():
+        print(f'{"case":<34}{"rows":>9}{"time":>11}{"peak MiB":>10}')
+        for fast in (False, True):
+            label = 'set-based' if fast else 'collector'
+            with override_settings(APP_DELETION={**deletion.DEFAULTS, 'FAST': fast}):
+                pk = seed_author()
+                _, elapsed, peak = measure(lambda: deletion.delete_author(pk))
+                print(f'{"author + books, " + label:<34}{args.books:>9,}{elapsed:>10.2f}s{peak / 2**20:>10.1f}')
+
+                queryset = seed_tasks()
+                deleted, elapsed, peak = measure(lambda: deletion.bulk_delete(queryset))
+                print(f'{"bulk tasks, " + label:<34}{deleted:>9,}{elapsed:>10.2f}s{peak / 2**20:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
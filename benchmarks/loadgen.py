@@ -0,0 +1,124 @@
+"""
+Minimal asyncio HTTP/1.1 load generator (no third-party dependencies).
+
+Each of ``concurrency`` connections sends requests back to back over a
+keep-alive connection for ``duration`` seconds, cycling through ``requests``.
+"""
+import asyncio
+import itertools
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        body = b''
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await reader.readline()
+                break
+            body += await reader.readexactly(size)
+            await reader.readline()
+    else:
+        body = await reader.read()
+    framed = 'content-length' in headers or headers.get('transfer-encoding') == 'chunked'
+    keep_alive = framed and headers.get('connection', '').lower() != 'close'
+    return status, body, keep_alive
+
+
+def build_request(host, method, path, body=None):
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {host}', 'Connection: keep-alive']
+    payload = b''
+    if body is not None:
+        payload = json.dumps(body).encode()
+        lines += ['Content-Type: application/json', f'Content-Length: {len(payload)}']
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode() + payload
+
+
+async def worker(host, port, requests, deadline, latencies, errors):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        method, path, body = next(requests)
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            start = time.perf_counter()
+            writer.write(build_request(f'{host}:{port}', method, path, body))
+            await writer.drain()
+            status, _, keep_alive = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status >= 500:
+                errors.append(status)
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def _run(base_url, requests, concurrency, duration):
+    parts = urlsplit(base_url)
+    host, port = parts.hostname, parts.port or 80
+    prefix = parts.path.rstrip('/')
+    cycle = itertools.cycle([(method, prefix + path, body) for method, path, body in requests])
+    latencies, errors = [], []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(
+        worker(host, port, cycle, deadline, latencies, errors) for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    return summarize(latencies, errors, elapsed)
+
+
+def summarize(latencies, errors, elapsed):
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        'requests': len(ms),
+        'errors': len(errors),
+        'rps': len(ms) / elapsed if elapsed else 0.0,
+        'mean_ms': statistics.fmean(ms) if ms else None,
+        'p50_ms': percentile(ms, 50),
+        'p90_ms': percentile(ms, 90),
+        'p99_ms': percentile(ms, 99),
+        'max_ms': max(ms) if ms else None,
+    }
+
+
+def run_load(base_url, requests, concurrency=50, duration=10.0):
+    """
+    Drive ``requests`` (``(method, path, json_body_or_None)`` tuples) against
+    ``base_url`` and return a summary dict with rps and latency percentiles.
+    """
+    return asyncio.run(_run(base_url, requests, concurrency, duration))
@@ -0,0 +1,96 @@
+"""
+Queries and bytes written per update: a full-row ``save()`` (what the PUT
+endpoints used to do) against PUT with ``update_fields`` and PATCH, both
+minimal (one UPDATE, no read) and with ``Prefer: return=representation``.
+
+    python -m benchmarks.partial_updates [--text-kb 64] [--repeat 20]
+
+Every row carries ``--text-kb`` KiB in its large TextField and each update
+changes only a short column. "bytes written" is the size of the values
+bound to UPDATE statements, i.e. what SQLite has to write into the row.
+The full-save rows call the ORM directly, so their latency leaves out the
+request handling the endpoint rows include.
+"""
+import argparse
+import json
+
+from .common import best_of, setup_django, test_database
+
+
+class WriteCounter:
+    def __init__(self):
+        self.queries = 0
+        self.bytes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        if sql.lstrip().upper().startswith('UPDATE'):
+            self.bytes += sum(len(str(value).encode()) for value in params or () if value is not None)
+        return execute(sql, params, many, context)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--text-kb', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test import Client
+    from App.models import Task, CrudUser, UserProfile, Author, Book
+
+    with test_database():
+        text = 'x' * (args.text_kb * 1024)
+        task = Task.objects.create(title='Task', description=text)
+        author = Author.objects.create(name='Author', bio=text)
+        book = Book.objects.create(author=author, book_name='Book', content=text)
+        user = CrudUser.objects.create(username='user', email='user@example.com')
+        UserProfile.objects.create(user=user, bio=text)
+        client = Client()
+
+        def legacy_task():
+            row = Task.objects.get(pk=task.pk)
+            row.title = 'Renamed'
+            row.save()
+
+        def legacy_book():
+            row = Book.objects.get(pk=book.pk)
+            row.book_name = 'Renamed'
+            row.save()
+            return row.author.name
+
+        def legacy_user():
+            row = CrudUser.objects.get(pk=user.pk)
+            profile = UserProfile.objects.get(user=row)
+            profile.website = 'https://example.com'
+            row.save()
+            profile.save()
+
+        def send(method, path, body, **headers):
+            return lambda: client.generic(method, path, json.dumps(body), 'application/json', **headers)
+
+        representation = {'HTTP_PREFER': 'return=representation'}
+        cases = [
+            ('task: full save()', legacy_task),
+            ('task: PUT', send('PUT', f'/api/put/{task.pk}/', {'title': 'Renamed'})),
+            ('task: PATCH', send('PATCH', f'/api/put/{task.pk}/', {'title': 'Renamed'})),
+            ('task: PATCH + representation', send('PATCH', f'/api/put/{task.pk}/', {'title': 'Renamed'}, **representation)),
+            ('book: full save()', legacy_book),
+            ('book: PUT', send('PUT', f'/api/update_book_one_to_many/{book.pk}/', {'book_name': 'Renamed'})),
+            ('book: PATCH', send('PATCH', f'/api/update_book_one_to_many/{book.pk}/', {'book_name': 'Renamed'})),
+            ('user: full save()', legacy_user),
+            ('user: PUT', send('PUT', f'/api/put_one_by_one/{user.pk}/', {'website': 'https://example.com'})),
+            ('user: PATCH', send('PATCH', f'/api/put_one_by_one/{user.pk}/', {'website': 'https://example.com'})),
+        ]
+        print(f'{"update":<32}{"queries":>9}{"bytes written":>15}{"latency":>12}')
+        for name, update in cases:
+            counter = WriteCounter()
+            with connection.execute_wrapper(counter):
+                update()
+            elapsed = best_of(update, args.repeat)
+            print(f'{name:<32}{counter.queries:>9}{counter.bytes:>15,}{elapsed * 1000:>10.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
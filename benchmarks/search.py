@@ -0,0 +1,99 @@
+"""
+Full-text search (App/search.py) against ``icontains`` filtering.
+
+    python -m benchmarks.search [--rows 1000000] [--repeat 5]
+
+Seeds a fresh database file with ``--rows`` tasks whose descriptions draw
+words from a skewed vocabulary, so there are common, uncommon and rare
+terms. For each query it times
+
+* the first page (20 rows) of ranked FTS5 results, snippets included,
+* the first page of ``description__icontains`` (id order, no ranking),
+* counting every match both ways (what ranking has to look at).
+
+Seeding a million rows takes a few minutes, most of it maintaining the
+index through the insert trigger.
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from .common import best_of, use_database_file
+
+VOCABULARY = [f'word{i}' for i in range(5000)]
+
+# (label, FTS query, icontains term)
+QUERIES = [
+    ('common word', 'word1', 'word1 '),
+    ('uncommon word', 'word400', 'word400 '),
+    ('rare word', 'word4000', 'word4000 '),
+    ('prefix', 'word12*', 'word12'),
+    ('two words', 'word1 word2', None),
+]
+
+
+def seed(rows, batch=5000):
+    from django.db import transaction
+    from App.models import Task
+
+    rng = random.Random(0)
+    # Zipf-like: low-numbered words are far more frequent than high-numbered ones
+    weights = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+    for start in range(0, rows, batch):
+        with transaction.atomic():
+            Task.objects.bulk_create(
+                Task(title=f'Task {i}', description=' '.join(rng.choices(VOCABULARY, weights, k=40)) + ' ')
+                for i in range(start, min(start + batch, rows))
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_database_file(Path(tmp) / 'bench.sqlite3')
+        from django.db import connection
+        from App import search
+        from App.models import Task
+
+        start = time.perf_counter()
+        seed(args.rows)
+        print(f'seeded {args.rows:,} tasks in {time.perf_counter() - start:.1f}s')
+        index = search.INDEXES['tasks']
+        index.optimize()
+
+        def fts_count(query):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT count(*) FROM {index.fts_table} WHERE {index.fts_table} MATCH %s',
+                    [search.to_match_expression(query)],
+                )
+                return cursor.fetchone()[0]
+
+        print(f'{"query":<14} {"matches":>9} {"fts page":>10} {"icontains page":>15} {"fts count":>10} {"icontains count":>16}')
+        for label, query, term in QUERIES:
+            matches = fts_count(query)
+            fts_page = best_of(lambda: index.search(query, 20), args.repeat)
+            fts_all = best_of(lambda: fts_count(query), args.repeat)
+            if term is None:
+                like_page = like_all = None
+            else:
+                queryset = Task.objects.filter(description__icontains=term)
+                like_page = best_of(lambda: list(queryset.order_by('id').values_list('id', 'title')[:20]), args.repeat)
+                like_all = best_of(lambda: queryset.count(), args.repeat)
+            print(
+                f'{label:<14} {matches:>9,} {ms(fts_page):>10} {ms(like_page):>15} {ms(fts_all):>10} {ms(like_all):>16}'
+            )
+
+
+def ms(seconds):
+    return '-' if seconds is None else f'{seconds * 1000:.1f} ms'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Rows per second of the list serialization path: the original per-row model
+instance + dict + ``JsonResponse`` code against the ``FieldPlan`` /
+``values_list`` path, with and without orjson.
+
+    python -m benchmarks.serialization [--rows 20000] [--repeat 5]
+"""
+import argparse
+from unittest import mock
+
+from .common import best_of, setup_django, test_database
+
+
+def legacy_tasks():
+    from django.http import JsonResponse
+    from App.models import Task
+
+    task_list = []
+    for task in Task.objects.all():
+        task_list.append({
+            'id': task.id,
+            'title': task.title,
+            'description': task.description,
+            'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        })
+    return JsonResponse(task_list, safe=False)
+
+
+def legacy_authors():
+    from django.http import JsonResponse
+    from App.models import Author, Book
+
+    data = []
+    for author in Author.objects.all():
+        books_list = [
+            {'id': book.id, 'book_name': book.book_name, 'content': book.content, 'created_at': book.created_at}
+            for book in Book.objects.filter(author=author)
+        ]
+        data.append({'id': author.id, 'author_name': author.name, 'bio': author.bio, 'books': books_list})
+    return JsonResponse(data, safe=False)
+
+
+def planned_tasks():
+    from App import listing
+    from App.serialization import json_response
+    return json_response(listing.serialize_tasks(listing.task_queryset()))
+
+
+def planned_authors():
+    from App import listing
+    from App.serialization import json_response
+    return json_response(listing.serialize_authors(listing.author_queryset()))
+
+
+def seed(rows):
+    from App.models import Task, Author, Book
+
+    Task.objects.bulk_create(
+        Task(title=f'Task {i}', description='lorem ipsum ' * 20) for i in range(rows)
+    )
+    authors = Author.objects.bulk_create(Author(name=f'Author {i}', bio='bio ' * 20) for i in range(rows // 10))
+    Book.objects.bulk_create(
+        Book(author=author, book_name=f'Book {j}', content='lorem ipsum ' * 20)
+        for author in authors for j in range(10)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from App import serialization
+
+    with test_database():
+        seed(args.rows)
+        cases = [
+            ('tasks', args.rows, legacy_tasks, planned_tasks),
+            ('authors+books', args.rows // 10 + args.rows, legacy_authors, planned_authors),
+        ]
+        print(f'{"payload":<15}{"path":<22}{"rows/s":>12}{"speedup":>10}')
+        for name, rows, legacy, planned in cases:
+            baseline = best_of(legacy, args.repeat)
+            print(f'{name:<15}{"legacy":<22}{rows / baseline:>12,.0f}{"1.00x":>10}')
+            with mock.patch.object(serialization, 'orjson', None):
+                elapsed = best_of(planned, args.repeat)
+            print(f'{name:<15}{"plan + stdlib json":<22}{rows / elapsed:>12,.0f}{baseline / elapsed:>9.2f}x')
+            if serialization.orjson is not None:
+                elapsed = best_of(planned, args.repeat)
+                print(f'{name:<15}{"plan + orjson":<22}{rows / elapsed:>12,.0f}{baseline / elapsed:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
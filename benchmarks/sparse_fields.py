@@ -0,0 +1,55 @@
+"""
+Payload size and latency of list endpoints with and without ``?fields=``
+(sparse fieldsets, App/listing.py ``project()``).
+
+    python -m benchmarks.sparse_fields [--authors 1000] [--content-words 1000] [--repeat 5]
+
+Authors get 10 books each whose ``content`` holds ``--content-words`` words;
+each case requests the whole list through Django's test client.
+"""
+import argparse
+
+from .common import best_of, setup_django, test_database
+
+CASES = [
+    ('authors, every field', '/api/get_all_authors_one_to_many/'),
+    ('authors, books without content', '/api/get_all_authors_one_to_many/?fields=id,author_name,books.id,books.book_name'),
+    ('authors, no books', '/api/get_all_authors_one_to_many/?fields=id,author_name'),
+    ('tasks, every field', '/api/getmymodel/'),
+    ('tasks, id and title', '/api/getmymodel/?fields=id,title'),
+]
+
+
+def seed(authors, content_words):
+    from App.models import Task, Author, Book
+
+    content = ' '.join(['lorem'] * content_words)
+    created = Author.objects.bulk_create(Author(name=f'Author {i}', bio='bio ' * 50) for i in range(authors))
+    Book.objects.bulk_create(
+        Book(author=author, book_name=f'Book {j}', content=content) for author in created for j in range(10)
+    )
+    Task.objects.bulk_create(Task(title=f'Task {i}', description=content) for i in range(authors * 10))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--authors', type=int, default=1000)
+    parser.add_argument('--content-words', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+
+    with test_database():
+        seed(args.authors, args.content_words)
+        client = Client()
+        print(f'{"case":<34}{"bytes":>14}{"latency":>12}')
+        for name, path in CASES:
+            size = len(client.get(path).content)
+            elapsed = best_of(lambda: client.get(path), args.repeat)
+            print(f'{name:<34}{size:>14,}{elapsed * 1000:>10.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Mixed read/write throughput of the existing endpoints under the development
+and production SQLite profiles (DJANGO_CRUD_DB_PROFILE).
+
+    python -m benchmarks.sqlite_profiles [--threads 16] [--duration 10] [--write-ratio 0.2]
+
+Each profile runs in its own process against a freshly seeded database file.
+Worker threads drive the endpoints through Django's test client and close
+connections after each request the way the request handler does, so
+CONN_MAX_AGE behaves as it does under a real server.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from .common import ROOT, use_database_file
+
+PROFILES = ['development', 'production']
+
+
+def seed(rows):
+    from App.models import Task, Author, Book
+
+    Task.objects.bulk_create(Task(title=f'Task {i}', description='lorem ipsum ' * 20) for i in range(rows))
+    authors = Author.objects.bulk_create(Author(name=f'Author {i}', bio='bio') for i in range(rows // 10))
+    Book.objects.bulk_create(
+        Book(author=author, book_name=f'Book {j}', content='lorem ipsum ' * 20) for author in authors for j in range(5)
+    )
+    return list(Task.objects.values_list('id', flat=True)), [author.id for author in authors]
+
+
+def worker(deadline, write_ratio, task_ids, author_ids, counts, lock):
+    from django.db import close_old_connections
+    from django.test import Client
+
+    client = Client()
+    rng = random.Random()
+    done = {'reads': 0, 'writes': 0, 'errors': 0}
+    while time.perf_counter() < deadline:
+        if rng.random() < write_ratio:
+            kind = 'writes'
+            if rng.random() < 0.5:
+                response = client.post(
+                    '/api/mymodel/', json.dumps({'title': 'New', 'description': 'task'}), content_type='application/json'
+                )
+            else:
+                response = client.put(
+                    f'/api/put/{rng.choice(task_ids)}/', json.dumps({'title': 'Updated'}), content_type='application/json'
+                )
+        else:
+            kind = 'reads'
+            choice = rng.random()
+            if choice < 0.4:
+                response = client.get('/api/getmymodel/', {'limit': 50})
+            elif choice < 0.7:
+                response = client.get(f'/api/getbyid/{rng.choice(task_ids)}/')
+            else:
+                response = client.get(f'/api/get_author_detail_by_id_one_to_many/{rng.choice(author_ids)}/')
+        # Mirror the request_finished handler: close connections older than CONN_MAX_AGE
+        close_old_connections()
+        done['errors' if response.status_code >= 500 else kind] += 1
+    with lock:
+        for key, value in done.items():
+            counts[key] += value
+
+
+def run_profile(args):
+    """Runs inside the child process for one profile and prints a JSON result line."""
+    import logging
+    from django.conf import settings
+    from django.test.utils import setup_test_environment
+
+    logging.disable(logging.CRITICAL)  # "database is locked" 500s are counted, not logged
+    with tempfile.TemporaryDirectory() as tmp:
+        use_database_file(Path(tmp) / 'bench.sqlite3')
+        setup_test_environment()
+        task_ids, author_ids = seed(args.rows)
+
+        counts = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(target=worker, args=(
+                start + args.duration, args.write_ratio, task_ids, author_ids, counts, lock,
+            ))
+            for _ in range(args.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        print(json.dumps({'profile': settings.DB_PROFILE, 'elapsed': elapsed, **counts}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--profile', choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        return run_profile(args)
+
+    print(f'{args.threads} threads, {args.write_ratio:.0%} writes, {args.duration:.0f}s per profile')
+    print(f'{"profile":<14}{"req/s":>10}{"reads/s":>10}{"writes/s":>10}{"errors":>8}')
+    results = {}
+    for profile in PROFILES:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.sqlite_profiles', '--profile', profile,
+             '--threads', str(args.threads), '--duration', str(args.duration),
+             '--write-ratio', str(args.write_ratio), '--rows', str(args.rows)],
+            cwd=ROOT, env={**os.environ, 'DJANGO_CRUD_DB_PROFILE': profile},
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results[profile] = total = (result['reads'] + result['writes']) / result['elapsed']
+        print(
+            f'{profile:<14}{total:>10,.0f}{result["reads"] / result["elapsed"]:>10,.0f}'
+            f'{result["writes"] / result["elapsed"]:>10,.0f}{result["errors"]:>8}'
+        )
+    print(f'production / development: {results["production"] / results["development"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+"""
+End-to-end benchmark of every route in App/urls.py against a seeded dataset.
+
+    python -m benchmarks.suite [--scale small|medium|large] [--iterations 30]
+                               [--server] [--concurrency 16] [--duration 5]
+                               [--output results.json] [--baseline benchmarks/baseline.json]
+                               [--save-baseline] [--threshold 0.25]
+
+Each route is driven in-process through Django's test client: latency
+percentiles and requests/s over ``--iterations`` requests, plus the SQL
+query count and the peak Python memory allocated by one request. Write
+requests run in a transaction that is rolled back, so every iteration sees
+the same data. With ``--server`` the read routes are also driven over HTTP
+against ``manage.py runserver`` by the concurrent client in
+``benchmarks.loadgen``; ``--url`` targets a server you started yourself on
+the ``--db`` file instead, which is the meaningful setup for throughput.
+
+Results are written as JSON. With ``--baseline`` they are compared against
+an earlier run and routes whose p50 latency grew by more than
+``--threshold`` (or that issue more queries) are flagged; the exit status
+is 1 if any are. ``--save-baseline`` stores the run as the new baseline.
+"""
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from .common import ROOT, server, use_database_file
+from .loadgen import percentile, run_load
+
+DEFAULT_BASELINE = ROOT / 'benchmarks' / 'baseline.json'
+SERVER_PORT = 8765
+
+
+def sample_ids():
+    """Primary keys of existing rows for the detail, update and delete routes."""
+    from App.models import Task, CrudUser, Book, Enrollment
+
+    book = Book.objects.order_by('id').values('id', 'author_id').first()
+    return {
+        'task': Task.objects.order_by('id').values_list('id', flat=True).first(),
+        'user': CrudUser.objects.filter(userprofile__isnull=False).order_by('id').values_list('id', flat=True).first(),
+        'author': book['author_id'],
+        'book': book['id'],
+        'enrollment': Enrollment.objects.order_by('id').values_list('id', flat=True).first(),
+    }
+
+
+def finished_job():
+    """Id of a finished background job, for the job status route (the seeded dataset has none)."""
+    from django.utils import timezone
+    from App import jobs
+    from App.models import Job
+
+    job = jobs.queue().create(
+        kind='rebuild_search_index', payload={'index': 'books'}, status=Job.SUCCEEDED, progress=1, total=1,
+        result={'index': 'books', 'action': 'rebuilt'}, attempts=1, run_after=timezone.now(),
+    )
+    return job.pk
+
+
+def cases(ids):
+    """(name, method, path, JSON body) for every route; names are stable across runs."""
+    task, user, author, book, enrollment, job = (
+        ids[key] for key in ('task', 'user', 'author', 'book', 'enrollment', 'job')
+    )
+    student_course = {
+        'student': {'name': 'Bench', 'email': 'bench@example.com'},
+        'course': {'title': 'Bench', 'description': 'Bench', 'start_date': '2024-09-01'},
+        'grade': 'A',
+    }
+    books = [{'book_name': f'Bench {i}', 'content': 'lorem ipsum ' * 50} for i in range(10)]
+    return [
+        ('task create', 'POST', '/api/mymodel/', {'title': 'Bench', 'description': 'Bench'}),
+        ('task list', 'GET', '/api/getmymodel/', None),
+        ('task list page', 'GET', '/api/getmymodel/?limit=100', None),
+        ('task list stream', 'GET', '/api/getmymodel/?stream=ndjson', None),
+        ('task detail', 'GET', f'/api/getbyid/{task}/', None),
+        ('task update', 'PUT', f'/api/put/{task}/', {'title': 'Bench'}),
+        ('task patch', 'PATCH', f'/api/put/{task}/', {'title': 'Bench'}),
+        ('task delete', 'DELETE', f'/api/tasks/{task}/delete/', None),
+        ('user create', 'POST', '/api/create/', {'username': 'bench', 'email': 'bench@example.com', 'bio': 'Bench'}),
+        ('user list', 'GET', '/api/get_all/', None),
+        ('user list page', 'GET', '/api/get_all/?limit=100', None),
+        ('user detail', 'GET', f'/api/get_by_id/{user}/', None),
+        ('user update', 'PUT', f'/api/put_one_by_one/{user}/', {'bio': 'Bench'}),
+        ('user patch', 'PATCH', f'/api/put_one_by_one/{user}/', {'bio': 'Bench'}),
+        ('author create with books', 'POST', '/api/post_one_to_many/', {
+            'author_name': 'Bench', 'author_bio': 'Bench', 'books': books,
+        }),
+        ('author create', 'POST', '/api/only_author_post_one_to_many/', {'author_name': 'Bench', 'author_bio': 'Bench'}),
+        ('book create', 'POST', f'/api/only_book_post_one_to_many/{author}/', books),
+        ('author list', 'GET', '/api/get_all_authors_one_to_many/', None),
+        ('author list page', 'GET', '/api/get_all_authors_one_to_many/?limit=100', None),
+        ('author detail', 'GET', f'/api/get_author_detail_by_id_one_to_many/{author}/', None),
+        ('book update', 'PUT', f'/api/update_book_one_to_many/{book}/', {'book_name': 'Bench', 'author_id': author}),
+        ('book patch', 'PATCH', f'/api/update_book_one_to_many/{book}/', {'book_name': 'Bench'}),
+        ('author delete', 'DELETE', f'/api/delete_author_one_to_many/{author}/', None),
+        ('book delete', 'DELETE', f'/api/delete_book_one_to_many/{author}/{book}/', None),
+        ('enrollment create', 'POST', '/api/create_student_course_many_to_many/', student_course),
+        ('enrollment bulk create', 'POST', '/api/bulk_create_student_course_many_to_many/', [
+            {**student_course, 'student': {'name': 'Bench', 'email': f'bench{i}@example.com'}} for i in range(100)
+        ]),
+        ('enrollment list', 'GET', '/api/get_student_course_many_to_many/', None),
+        ('enrollment list page', 'GET', '/api/get_student_course_many_to_many/?limit=100', None),
+        ('enrollment detail', 'GET', f'/api/get_student_course_many_to_many/{enrollment}/', None),
+        ('enrollment update', 'PUT', f'/api/put_student_course_many_to_many/{enrollment}/', {'grade': 'B'}),
+        ('enrollment delete', 'DELETE', f'/api/delete_student_course_many_to_many/{enrollment}/', None),
+        ('bulk delete tasks by id', 'POST', '/api/bulk_delete/tasks/', {'ids': [task]}),
+        ('bulk delete books by author', 'POST', '/api/bulk_delete/books/', {'filter': {'author_id': author}}),
+        ('bulk delete enrollments grade', 'POST', '/api/bulk_delete/enrollments/', {'filter': {'grade': 'F'}}),
+        ('job status', 'GET', f'/api/jobs/{job}/', None),
+        ('export books', 'GET', '/api/export/books/?format=ndjson', None),
+        ('export tasks', 'GET', '/api/export/tasks/', None),
+        ('search books', 'GET', '/api/search/books/?q=dolor+magna&limit=20', None),
+        ('search tasks by prefix', 'GET', '/api/search/tasks/?q=temp*&limit=20', None),
+        ('async task list page', 'GET', '/api/async/tasks/?limit=100', None),
+        ('async task detail', 'GET', f'/api/async/tasks/{task}/', None),
+        ('async user list page', 'GET', '/api/async/users/?limit=100', None),
+        ('async user detail', 'GET', f'/api/async/users/{user}/', None),
+        ('async author list page', 'GET', '/api/async/authors/?limit=100', None),
+        ('async author detail', 'GET', f'/api/async/authors/{author}/', None),
+        ('async book create', 'POST', f'/api/async/authors/{author}/books/', books),
+        ('async enrollment list page', 'GET', '/api/async/enrollments/?limit=100', None),
+        ('async enrollment detail', 'GET', f'/api/async/enrollments/{enrollment}/', None),
+        ('cache stats', 'GET', '/api/cache_stats/', None),
+        ('metrics', 'GET', '/api/metrics', None),
+    ]
+
+
+def uncovered_routes(routes):
+    """URL patterns of App/urls.py that no benchmark case reaches."""
+    from django.urls import resolve
+    from App.urls import urlpatterns
+
+    covered = {resolve(path.split('?')[0]).route for _, _, path, _ in routes}
+    return [f'api/{pattern.pattern}' for pattern in urlpatterns if f'api/{pattern.pattern}' not in covered]
+
+
+class ClientRunner:
+    def __init__(self):
+        from django.test import Client
+        self.client = Client()
+
+    def request(self, method, path, body):
+        from django.db import transaction
+
+        data = json.dumps(body) if body is not None else ''
+        if method == 'GET':
+            response = self.client.generic(method, path, data, 'application/json')
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+        else:
+            with transaction.atomic():
+                response = self.client.generic(method, path, data, 'application/json')
+                content = response.content
+                transaction.set_rollback(True)
+        return response.status_code, len(content)
+
+    def measure(self, method, path, body, iterations):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        for _ in range(3):
+            status, size = self.request(method, path, body)
+
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(iterations):
+            began = time.perf_counter()
+            self.request(method, path, body)
+            latencies.append((time.perf_counter() - began) * 1000)
+        elapsed = time.perf_counter() - start
+
+        # Queries and memory are taken from one extra request so they do not slow the timed ones
+        with CaptureQueriesContext(connection) as queries:
+            tracemalloc.start()
+            try:
+                self.request(method, path, body)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        return {
+            'status': status,
+            'bytes': size,
+            'rps': iterations / elapsed,
+            'mean_ms': statistics.fmean(latencies),
+            'p50_ms': percentile(latencies, 50),
+            'p90_ms': percentile(latencies, 90),
+            'p99_ms': percentile(latencies, 99),
+            'queries': len(queries),
+            'peak_kib': peak / 1024,
+        }
+
+
+def run_client(routes, iterations):
+    import logging
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    # Error responses are part of the report; keep them out of the console
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    runner = ClientRunner()
+    results = {}
+    for name, method, path, body in routes:
+        results[name] = runner.measure(method, path, body, iterations)
+        result = results[name]
+        print(
+            f'{name:<30}{result["status"]:>5}{result["p50_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+            f'{result["rps"]:>9,.0f}{result["queries"]:>6}{result["peak_kib"]:>10,.0f}{result["bytes"]:>11,}'
+        )
+    return results
+
+
+def run_server(routes, base_url, concurrency, duration):
+    results = {}
+    for name, method, path, body in routes:
+        if method != 'GET':
+            continue  # only reads over HTTP: writes would change the dataset under the other routes
+        result = run_load(base_url, [(method, path, body)], concurrency=concurrency, duration=duration)
+        results[name] = result
+        print(
+            f'{name:<30}{result["rps"]:>9,.0f}{result["p50_ms"] or 0:>9.2f}'
+            f'{result["p99_ms"] or 0:>9.2f}{result["errors"]:>7}'
+        )
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regression descriptions, comparing the client results route by route."""
+    regressions = []
+    for name, current in results['client'].items():
+        previous = baseline.get('client', {}).get(name)
+        if previous is None:
+            continue
+        ratio = current['p50_ms'] / previous['p50_ms'] if previous['p50_ms'] else 1.0
+        if ratio > 1 + threshold:
+            regressions.append(f'{name}: p50 {previous["p50_ms"]:.2f} -> {current["p50_ms"]:.2f} ms ({ratio:.2f}x)')
+        if current['queries'] > previous['queries']:
+            regressions.append(f'{name}: queries {previous["queries"]} -> {current["queries"]}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', default='small', choices=['small', 'medium', 'large'])
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--server', action='store_true', help='Also drive the read routes over HTTP (runserver).')
+    parser.add_argument('--url', help='Drive the read routes over HTTP against this server, started on the seeded '
+                                      'database by you (e.g. gunicorn with DJANGO_CRUD_DB set); implies --server.')
+    parser.add_argument('--db', type=Path, help='Seed and use this database file instead of a temporary one.')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per route in --server mode.')
+    parser.add_argument('--output', type=Path, help='Where to write the JSON results.')
+    parser.add_argument('--baseline', type=Path, help=f'Compare against this run (e.g. {DEFAULT_BASELINE.relative_to(ROOT)}).')
+    parser.add_argument('--save-baseline', action='store_true', help=f'Write the results to {DEFAULT_BASELINE.relative_to(ROOT)}.')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed p50 slowdown before flagging.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or Path(tmp) / 'bench.sqlite3'
+        use_database_file(db_path)
+        import django
+        from django.core.management import call_command
+
+        call_command('seed_bench', scale=args.scale, flush=True)
+        routes = cases({**sample_ids(), 'job': finished_job()})
+        for pattern in uncovered_routes(routes):
+            print(f'warning: no benchmark case for {pattern}')
+
+        print(f'\n{"route":<30}{"code":>5}{"p50 ms":>9}{"p99 ms":>9}{"req/s":>9}{"SQL":>6}{"peak KiB":>10}{"bytes":>11}')
+        results = {
+            'meta': {
+                'scale': args.scale,
+                'iterations': args.iterations,
+                'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'machine': platform.machine(),
+            },
+            'client': run_client(routes, args.iterations),
+        }
+        if args.server or args.url:
+            print(f'\nHTTP, {args.concurrency} connections, {args.duration:.0f}s per route')
+            print(f'{"route":<30}{"req/s":>9}{"p50 ms":>9}{"p99 ms":>9}{"errors":>7}')
+            if args.url:
+                results['server'] = run_server(routes, args.url, args.concurrency, args.duration)
+            else:
+                argv = [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{SERVER_PORT}', '--noreload']
+                with server(argv, SERVER_PORT, env={'DJANGO_CRUD_DB': str(db_path)}) as base_url:
+                    results['server'] = run_server(routes, base_url, args.concurrency, args.duration)
+
+    output = args.output or (ROOT / 'benchmarks' / 'results' / f'{time.strftime("%Y%m%d-%H%M%S")}.json')
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f'\nresults written to {output}')
+    if args.save_baseline:
+        DEFAULT_BASELINE.write_text(json.dumps(results, indent=2))
+        print(f'baseline saved to {DEFAULT_BASELINE}')
+
+    if args.baseline:
+        if not args.baseline.exists():
+            raise SystemExit(f'baseline {args.baseline} not found; record one with --save-baseline')
+        baseline = json.loads(args.baseline.read_text())
+        if baseline['meta']['scale'] != args.scale:
+            print(f'warning: baseline was recorded at scale {baseline["meta"]["scale"]}')
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        print(f'{len(regressions)} regression(s) against {args.baseline}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
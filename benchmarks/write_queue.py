@@ -0,0 +1,115 @@
+"""
+Write throughput with and without the single-writer queue (App/writer.py).
+
+    python -m benchmarks.write_queue [--threads 32] [--duration 10]
+
+Both runs use the production SQLite profile against a fresh database file,
+each in its own process. Worker threads create tasks, update tasks and
+enroll students through Django's test client.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from .common import ROOT, use_database_file
+
+MODES = {'direct': '0', 'write queue': '1'}
+
+
+def worker(deadline, task_ids, counts, lock):
+    from django.db import close_old_connections
+    from django.test import Client
+
+    client = Client()
+    rng = random.Random()
+    done = {'writes': 0, 'errors': 0}
+    while time.perf_counter() < deadline:
+        choice = rng.random()
+        if choice < 0.4:
+            response = client.post(
+                '/api/mymodel/', json.dumps({'title': 'New', 'description': 'task'}), content_type='application/json'
+            )
+        elif choice < 0.8:
+            response = client.put(
+                f'/api/put/{rng.choice(task_ids)}/', json.dumps({'title': 'Updated'}), content_type='application/json'
+            )
+        else:
+            n = rng.randrange(1_000_000_000)
+            response = client.post('/api/create_student_course_many_to_many/', json.dumps({
+                'student': {'name': f'Student {n}', 'email': f'student{n}@example.com'},
+                'course': {'title': 'Maths', 'description': 'Algebra', 'start_date': '2024-09-01'},
+                'grade': 'A',
+            }), content_type='application/json')
+        close_old_connections()
+        done['errors' if response.status_code >= 500 else 'writes'] += 1
+    with lock:
+        for key, value in done.items():
+            counts[key] += value
+
+
+def run_mode(args):
+    """Runs inside the child process for one mode and prints a JSON result line."""
+    import logging
+    from django.test.utils import setup_test_environment
+
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        use_database_file(Path(tmp) / 'bench.sqlite3')
+        setup_test_environment()
+        from App import writer
+        from App.models import Task
+
+        Task.objects.bulk_create(Task(title=f'Task {i}', description='lorem ipsum ' * 20) for i in range(1000))
+        task_ids = list(Task.objects.values_list('id', flat=True))
+
+        counts = {'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(target=worker, args=(start + args.duration, task_ids, counts, lock))
+            for _ in range(args.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        batches = writer._queue.batches if writer._queue is not None else None
+        writer.shutdown()
+        print(json.dumps({'elapsed': elapsed, 'batches': batches, **counts}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_mode(args)
+
+    print(f'{args.threads} threads, {args.duration:.0f}s per mode, production profile')
+    print(f'{"mode":<14}{"writes/s":>10}{"per txn":>10}{"errors":>8}')
+    for mode, enabled in MODES.items():
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.write_queue', '--child',
+             '--threads', str(args.threads), '--duration', str(args.duration)],
+            cwd=ROOT,
+            env={**os.environ, 'DJANGO_CRUD_DB_PROFILE': 'production', 'DJANGO_CRUD_WRITE_QUEUE': enabled},
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        per_txn = f'{result["writes"] / result["batches"]:.1f}' if result['batches'] else '1.0'
+        print(f'{mode:<14}{result["writes"] / result["elapsed"]:>10,.0f}{per_txn:>10}{result["errors"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
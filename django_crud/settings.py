@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'App.metrics.MetricsMiddleware',
+    'App.profiling.ProfilingMiddleware',
+    'App.slow_queries.SlowQueryMiddleware',
+    'App.routers.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,10 +83,150 @@ WSGI_APPLICATION = 'django_crud.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # DJANGO_CRUD_DB points the project at another database file (benchmarks use this)
+        'NAME': os.environ.get('DJANGO_CRUD_DB', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Database profile. DJANGO_CRUD_DB_PROFILE=production keeps connections open
+# between requests and tunes SQLite on connect (App/sqlite.py): WAL lets readers
+# run alongside the writer, busy_timeout/IMMEDIATE transactions make writers
+# queue for the lock instead of failing with "database is locked".
+
+DB_PROFILE = os.environ.get('DJANGO_CRUD_DB_PROFILE', 'development')
+
+SQLITE_PRAGMAS = {}
+
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 20000,
+        'cache_size': -65536,  # KiB, i.e. 64 MiB of page cache per connection
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    }
+
+# Read replicas (App/routers.py). DJANGO_CRUD_REPLICAS is a comma separated list of
+# SQLite files kept in sync with `manage.py replicate_db`; GET requests read from
+# them, and a client that just wrote reads from the primary for
+# APP_READ_YOUR_WRITES_SECONDS.
+
+APP_READ_REPLICAS = []
+APP_READ_YOUR_WRITES_SECONDS = 5
+
+for index, replica_path in enumerate(filter(None, os.environ.get('DJANGO_CRUD_REPLICAS', '').split(',')), start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': replica_path,
+        # Tests run every replica against the test primary
+        'TEST': {'MIRROR': 'default'},
+    }
+    APP_READ_REPLICAS.append(alias)
+
+# Shards (App/sharding.py). DJANGO_CRUD_SHARDS is a comma separated list of SQLite
+# files; students and their enrollments are hash-sharded across them and courses
+# are copied to each. Run `manage.py init_shards` after setting it.
+
+APP_SHARDS = []
+
+for index, shard_path in enumerate(filter(None, os.environ.get('DJANGO_CRUD_SHARDS', '').split(','))):
+    alias = f'shard_{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'NAME': shard_path}
+    APP_SHARDS.append(alias)
+
+DATABASE_ROUTERS = ['App.sharding.ShardRouter', 'App.routers.ReplicaRouter']
+
+# Single-writer queue (App/writer.py). When enabled, the write endpoints hand their
+# work to one writer thread per process, which commits concurrent writes in
+# shared transactions (group commit) instead of each request fighting for the lock.
+APP_WRITE_QUEUE = {
+    'ENABLED': os.environ.get('DJANGO_CRUD_WRITE_QUEUE') == '1',
+    'MAX_BATCH': 64,  # writes per transaction
+    'MAX_WAIT': 0.002,  # seconds the writer lingers for more writes after the first
+}
+
+# Delete endpoints (App/deletion.py). FAST deletes with plain DELETE statements and
+# does the cache/ETag bookkeeping of App.signals itself, so no rows are loaded and no
+# delete signals are sent; turn it off if you add delete receivers of your own.
+# Bulk deletes commit BATCH_SIZE rows at a time.
+APP_DELETION = {
+    'FAST': True,
+    'BATCH_SIZE': 500,
+}
+
+# Background jobs (App/jobs.py), run by `manage.py run_workers`. Endpoints queue one
+# when a client sends `Prefer: respond-async` and answer 202 with the job to poll.
+APP_JOBS = {
+    'THREADS': 2,  # worker threads per run_workers process
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 5,  # seconds before the first retry, doubled on each later one
+    'LEASE': 300,  # seconds without a heartbeat before another worker takes a running job over
+    'LEASES': {'rebuild_search_index': 3600},  # longer leases for kinds that cannot heartbeat mid-way
+    'CHUNK_SIZE': 500,
+}
+
+# Request metrics (App/metrics.py), served at /api/metrics. With several worker
+# processes, point DJANGO_CRUD_METRICS_DIR at a local directory they share so
+# every worker reports the totals of all of them.
+APP_METRICS = {
+    'ENABLED': True,
+    'DIR': os.environ.get('DJANGO_CRUD_METRICS_DIR'),
+    'FLUSH_INTERVAL': 5,  # seconds between writes of a worker's totals to DIR
+}
+
+# On-demand profiling (App/profiling.py): requests with a signed X-App-Profile
+# header (`manage.py profile_token`), or ?__profile from ALLOWED_IPS, are run
+# under cProfile; the profile and a SQL log are written to DIR. No address is
+# allowed by default: behind a reverse proxy on the same host every request comes
+# from 127.0.0.1, so only add addresses that identify a developer.
+APP_PROFILING = {
+    'ENABLED': True,
+    'DIR': os.environ.get('DJANGO_CRUD_PROFILE_DIR', BASE_DIR / 'profiles'),
+    'ALLOWED_IPS': (),
+    'TOKEN_MAX_AGE': 3600,
+}
+
+# Slow-query log (App/slow_queries.py): statements slower than THRESHOLD seconds
+# are appended to LOG with redacted parameters, the issuing view and the query
+# plan. `manage.py slow_queries` reports the worst query shapes.
+APP_SLOW_QUERIES = {
+    'ENABLED': True,
+    'THRESHOLD': 0.1,
+    'LOG': os.environ.get('DJANGO_CRUD_SLOW_QUERY_LOG', BASE_DIR / 'slow_queries.log'),
+    'PLAN_INTERVAL': 300,  # seconds before a process captures the plan of a query shape again
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Swap the backend for Redis/Memcached to share cached payloads between worker processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache alias and per-payload TTLs (seconds) used for the App detail endpoints
+APP_CACHE_ALIAS = 'default'
+APP_CACHE_TTLS = {
+    'task': 300,
+    'user': 300,
+    'author': 300,
+    'enrollment': 120,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators